@@ -1,45 +1,317 @@
-import cv2
-from models.face import detect_faces
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from models.headpose import detect_headpose
 from models.phone import detect_phone
-from models.headpose import looking_away
-
-
-def run_snapshot_inference(image_path: str):
-    image = cv2.imread(image_path)
-
-    results = []
-
-    faces = detect_faces(image)
-    if len(faces) == 0:
-        results.append({
-            "type": "NO_FACE",
-            "severity": 2,
-            "confidence": 0.9,
-            "metadata": {"faces": 0}
-        })
-
-    if len(faces) > 1:
-        results.append({
-            "type": "MULTIPLE_FACES",
-            "severity": 3,
-            "confidence": 0.95,
-            "metadata": {"faces": len(faces)}
-        })
-
-    if looking_away(image):
-        results.append({
-            "type": "LOOKING_AWAY",
-            "severity": 2,
-            "confidence": 0.8,
-            "metadata": {}
-        })
-
-    if detect_phone(image):
-        results.append({
-            "type": "PHONE_DETECTED",
-            "severity": 3,
-            "confidence": 0.9,
-            "metadata": {}
-        })
-
-    return results
+from schemas.inference import ModelProfile
+from services.face_tracker import face_tracker
+from services.identity_verifier import identity_verifier
+from services.temporal_engine import temporal_engine
+
+# Marker for outputs of stages that did not run this frame.
+MISSING = object()
+
+DEFAULT_HEAD_POSE = {
+    "looking_away": False,
+    "direction": "center",
+    "confidence": 0.0,
+    "blink": False,
+    "ear": 0.0,
+    "nose_tip": None,
+    "gaze": None
+}
+
+DEFAULT_PHONE = {
+    "status": False,
+    "confidence": 0.0
+}
+
+
+class Stage:
+    """
+    One node of the inference graph.
+
+    `when(args)` False skips the stage and leaves its outputs missing (cadence / disabled models).
+    `requires(args)` False replaces the stage with `fallback(args)` without running `fn`
+    (e.g. no face -> neutral head pose).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        optional: Iterable[str] = (),
+        when: Optional[Callable[[dict], bool]] = None,
+        requires: Optional[Callable[[dict], bool]] = None,
+        fallback: Optional[Callable[[dict], Any]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) or (name,)
+        self.optional = tuple(optional)
+        self.when = when
+        self.requires = requires
+        self.fallback = fallback
+
+
+class FrameContext:
+    """Memoized values, per-stage status and timings for a single frame."""
+
+    def __init__(self, pipeline: "Pipeline", initial: dict):
+        self.pipeline = pipeline
+        self.values: Dict[str, Any] = dict(initial)
+        self.status: Dict[str, str] = {}
+        self.timings_ms: Dict[str, float] = {}
+        self._resolving = set()
+
+    def resolve(self, key: str):
+        if key in self.values:
+            return self.values[key]
+
+        stage = self.pipeline.producers.get(key)
+        if stage is None:
+            raise KeyError(f"No pipeline input or stage provides '{key}'")
+        if stage.name in self._resolving:
+            raise ValueError(f"Cycle in inference pipeline at stage '{stage.name}'")
+
+        self._resolving.add(stage.name)
+        try:
+            self._run_stage(stage)
+        finally:
+            self._resolving.discard(stage.name)
+        return self.values[key]
+
+    def get(self, key: str, default=None):
+        value = self.resolve(key)
+        return default if value is MISSING else value
+
+    def _store(self, stage: Stage, result):
+        if len(stage.outputs) == 1:
+            result = (result,)
+        for key, value in zip(stage.outputs, result):
+            self.values[key] = value
+
+    def _skip(self, stage: Stage, status: str):
+        self.status[stage.name] = status
+        for key in stage.outputs:
+            self.values[key] = MISSING
+
+    def _run_stage(self, stage: Stage):
+        args = {}
+        for key in stage.inputs:
+            value = self.resolve(key)
+            if value is MISSING:
+                # A required upstream stage was skipped, so this one is too.
+                self._skip(stage, "skipped")
+                return
+            args[key] = value
+        for key in stage.optional:
+            provided = key in self.values or key in self.pipeline.producers
+            value = self.resolve(key) if provided else MISSING
+            args[key] = None if value is MISSING else value
+
+        if stage.when is not None and not stage.when(args):
+            self._skip(stage, "skipped")
+            return
+
+        if stage.requires is not None and not stage.requires(args):
+            if stage.fallback is None:
+                self._skip(stage, "fallback")
+                return
+            self.status[stage.name] = "fallback"
+            self._store(stage, stage.fallback(args))
+            return
+
+        started = time.perf_counter()
+        result = stage.fn(**args)
+        self.timings_ms[stage.name] = round((time.perf_counter() - started) * 1000, 3)
+        self.status[stage.name] = "ran"
+        self._store(stage, result)
+
+
+class Pipeline:
+    """Declarative stage graph evaluated lazily from the requested targets."""
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages = list(stages)
+        self.producers: Dict[str, Stage] = {}
+        for stage in self.stages:
+            for key in stage.outputs:
+                if key in self.producers:
+                    raise ValueError(f"Output '{key}' is produced by both '{self.producers[key].name}' and '{stage.name}'")
+                self.producers[key] = stage
+
+    def run(self, initial: dict, targets: Iterable[str]) -> FrameContext:
+        ctx = FrameContext(self, initial)
+        for key in targets:
+            ctx.resolve(key)
+        return ctx
+
+
+def _due(frame_no: int, every: int, offset: int) -> bool:
+    # Offsets keep the heavy models on different frames of the same session.
+    return (frame_no - offset) % every == 0
+
+
+def build_snapshot_pipeline(tracker=face_tracker, engine=temporal_engine, verifier=identity_verifier) -> Pipeline:
+    """
+    Inputs: image, session_id, frame_no, profile, last_result and optionally evidence_id / now.
+    Targets: features (merged raw detections) and temporal (violations + risk score).
+    """
+
+    def faces(image, session_id):
+        return tracker.detect(session_id, image)
+
+    def face_summary(faces):
+        return len(faces), len(faces) > 1
+
+    def head_pose(image, session_id, **_):
+        # Run FaceMesh on the tracked face crop instead of the full frame when possible.
+        roi = tracker.roi(session_id, image)
+        if roi is None:
+            return detect_headpose(image)
+
+        x0, y0, x1, y1 = roi
+        pose = detect_headpose(image[y0:y1, x0:x1])
+        nose_tip = pose.get("nose_tip")
+        if nose_tip:
+            # Map the crop-normalized nose tip back to full-frame coordinates for movement checks.
+            img_h, img_w = image.shape[:2]
+            pose["nose_tip"] = [
+                (x0 + nose_tip[0] * (x1 - x0)) / img_w,
+                (y0 + nose_tip[1] * (y1 - y0)) / img_h,
+            ]
+        return pose
+
+    def phone(image, profile, **_):
+        if profile.phone_confirm_confidence is not None:
+            return detect_phone(image, confirm_confidence=profile.phone_confirm_confidence)
+        return detect_phone(image)
+
+    def identity(image, session_id, faces, frame_no, profile, **_):
+        return verifier.verify(
+            session_id, image, faces[0], tracker.acquisition(session_id), frame_no,
+            threshold=profile.identity_match_threshold,
+        )
+
+    def identity_due(a):
+        if not a["profile"].identity_enabled:
+            return False
+        return verifier.due(a["session_id"], tracker.acquisition(a["session_id"]), a["frame_no"], a["profile"].identity_every)
+
+    def features(last_result, face_count, multiple_faces, head_pose, phone, identity):
+        # Models that did not run this frame carry their last result forward.
+        merged = dict(last_result)
+        merged["face_detected"] = face_count
+        merged["multiple_faces"] = multiple_faces
+        if head_pose is not None:
+            merged["head_pose"] = head_pose
+        if phone is not None:
+            merged["phone_detected"] = phone
+        # Identity is event-driven; only frames that were actually checked carry a result.
+        merged["identity"] = identity
+        return merged
+
+    def temporal(session_id, features, profile, evidence_id, now):
+        engine.set_base_thresholds(session_id, {
+            "PHONE_DETECTED": profile.phone_temporal_threshold,
+            "LOOKING_AWAY": profile.looking_away_threshold,
+        }, now=now)
+        return engine.process_frame(session_id, features, evidence_id, now=now)
+
+    return Pipeline([
+        Stage("faces", faces, inputs=("image", "session_id")),
+        Stage("face_summary", face_summary, inputs=("faces",), outputs=("face_count", "multiple_faces")),
+        Stage(
+            "head_pose",
+            head_pose,
+            inputs=("image", "session_id", "face_count", "frame_no", "profile"),
+            when=lambda a: a["profile"].headpose_enabled and _due(a["frame_no"], a["profile"].headpose_every, 1),
+            # No face: nothing to estimate. Multiple faces: pose and blink would mix people.
+            requires=lambda a: a["face_count"] == 1,
+            fallback=lambda a: dict(DEFAULT_HEAD_POSE),
+        ),
+        Stage(
+            "phone",
+            phone,
+            inputs=("image", "frame_no", "profile"),
+            when=lambda a: a["profile"].phone_enabled and _due(a["frame_no"], a["profile"].phone_every, 2),
+        ),
+        Stage(
+            "identity",
+            identity,
+            inputs=("image", "session_id", "faces", "face_count", "frame_no", "profile"),
+            when=identity_due,
+            requires=lambda a: a["face_count"] == 1,
+        ),
+        Stage(
+            "features",
+            features,
+            inputs=("last_result", "face_count", "multiple_faces"),
+            optional=("head_pose", "phone", "identity"),
+        ),
+        Stage(
+            "temporal",
+            temporal,
+            inputs=("session_id", "features", "profile"),
+            optional=("evidence_id", "now"),
+        ),
+    ])
+
+
+snapshot_pipeline = build_snapshot_pipeline()
+
+
+def new_session_state() -> dict:
+    return {
+        "frame_count": 0,
+        "last_result": {
+            "face_detected": 0,
+            "multiple_faces": False,
+            "head_pose": dict(DEFAULT_HEAD_POSE),
+            "phone_detected": dict(DEFAULT_PHONE),
+            "identity": None
+        }
+    }
+
+
+def run_snapshot_inference(
+    image,
+    session_id: str,
+    state: dict,
+    profile: Optional[ModelProfile] = None,
+    evidence_id: Optional[str] = None,
+    pipeline: Optional[Pipeline] = None,
+    now: Optional[float] = None,
+) -> dict:
+    """
+    Single fast path for one frame of a session, shared by the API and batch jobs.
+    Updates `state` (see new_session_state) in place.
+    """
+    frame_no = state["frame_count"]
+    state["frame_count"] += 1
+
+    initial = {
+        "image": image,
+        "session_id": session_id,
+        "frame_no": frame_no,
+        "profile": profile or ModelProfile(),
+        "last_result": state["last_result"],
+    }
+    if evidence_id is not None:
+        initial["evidence_id"] = evidence_id
+    if now is not None:
+        initial["now"] = now
+
+    ctx = (pipeline or snapshot_pipeline).run(initial, targets=("features", "temporal"))
+    state["last_result"] = ctx.values["features"]
+
+    return {
+        "features": ctx.values["features"],
+        "temporal": ctx.values["temporal"],
+        "stages": ctx.status,
+        "timings_ms": ctx.timings_ms,
+    }
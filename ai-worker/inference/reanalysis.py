@@ -0,0 +1,190 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+
+from inference.pipeline import build_snapshot_pipeline, new_session_state, run_snapshot_inference
+from schemas.inference import ModelProfile
+from services.face_tracker import FaceTracker
+from services.identity_verifier import IdentityVerifier
+from services.temporal_engine import TemporalEngine
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Manifest format (exported by the backend's reanalysis.py):
+    { "exam_id": ..., "sessions": [ { "session_id", "student_id",
+      "frames": [ { "path", "ts" } ], "existing_violations": [ { "type", "ts" } ] } ] }
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if not isinstance(manifest.get("sessions"), list):
+        raise ValueError("Manifest has no 'sessions' list")
+    return manifest
+
+
+def completed_session_ids(results_path: str) -> set:
+    """Sessions already written to the results file, so an interrupted run can resume."""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                done.add(json.loads(line)["session_id"])
+            except (ValueError, KeyError):
+                # A torn last line from a killed run; that session is simply redone.
+                continue
+    return done
+
+
+def _init_worker():
+    # One session per process already saturates the cores; keep the libraries single-threaded.
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+
+
+def analyze_session(session: dict, profile: Optional[dict] = None) -> dict:
+    """
+    Streams one session's frames in timestamp order through a fresh pipeline and temporal
+    engine whose clock is driven by the frame timestamps.
+    """
+    session_id = session["session_id"]
+    model_profile = ModelProfile(**(profile or {}))
+    pipeline = build_snapshot_pipeline(tracker=FaceTracker(), engine=TemporalEngine(), verifier=IdentityVerifier())
+    state = new_session_state()
+
+    violations = []
+    max_risk = 0
+    analyzed = 0
+    unreadable = 0
+
+    for frame in sorted(session.get("frames") or [], key=lambda f: float(f["ts"])):
+        image = cv2.imread(frame["path"])
+        if image is None:
+            unreadable += 1
+            continue
+
+        result = run_snapshot_inference(
+            image,
+            session_id,
+            state,
+            model_profile,
+            evidence_id=frame["path"],
+            pipeline=pipeline,
+            now=float(frame["ts"]),
+        )
+        analyzed += 1
+        temporal = result["temporal"]
+        max_risk = max(max_risk, temporal["risk_score"])
+        for v in temporal["violations"]:
+            violations.append({**v, "ts": float(frame["ts"])})
+
+    return {
+        "session_id": session_id,
+        "student_id": session.get("student_id"),
+        "frames_analyzed": analyzed,
+        "frames_unreadable": unreadable,
+        "max_risk_score": max_risk,
+        "violations": violations,
+        "existing_violation_counts": dict(Counter(v.get("type") for v in session.get("existing_violations") or [])),
+    }
+
+
+def build_report(exam_id: str, results: Iterable[dict]) -> dict:
+    old_counts = Counter()
+    new_counts = Counter()
+    sessions = []
+    failed = []
+    frames = 0
+
+    for r in results:
+        if r.get("error"):
+            failed.append({"session_id": r["session_id"], "student_id": r.get("student_id"), "error": r["error"]})
+            continue
+        frames += r["frames_analyzed"]
+        session_old = Counter(r.get("existing_violation_counts") or {})
+        session_new = Counter(v["type"] for v in r["violations"])
+        old_counts.update(session_old)
+        new_counts.update(session_new)
+        if session_old != session_new:
+            sessions.append({
+                "session_id": r["session_id"],
+                "student_id": r.get("student_id"),
+                "before": dict(session_old),
+                "after": dict(session_new),
+                "max_risk_score": r["max_risk_score"],
+            })
+
+    types = sorted(set(old_counts) | set(new_counts), key=str)
+    return {
+        "exam_id": exam_id,
+        "frames_analyzed": frames,
+        "violations_by_type": {
+            t: {"before": old_counts.get(t, 0), "after": new_counts.get(t, 0)} for t in types
+        },
+        "changed_sessions": sessions,
+        "failed_sessions": failed,
+    }
+
+
+def run_reanalysis(
+    manifest: dict,
+    results_path: str,
+    workers: Optional[int] = None,
+    profile: Optional[dict] = None,
+) -> List[dict]:
+    """
+    Analyzes every pending session of the manifest in a process pool, appending one JSON
+    line per finished session to `results_path`. Returns all results, including earlier runs.
+
+    A session that raises is written as `{"session_id", "student_id", "error"}` and counts
+    as done, so one bad session neither aborts the job nor fails again on every resume.
+    Sessions lost to a crashed worker process are not written and are redone on resume.
+    """
+    done = completed_session_ids(results_path)
+    pending = [s for s in manifest["sessions"] if s["session_id"] not in done]
+
+    if pending:
+        with open(results_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+        ) as pool:
+            futures = {pool.submit(analyze_session, s, profile): s for s in pending}
+            for future in as_completed(futures):
+                session = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    continue
+                except Exception as exc:
+                    result = {
+                        "session_id": session["session_id"],
+                        "student_id": session.get("student_id"),
+                        "error": f"{type(exc).__name__}: {exc}",
+                    }
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+    results: Dict[str, dict] = {}
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                results[r["session_id"]] = r
+    return list(results.values())
@@ -1,20 +1,92 @@
+import asyncio
 import base64
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
 import cv2
 import numpy as np
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
 
-from schemas.inference import SnapshotInferenceRequest
-from models.face import detect_faces
-from models.headpose import detect_headpose
-from models.phone import detect_phone
+from schemas.inference import AudioChunkRequest, ModelProfile, SnapshotBatchRequest, SnapshotInferenceRequest
+from inference.pipeline import new_session_state, run_snapshot_inference
+from models.audio import decode_pcm
+from services.audio_activity import audio_activity
+from services.face_tracker import face_tracker
+from services.identity_verifier import identity_verifier
+from services.model_profiles import model_profiles
+from services.result_cache import result_cache
+from services.temporal_checkpoint import TemporalCheckpointStore
 from services.temporal_engine import temporal_engine
+from services.temporal_replay import feature_recorder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ai-worker")
+
+# Set to an empty string to disable temporal state checkpoints.
+TEMPORAL_CHECKPOINT_DIR = os.getenv("TEMPORAL_CHECKPOINT_DIR", "data/temporal_checkpoints")
+temporal_checkpoints = TemporalCheckpointStore(TEMPORAL_CHECKPOINT_DIR) if TEMPORAL_CHECKPOINT_DIR else None
+# Largest /infer/batch request accepted; advertised in /health so callers can size batches.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+# Longest audio chunk accepted by /infer/audio; clients stream small chunks continuously.
+MAX_AUDIO_CHUNK_SECONDS = float(os.getenv("MAX_AUDIO_CHUNK_SECONDS", "2"))
+# Per-session state is dropped when the backend ends a session, or after this long without input.
+SESSION_IDLE_EXPIRY_SEC = float(os.getenv("SESSION_IDLE_EXPIRY_SEC", str(2 * 3600)))
+SESSION_EXPIRY_SWEEP_SEC = 60
+
+
+async def _expire_idle_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_EXPIRY_SWEEP_SEC)
+        expire_idle_sessions()
+
 
-app = FastAPI(title="SmartProctor AI Worker")
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if temporal_checkpoints:
+        restored = temporal_checkpoints.restore(temporal_engine)
+        logger.info("Restored temporal state for %d sessions", restored)
+        # Restored sessions expire like any other if their student never comes back.
+        now = time.time()
+        for session_id in list(temporal_engine.sessions):
+            session_last_seen.setdefault(session_id, now)
+        temporal_checkpoints.start(temporal_engine)
+    expiry_task = asyncio.get_running_loop().create_task(_expire_idle_sessions_periodically())
+    try:
+        yield
+    finally:
+        expiry_task.cancel()
+        if temporal_checkpoints:
+            temporal_checkpoints.stop(temporal_engine)
+
+app = FastAPI(title="SmartProctor AI Worker", lifespan=lifespan)
 
 # State for frame skipping
 session_states: Dict[str, dict] = {}
+# Last frame or audio chunk per session, for idle expiry.
+session_last_seen: Dict[str, float] = {}
+
+
+def end_session(session_id: str):
+    """Forget everything held in memory for a session."""
+    session_states.pop(session_id, None)
+    session_last_seen.pop(session_id, None)
+    face_tracker.reset(session_id)
+    identity_verifier.reset(session_id)
+    audio_activity.drop_session(session_id)
+    model_profiles.remove_session_profile(session_id)
+    temporal_engine.drop_session(session_id)
+
+
+def expire_idle_sessions(now: float = None) -> int:
+    now = time.time() if now is None else now
+    idle = [sid for sid, seen in list(session_last_seen.items()) if now - seen > SESSION_IDLE_EXPIRY_SEC]
+    for session_id in idle:
+        end_session(session_id)
+    return len(idle)
 
 
 @app.get("/health")
@@ -22,19 +94,64 @@ def health_check():
     return {
         "status": "healthy",
         "service": "SmartProctor AI Worker",
+        "result_cache": result_cache.stats(),
+        "max_batch": MAX_BATCH_SIZE,
     }
 
+
+@app.put("/profiles/exams/{exam_id}")
+def put_exam_profile(exam_id: str, profile: ModelProfile):
+    model_profiles.set_exam_profile(exam_id, profile)
+    return {"exam_id": exam_id, "profile": profile.model_dump()}
+
+
+@app.delete("/profiles/exams/{exam_id}")
+def delete_exam_profile(exam_id: str):
+    if not model_profiles.remove_exam_profile(exam_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"exam_id": exam_id, "removed": True}
+
+
+@app.put("/profiles/sessions/{session_id}")
+def put_session_profile(session_id: str, profile: ModelProfile):
+    model_profiles.set_session_profile(session_id, profile)
+    return {"session_id": session_id, "profile": profile.model_dump()}
+
+
+@app.delete("/profiles/sessions/{session_id}")
+def delete_session_profile(session_id: str):
+    if not model_profiles.remove_session_profile(session_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"session_id": session_id, "removed": True}
+
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    end_session(session_id)
+    return {"session_id": session_id, "ended": True}
+
+
 @app.post("/infer/snapshot")
 def infer_snapshot(data: SnapshotInferenceRequest):
     if not data.snapshot_path and not data.image_base64:
         raise HTTPException(status_code=400, detail="Must provide snapshot_path or image_base64")
 
+    session_id = data.session_id
+    session_last_seen[session_id] = time.time()
+
     # 1. Decode base64 image
     image = None
     if data.image_base64:
         b64_str = data.image_base64
         if b64_str.startswith('data:image'):
             b64_str = b64_str.split(',')[1]
+
+        # Retried uploads of the same frame get the original answer and are not re-counted.
+        cache_key = result_cache.frame_key(data.frame_id, b64_str.encode("ascii", errors="ignore"))
+        cached = result_cache.get(session_id, cache_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
         try:
             image_bytes = base64.b64decode(b64_str)
             np_arr = np.frombuffer(image_bytes, np.uint8)
@@ -42,60 +159,98 @@ def infer_snapshot(data: SnapshotInferenceRequest):
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid base64 payload")
     else:
-        image = cv2.imread(data.snapshot_path)
+        try:
+            with open(data.snapshot_path, "rb") as f:
+                image_bytes = f.read()
+        except OSError:
+            raise HTTPException(status_code=400, detail="Could not read or decode image")
+
+        cache_key = result_cache.frame_key(data.frame_id, image_bytes)
+        cached = result_cache.get(session_id, cache_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
 
     if image is None:
         raise HTTPException(status_code=400, detail="Could not read or decode image")
 
     # Initialize state
-    session_id = data.session_id
     if session_id not in session_states:
-        session_states[session_id] = {
-            "frame_count": 0,
-            "last_result": {
-                "face_detected": 0,
-                "multiple_faces": False,
-                "head_pose": {
-                    "looking_away": False,
-                    "direction": "center",
-                    "confidence": 0.0,
-                    "blink": False,
-                    "ear": 0.0,
-                    "nose_tip": None
-                },
-                "phone_detected": {
-                    "status": False,
-                    "confidence": 0.0
-                }
-            }
-        }
-
-    state = session_states[session_id]
-    frame_idx = state["frame_count"] % 3
-    state["frame_count"] += 1
-    
-    # 2. Face detection runs on every frame so no-face / multi-face rules stay responsive.
-    faces = detect_faces(image)
-    state["last_result"]["face_detected"] = len(faces)
-    state["last_result"]["multiple_faces"] = len(faces) > 1
-
-    # 3. Heavier models still use frame skipping for performance.
-    if frame_idx == 1:
-        pose = detect_headpose(image)
-        state["last_result"]["head_pose"] = pose
-    elif frame_idx == 2:
-        phone = detect_phone(image)
-        state["last_result"]["phone_detected"] = phone
-
-    # 4. Process Temporal Violations & Anti-Evasion
-    temporal_result = temporal_engine.process_frame(session_id, state["last_result"])
-
-    # 5. Standardize Response (Raw Detections + Aggregated Temporal Violations + Risk Score)
+        session_states[session_id] = new_session_state()
+
+    # 2. Run the stage graph: face tracking every frame, heavier models at the profile's
+    #    cadence and only when the face state makes them meaningful, then temporal rules.
+    profile = model_profiles.resolve(session_id, data.exam_id, data.model_profile)
+    result = run_snapshot_inference(image, session_id, session_states[session_id], profile)
+    feature_recorder.record(session_id, result["features"])
+
+    # 3. Standardize Response (Raw Detections + Aggregated Temporal Violations + Risk Score)
     response = {
         "session_id": data.session_id,
         "student_id": data.student_id,
     }
-    response.update(state["last_result"])
-    response.update(temporal_result)
+    response.update(result["features"])
+    response.update(result["temporal"])
+    response["stage_timings_ms"] = result["timings_ms"]
+
+    result_cache.put(session_id, cache_key, response)
+    return response
+
+
+@app.post("/infer/batch")
+def infer_batch(data: SnapshotBatchRequest):
+    """
+    Background analysis of stored snapshots. Items run in order through the same path as
+    /infer/snapshot; a bad item yields {"error": ...} without failing the rest.
+    """
+    if len(data.items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} items")
+
+    results = []
+    for item in data.items:
+        try:
+            results.append(infer_snapshot(item))
+        except HTTPException as exc:
+            results.append({"session_id": item.session_id, "error": exc.detail})
+    return {"results": results}
+
+
+@app.post("/infer/audio")
+def infer_audio(data: AudioChunkRequest):
+    """
+    Voice activity for one chunk of a session's microphone stream. Chunks must arrive in
+    order; a retried chunk (same chunk_id) gets the original answer.
+    """
+    session_id = data.session_id
+    session_last_seen[session_id] = time.time()
+    profile = model_profiles.resolve(session_id, data.exam_id, data.model_profile)
+    if not profile.audio_enabled:
+        return {"session_id": session_id, "student_id": data.student_id, "audio": None, "violations": [], "risk_score": 0}
+
+    cache_key = result_cache.frame_key(
+        f"audio:{data.chunk_id}" if data.chunk_id else None,
+        data.audio_base64.encode("ascii", errors="ignore"),
+    )
+    cached = result_cache.get(session_id, cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    try:
+        payload = base64.b64decode(data.audio_base64, validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid base64 payload")
+    samples = decode_pcm(payload, data.encoding, data.channels)
+    if len(samples) > MAX_AUDIO_CHUNK_SECONDS * data.sample_rate:
+        raise HTTPException(status_code=413, detail=f"Audio chunk exceeds {MAX_AUDIO_CHUNK_SECONDS:g} seconds")
+
+    audio = audio_activity.process_chunk(session_id, samples, data.sample_rate)
+    response = {
+        "session_id": session_id,
+        "student_id": data.student_id,
+        "audio": audio,
+    }
+    response.update(temporal_engine.process_audio(session_id, audio, chunk_id=data.chunk_id))
 
+    result_cache.put(session_id, cache_key, response)
     return response
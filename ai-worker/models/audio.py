@@ -0,0 +1,97 @@
+from typing import Optional
+
+import numpy as np
+
+FRAME_MS = 20                 # Analysis frame; speech is roughly stationary over 20 ms
+SPEECH_MARGIN_DB = 12.0       # A voiced frame is this much louder than the noise floor
+MIN_SPEECH_DB = -50.0         # ...and never quieter than this (dBFS), however quiet the room
+MAX_SPEECH_ZCR = 0.35         # Higher zero-crossing rates are hiss/fricative noise, not voice
+PITCH_MIN_HZ = 85.0
+PITCH_MAX_HZ = 400.0
+PITCH_MIN_CLARITY = 0.3       # Normalized autocorrelation peak needed to trust a pitch estimate
+
+ENCODINGS = {"pcm_s16le": np.dtype("<i2"), "pcm_f32le": np.dtype("<f4")}
+
+
+def decode_pcm(payload: bytes, encoding: str = "pcm_s16le", channels: int = 1) -> np.ndarray:
+    """Interleaved little-endian PCM -> mono float32 samples in [-1, 1]."""
+    dtype = ENCODINGS[encoding]
+    usable = len(payload) - len(payload) % (dtype.itemsize * channels)
+    samples = np.frombuffer(payload[:usable], dtype=dtype).astype(np.float32)
+    if dtype.kind == "i":
+        samples /= 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def frame_length(sample_rate: int) -> int:
+    return int(sample_rate * FRAME_MS / 1000)
+
+
+def frame_features(frames: np.ndarray, sample_rate: int) -> dict:
+    """
+    Per-frame energy (dBFS), zero-crossing rate and pitch for an (n, frame_len) array, all
+    computed in one vectorized pass. Pitch is NaN where the frame has no clear period.
+    """
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    # Autocorrelation of every frame at once via the FFT (zero-padded to avoid wrap-around).
+    n = frames.shape[1]
+    centered = frames - frames.mean(axis=1, keepdims=True)
+    spectrum = np.fft.rfft(centered, n=2 * n, axis=1)
+    autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, axis=1)[:, :n]
+
+    min_lag = max(1, int(sample_rate / PITCH_MAX_HZ))
+    max_lag = min(n - 1, int(sample_rate / PITCH_MIN_HZ))
+    pitch = np.full(len(frames), np.nan, dtype=np.float32)
+    if max_lag > min_lag:
+        band = autocorr[:, min_lag:max_lag]
+        lags = np.argmax(band, axis=1)
+        clarity = band[np.arange(len(frames)), lags] / (autocorr[:, 0] + 1e-10)
+        periodic = clarity >= PITCH_MIN_CLARITY
+        pitch[periodic] = sample_rate / (lags[periodic] + min_lag)
+
+    return {"energy_db": energy_db, "zcr": zcr, "pitch": pitch}
+
+
+def update_noise_floor(noise_floor: Optional[float], energy_db: np.ndarray) -> float:
+    """
+    Track the room's background level: drop to quiet chunks at once, rise slowly. The
+    first chunk calibrates it, so streams should start before the student speaks.
+    """
+    quiet = float(np.percentile(energy_db, 10))
+    if noise_floor is None or quiet < noise_floor:
+        return quiet
+    return 0.95 * noise_floor + 0.05 * quiet
+
+
+def voiced_frames(features: dict, noise_floor: float) -> np.ndarray:
+    energy_db = features["energy_db"]
+    return (
+        (energy_db > noise_floor + SPEECH_MARGIN_DB)
+        & (energy_db > MIN_SPEECH_DB)
+        & (features["zcr"] < MAX_SPEECH_ZCR)
+    )
+
+
+def distinct_voices(pitches: np.ndarray, min_frames: int = 25, min_share: float = 0.25, min_gap: float = 0.35) -> bool:
+    """
+    Heuristic two-speaker check over recent voiced-frame pitches: split them into two
+    clusters (two-means seeded at the median) and report whether both clusters are
+    substantial and their centers differ by at least `min_gap` of the lower one. One
+    speaker's intonation rarely spreads that far for long.
+    """
+    pitches = pitches[np.isfinite(pitches)]
+    if len(pitches) < min_frames:
+        return False
+    split = float(np.median(pitches))
+    for _ in range(3):
+        low, high = pitches[pitches <= split], pitches[pitches > split]
+        if len(low) == 0 or len(high) == 0:
+            return False
+        split = (low.mean() + high.mean()) / 2
+    share = min(len(low), len(high)) / len(pitches)
+    return bool(share >= min_share and high.mean() >= low.mean() * (1 + min_gap))
@@ -10,15 +10,11 @@ except Exception:
 _cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
 haar_face = cv2.CascadeClassifier(_cascade_path)
 
+# Haar cascades do not report a score; treat their hits as moderately confident.
+HAAR_SCORE = 0.8
 
-def detect_faces(image):
-    if mp_face is not None:
-        rgb = image[:, :, ::-1]
-        result = mp_face.process(rgb)
-        detections = result.detections or []
-        if detections:
-            return detections
 
+def _haar_faces(image):
     if haar_face.empty():
         return []
 
@@ -33,3 +29,37 @@ def detect_faces(image):
         return []
     return list(faces)
 
+
+def detect_faces(image):
+    if mp_face is not None:
+        rgb = image[:, :, ::-1]
+        result = mp_face.process(rgb)
+        detections = result.detections or []
+        if detections:
+            return detections
+
+    return _haar_faces(image)
+
+
+def detect_face_boxes(image):
+    """
+    Returns [(x, y, w, h, score), ...] in pixel coordinates of `image`.
+    """
+    img_h, img_w = image.shape[:2]
+    if mp_face is not None:
+        rgb = image[:, :, ::-1]
+        result = mp_face.process(rgb)
+        detections = result.detections or []
+        if detections:
+            boxes = []
+            for det in detections:
+                rel = det.location_data.relative_bounding_box
+                x = max(0, int(rel.xmin * img_w))
+                y = max(0, int(rel.ymin * img_h))
+                w = min(img_w - x, int(rel.width * img_w))
+                h = min(img_h - y, int(rel.height * img_h))
+                score = float(det.score[0]) if det.score else 0.0
+                boxes.append((x, y, w, h, score))
+            return boxes
+
+    return [(int(x), int(y), int(w), int(h), HAAR_SCORE) for (x, y, w, h) in _haar_faces(image)]
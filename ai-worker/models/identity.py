@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+# Compact appearance embedding: uniform LBP histograms over a grid of the aligned face crop.
+EMBED_SIZE = 64
+GRID = 4
+LBP_MARGIN = 3
+
+# Offsets of the 8 neighbours, clockwise from top-left.
+_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _uniform_lut() -> np.ndarray:
+    # Codes with at most two 0/1 transitions get their own bin; everything else shares the last one.
+    lut = np.full(256, 58, dtype=np.uint8)
+    next_bin = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transitions <= 2:
+            lut[code] = next_bin
+            next_bin += 1
+    return lut
+
+
+_LUT = _uniform_lut()
+_BINS = 59
+
+
+def _lbp(gray: np.ndarray) -> np.ndarray:
+    gray = gray.astype(np.int16)
+    center = gray[1:-1, 1:-1]
+    h, w = center.shape
+    codes = np.zeros((h, w), dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(_NEIGHBOURS):
+        neighbour = gray[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        # The margin keeps near-flat regions (skin, background) from flipping bits on noise.
+        codes |= (neighbour >= center + LBP_MARGIN).astype(np.uint8) << bit
+    return _LUT[codes]
+
+
+def face_embedding(image, box):
+    """
+    L2-normalized embedding of the face at `box` (x, y, w, h), or None if the crop is empty.
+    """
+    x, y, w, h = [int(v) for v in box[:4]]
+    crop = image[max(0, y):y + h, max(0, x):x + w]
+    if crop.size == 0:
+        return None
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    # LBP is invariant to monotonic lighting changes, so no histogram equalization; just smooth sensor noise.
+    gray = cv2.GaussianBlur(cv2.resize(gray, (EMBED_SIZE, EMBED_SIZE), interpolation=cv2.INTER_AREA), (3, 3), 0)
+    codes = _lbp(gray)
+
+    cell = codes.shape[0] // GRID
+    cells = codes[:cell * GRID, :cell * GRID].reshape(GRID, cell, GRID, cell).swapaxes(1, 2).reshape(GRID * GRID, -1)
+    offsets = np.arange(GRID * GRID)[:, None] * _BINS
+    hist = np.bincount((cells + offsets).ravel(), minlength=GRID * GRID * _BINS).astype(np.float32)
+
+    # Square root (Hellinger) so cosine similarity behaves like a histogram distance.
+    hist = np.sqrt(hist)
+    norm = np.linalg.norm(hist)
+    return hist / norm if norm > 0 else None
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b))
@@ -0,0 +1,100 @@
+import numpy as np
+
+# FaceMesh landmark indices.
+# Eyes: 0=outer, 1=top_outer, 2=top_inner, 3=inner, 4=bottom_inner, 5=bottom_outer
+EYE_INDICES = np.array([
+    [362, 385, 387, 263, 373, 380],  # left eye
+    [33, 160, 158, 133, 153, 144],   # right eye
+])
+# Nose tip, right eye, left mouth, chin, left eye, right mouth (ascending index order, as used for PnP)
+PNP_INDICES = np.array([1, 33, 61, 152, 263, 291])
+NOSE_TIP_INDEX = 1
+
+# Iris centers exist only with refine_landmarks=True (478 landmarks).
+IRIS_CENTER_INDICES = np.array([473, 468])         # left, right
+EYE_CORNER_INDICES = np.array([[362, 263], [33, 133]])  # per eye, either order
+EYE_LID_INDICES = np.array([[386, 374], [159, 145]])    # per eye: upper, lower
+REFINED_LANDMARK_COUNT = 478
+
+BLINK_EAR_THRESHOLD = 0.2
+GAZE_HORIZONTAL_MARGIN = 0.35  # Iris within [margin, 1 - margin] of the eye width counts as center
+GAZE_VERTICAL_MARGIN = 0.30
+
+
+def landmarks_to_array(face_landmarks) -> np.ndarray:
+    """(N, 3) array of normalized x, y, z for every FaceMesh landmark."""
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark], dtype=np.float64)
+
+
+def eye_aspect_ratios(pixels: np.ndarray) -> np.ndarray:
+    """EAR of (left, right) eye from (N, 2+) pixel coordinates."""
+    eyes = pixels[EYE_INDICES, :2]  # (2, 6, 2)
+    v1 = np.linalg.norm(eyes[:, 1] - eyes[:, 5], axis=1)
+    v2 = np.linalg.norm(eyes[:, 2] - eyes[:, 4], axis=1)
+    h = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=1)
+    return (v1 + v2) / (2.0 * h + 1e-6)
+
+
+def pnp_points(pixels: np.ndarray):
+    """2D image points and 3D model points for solvePnP, truncated to whole pixels like before."""
+    pts = pixels[PNP_INDICES]
+    xy = np.trunc(pts[:, :2])
+    face_2d = np.ascontiguousarray(xy, dtype=np.float64)
+    face_3d = np.ascontiguousarray(np.column_stack((xy, pts[:, 2])), dtype=np.float64)
+    return face_2d, face_3d
+
+
+def gaze(pixels: np.ndarray):
+    """
+    Iris position within each eye, averaged over both eyes, in camera perspective.
+    Returns None when the landmarks were not refined (no iris points).
+    """
+    if len(pixels) < REFINED_LANDMARK_COUNT:
+        return None
+
+    iris = pixels[IRIS_CENTER_INDICES, :2]   # (2, 2)
+    corners_x = pixels[EYE_CORNER_INDICES, 0]  # (2, 2)
+    lids_y = pixels[EYE_LID_INDICES, 1]        # (2, 2)
+
+    left_x = corners_x.min(axis=1)
+    width = corners_x.max(axis=1) - left_x
+    horizontal = float(np.mean((iris[:, 0] - left_x) / (width + 1e-6)))
+    vertical = float(np.mean((iris[:, 1] - lids_y[:, 0]) / (lids_y[:, 1] - lids_y[:, 0] + 1e-6)))
+
+    direction = "center"
+    if horizontal < GAZE_HORIZONTAL_MARGIN:
+        direction = "left"
+    elif horizontal > 1.0 - GAZE_HORIZONTAL_MARGIN:
+        direction = "right"
+    elif vertical < GAZE_VERTICAL_MARGIN:
+        direction = "up"
+    elif vertical > 1.0 - GAZE_VERTICAL_MARGIN:
+        direction = "down"
+
+    return {
+        "direction": direction,
+        "looking_away": direction != "center",
+        "horizontal": round(horizontal, 3),
+        "vertical": round(vertical, 3),
+    }
+
+
+def face_geometry(face_landmarks, img_w: int, img_h: int) -> dict:
+    """
+    All per-frame geometry from one conversion of the landmark list.
+    """
+    normalized = landmarks_to_array(face_landmarks)
+    pixels = normalized * np.array([img_w, img_h, img_w], dtype=np.float64)
+
+    left_ear, right_ear = eye_aspect_ratios(pixels)
+    avg_ear = float((left_ear + right_ear) / 2.0)
+    face_2d, face_3d = pnp_points(pixels)
+
+    return {
+        "ear": avg_ear,
+        "blink": avg_ear < BLINK_EAR_THRESHOLD,
+        "nose_tip": normalized[NOSE_TIP_INDEX, :2].tolist(),
+        "face_2d": face_2d,
+        "face_3d": face_3d,
+        "gaze": gaze(pixels),
+    }
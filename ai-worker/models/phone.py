@@ -41,7 +41,7 @@ def _best_phone_confidence(phone_model, image, size):
 
     return best_conf
 
-def detect_phone(image):
+def detect_phone(image, confirm_confidence: float = CONFIRM_CONFIDENCE):
     phone_model = _get_model()
     if phone_model is None:
         return {
@@ -60,7 +60,7 @@ def detect_phone(image):
 
         # Stage 2: confirm at higher resolution before flagging.
         high_res_conf = _best_phone_confidence(phone_model, image, 640)
-        status = high_res_conf >= CONFIRM_CONFIDENCE or (low_res_conf >= 0.60 and high_res_conf >= SUSPICIOUS_CONFIDENCE)
+        status = high_res_conf >= confirm_confidence or (low_res_conf >= 0.60 and high_res_conf >= SUSPICIOUS_CONFIDENCE)
         best_conf = max(low_res_conf, high_res_conf)
 
         return {
@@ -0,0 +1,52 @@
+"""
+Re-score a completed exam from its stored snapshots.
+
+    python reanalyze.py <exam_id> --manifest manifest.json [--out reanalysis] [--workers N] [--profile profile.json]
+
+The manifest comes from `python reanalysis.py export <exam_id>` in the backend. Results are
+appended per session to <out>/<exam_id>.sessions.jsonl, so re-running the same command resumes
+an interrupted job. The before/after comparison is written to <out>/<exam_id>.report.json.
+"""
+import argparse
+import json
+import os
+
+from inference.reanalysis import build_report, load_manifest, run_reanalysis
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-analyze stored snapshots for a completed exam")
+    parser.add_argument("exam_id")
+    parser.add_argument("--manifest", required=True)
+    parser.add_argument("--out", default="reanalysis")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--profile", default=None, help="JSON file with a model profile")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    if manifest.get("exam_id") and manifest["exam_id"] != args.exam_id:
+        parser.error(f"Manifest is for exam {manifest['exam_id']}, not {args.exam_id}")
+
+    profile = None
+    if args.profile:
+        with open(args.profile, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+
+    os.makedirs(args.out, exist_ok=True)
+    results_path = os.path.join(args.out, f"{args.exam_id}.sessions.jsonl")
+    results = run_reanalysis(manifest, results_path, workers=args.workers, profile=profile)
+
+    report = build_report(args.exam_id, results)
+    report_path = os.path.join(args.out, f"{args.exam_id}.report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Analyzed {len(results)} sessions ({report['frames_analyzed']} frames)")
+    if report["failed_sessions"]:
+        print(f"Failed:  {len(report['failed_sessions'])} sessions (see the report)")
+    print(f"Results: {results_path}")
+    print(f"Report:  {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Replay recorded raw-feature streams through the TemporalEngine to tune thresholds.
+
+    python replay_temporal.py features.jsonl [--set COOLDOWN_SEC=5 --set BLINK_TIMEOUT_SEC=90] [--interval 3]
+
+Streams are recorded by the worker when TEMPORAL_RECORD_PATH is set. The engine runs on a
+replay clock, so a day of traffic takes seconds instead of hours.
+"""
+import argparse
+import json
+
+from services.temporal_replay import DEFAULT_FRAME_INTERVAL_SEC, read_feature_stream, replay
+
+
+def _parse_override(value: str):
+    name, _, raw = value.partition("=")
+    if not name or not raw:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got '{value}'")
+    return name.strip(), float(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay raw-feature JSONL through the TemporalEngine")
+    parser.add_argument("stream", nargs="+", help="JSONL files of recorded frames")
+    parser.add_argument("--set", dest="overrides", action="append", type=_parse_override, default=[],
+                        help="Override an engine setting, e.g. COOLDOWN_SEC=5")
+    parser.add_argument("--interval", type=float, default=DEFAULT_FRAME_INTERVAL_SEC,
+                        help="Seconds between frames that carry no timestamp")
+    args = parser.parse_args()
+
+    def frames():
+        for path in args.stream:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from read_feature_stream(f, interval=args.interval)
+
+    report = replay(frames(), overrides=dict(args.overrides))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,53 @@
 # schemas/inference.py
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+class ModelProfile(BaseModel):
+    # Which detectors run. Face presence always runs since every other rule depends on it.
+    headpose_enabled: bool = True
+    phone_enabled: bool = True
+    identity_enabled: bool = True
+    # Off unless the exam requires the microphone (the backend sets it from mic_required).
+    audio_enabled: bool = False
+
+    # Cadence: run the model on every Nth frame of a session.
+    headpose_every: int = Field(default=3, ge=1)
+    phone_every: int = Field(default=3, ge=1)
+    # Identity re-checks also happen whenever the face track is lost and reacquired.
+    identity_every: int = Field(default=20, ge=1)
+
+    # Thresholds; None keeps the worker defaults.
+    phone_confirm_confidence: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    phone_temporal_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    looking_away_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    identity_match_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)
 
 class SnapshotInferenceRequest(BaseModel):
     snapshot_path: Optional[str] = None
     image_base64: Optional[str] = None
     session_id: str
     student_id: str
+    exam_id: Optional[str] = None
+    # Client-generated id that stays the same across retries of one frame.
+    frame_id: Optional[str] = None
+    # The exam's profile as the backend currently sees it; survives worker restarts.
+    model_profile: Optional[ModelProfile] = None
+
+class SnapshotBatchRequest(BaseModel):
+    items: List[SnapshotInferenceRequest]
+
+class AudioChunkRequest(BaseModel):
+    session_id: str
+    student_id: str
+    exam_id: Optional[str] = None
+    # Raw little-endian PCM; compressed streams (e.g. Opus) are decoded by the client first.
+    audio_base64: str
+    encoding: Literal["pcm_s16le", "pcm_f32le"] = "pcm_s16le"
+    sample_rate: int = Field(default=16000, ge=8000, le=48000)
+    channels: int = Field(default=1, ge=1, le=2)
+    # Client-generated id that stays the same across retries of one chunk.
+    chunk_id: Optional[str] = None
+    model_profile: Optional[ModelProfile] = None
 
 class ViolationResult(BaseModel):
     type: str
@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+from models.audio import FRAME_MS, distinct_voices, frame_features, frame_length, update_noise_floor, voiced_frames
+
+
+class AudioActivityTracker:
+    """
+    Streaming voice-activity analysis per session.
+
+    Chunks of any length are cut into fixed 20 ms frames; the partial frame at the end of a
+    chunk is carried over to the next one. Per session only that remainder, the noise floor
+    and a bounded window of recent voiced-frame pitches are kept, so memory stays constant
+    however long the stream runs.
+    """
+
+    def __init__(self, pitch_window: int = 250):
+        # Format: { session_id: { "sample_rate": int, "remainder": ndarray, "noise_floor": float | None, "pitches": deque } }
+        self.sessions: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.PITCH_WINDOW = pitch_window  # Voiced frames (~5 s of speech) used for the speaker check
+
+    def _get_state(self, session_id: str, sample_rate: int) -> dict:
+        state = self.sessions.get(session_id)
+        if state is None or state["sample_rate"] != sample_rate:
+            state = self.sessions[session_id] = {
+                "sample_rate": sample_rate,
+                "remainder": np.zeros(0, dtype=np.float32),
+                "noise_floor": None,
+                "pitches": deque(maxlen=self.PITCH_WINDOW),
+            }
+        return state
+
+    def process_chunk(self, session_id: str, samples: np.ndarray, sample_rate: int) -> dict:
+        """
+        Analyze mono float samples; returns the chunk's audio features for TemporalEngine.
+        """
+        flen = frame_length(sample_rate)
+        with self.lock:
+            state = self._get_state(session_id, sample_rate)
+            samples = np.concatenate((state["remainder"], samples))
+            n_frames = len(samples) // flen
+            state["remainder"] = samples[n_frames * flen:].copy()
+            noise_floor = state["noise_floor"]
+
+        if n_frames == 0:
+            return {"chunk_ms": 0, "speech_ms": 0, "speech_ratio": 0.0, "energy_db": None,
+                    "noise_floor_db": noise_floor, "pitch_hz": None, "multiple_speakers": False}
+
+        features = frame_features(samples[:n_frames * flen].reshape(n_frames, flen), sample_rate)
+        noise_floor = update_noise_floor(noise_floor, features["energy_db"])
+        voiced = voiced_frames(features, noise_floor)
+        voiced_pitch = features["pitch"][voiced]
+
+        with self.lock:
+            state = self._get_state(session_id, sample_rate)
+            state["noise_floor"] = noise_floor
+            state["pitches"].extend(voiced_pitch[np.isfinite(voiced_pitch)].tolist())
+            recent_pitches = np.fromiter(state["pitches"], dtype=np.float32)
+
+        n_voiced = int(voiced.sum())
+        finite = voiced_pitch[np.isfinite(voiced_pitch)]
+        return {
+            "chunk_ms": n_frames * FRAME_MS,
+            "speech_ms": n_voiced * FRAME_MS,
+            "speech_ratio": round(n_voiced / n_frames, 3),
+            "energy_db": round(float(features["energy_db"].mean()), 1),
+            "noise_floor_db": round(noise_floor, 1),
+            "pitch_hz": round(float(np.median(finite)), 1) if len(finite) else None,
+            # Only meaningful while someone is talking in this chunk.
+            "multiple_speakers": n_voiced > 0 and distinct_voices(recent_pitches),
+        }
+
+    def drop_session(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+
+audio_activity = AudioActivityTracker()
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from models.face import detect_face_boxes
+
+
+class FaceTracker:
+    """
+    Follows the student's face between full-frame detections.
+
+    After a confident single-face detection the next frames only run the detector on a
+    region of interest around the last box. Full-frame detection is re-run periodically,
+    and immediately whenever the ROI loses the face or sees more than one. Tracked frames
+    also get a cheap downscaled full-frame check, so a second person entering outside the
+    ROI forces a full detection on that frame instead of waiting for the periodic one.
+    """
+
+    def __init__(self):
+        # Format: { session_id: { "box": (x, y, w, h) | None, "score": 0.0, "frames_since_full": 0, "mode": "full", "acquisitions": 0 } }
+        self.sessions: Dict[str, dict] = {}
+
+        self.FULL_DETECT_INTERVAL = 5   # Force a full-frame detection every N frames
+        self.MIN_TRACK_CONFIDENCE = 0.6 # Below this the box is not trusted for tracking
+        self.ROI_MARGIN = 0.6           # Expand the last box by this fraction on each side
+        self.MIN_ROI_SIZE = 96          # Detectors struggle on tiny crops
+        self.SENTINEL_SCALE = 0.5       # Downscale of the full-frame check on tracked frames
+
+    def _get_state(self, session_id: str) -> dict:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = {
+                "box": None,
+                "score": 0.0,
+                "frames_since_full": 0,
+                "mode": "full",
+                "acquisitions": 0,
+            }
+        return self.sessions[session_id]
+
+    def _expand(self, box: Tuple[int, int, int, int], img_w: int, img_h: int) -> Tuple[int, int, int, int]:
+        x, y, w, h = box
+        half_w = max(int(w * (0.5 + self.ROI_MARGIN)), self.MIN_ROI_SIZE // 2)
+        half_h = max(int(h * (0.5 + self.ROI_MARGIN)), self.MIN_ROI_SIZE // 2)
+        cx, cy = x + w // 2, y + h // 2
+        x0, y0 = max(0, cx - half_w), max(0, cy - half_h)
+        x1, y1 = min(img_w, cx + half_w), min(img_h, cy + half_h)
+        return x0, y0, x1, y1
+
+    def _accept(self, state: dict, faces: List[tuple]):
+        if len(faces) == 1 and faces[0][4] >= self.MIN_TRACK_CONFIDENCE:
+            if state["box"] is None:
+                # A new track: the face may not be the one seen before it was lost.
+                state["acquisitions"] += 1
+            state["box"] = tuple(faces[0][:4])
+            state["score"] = faces[0][4]
+        else:
+            state["box"] = None
+            state["score"] = 0.0
+
+    def _face_outside(self, image, roi: Tuple[int, int, int, int]) -> bool:
+        """
+        Cheap full-frame check: does a downscaled copy of the frame show a face whose
+        centre lies outside the ROI? Faces too small to survive the downscale are still
+        caught by the periodic full detection.
+        """
+        x0, y0, x1, y1 = roi
+        scale = self.SENTINEL_SCALE
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        for fx, fy, fw, fh, _ in detect_face_boxes(small):
+            cx, cy = (fx + fw / 2) / scale, (fy + fh / 2) / scale
+            if not (x0 <= cx < x1 and y0 <= cy < y1):
+                return True
+        return False
+
+    def detect(self, session_id: str, image) -> List[tuple]:
+        """
+        Returns [(x, y, w, h, score), ...] in full-frame pixel coordinates.
+        """
+        state = self._get_state(session_id)
+        img_h, img_w = image.shape[:2]
+
+        if state["box"] is not None and state["frames_since_full"] < self.FULL_DETECT_INTERVAL:
+            x0, y0, x1, y1 = self._expand(state["box"], img_w, img_h)
+            faces = detect_face_boxes(image[y0:y1, x0:x1])
+            if (
+                len(faces) == 1
+                and faces[0][4] >= self.MIN_TRACK_CONFIDENCE
+                and not self._face_outside(image, (x0, y0, x1, y1))
+            ):
+                fx, fy, fw, fh, score = faces[0]
+                tracked = (fx + x0, fy + y0, fw, fh, score)
+                self._accept(state, [tracked])
+                state["frames_since_full"] += 1
+                state["mode"] = "track"
+                return [tracked]
+
+        # Tracking lost, another face seen, not yet established or due for a refresh:
+        # scan the whole frame.
+        faces = detect_face_boxes(image)
+        self._accept(state, faces)
+        state["frames_since_full"] = 0
+        state["mode"] = "full"
+        return faces
+
+    def roi(self, session_id: str, image) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Crop bounds (x0, y0, x1, y1) around the tracked face for downstream face models,
+        or None when no single face is currently tracked.
+        """
+        state = self.sessions.get(session_id)
+        if not state or state["box"] is None:
+            return None
+        img_h, img_w = image.shape[:2]
+        return self._expand(state["box"], img_w, img_h)
+
+    def acquisition(self, session_id: str) -> int:
+        """
+        Counter bumped each time a face track starts, so consumers can tell a continuous
+        track from a face that was lost and reacquired.
+        """
+        state = self.sessions.get(session_id)
+        return state["acquisitions"] if state else 0
+
+    def reset(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+
+face_tracker = FaceTracker()
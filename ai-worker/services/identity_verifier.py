@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from models.identity import face_embedding, similarity
+
+
+class IdentityVerifier:
+    """
+    Checks that the face on camera is still the one enrolled at the start of the session.
+
+    The reference embedding is built from the first few single-face frames and cached per
+    session. After that an embedding is only computed when the face track was lost and
+    reacquired, while a mismatch is being confirmed, or every `every` frames.
+    """
+
+    def __init__(self):
+        # Format: { session_id: { "reference": ndarray | None, "enroll": [], "acquisition": 0, "last_check_frame": -1, "mismatches": 0 } }
+        self.sessions: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+        self.ENROLL_FRAMES = 3       # Embeddings averaged into the reference
+        self.MATCH_THRESHOLD = 0.9   # Cosine similarity at or above this is the same person
+        self.ENROLL_AGREEMENT = 0.95 # Enrollment frames must agree with each other this well
+
+    def _get_state(self, session_id: str) -> dict:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = {
+                "reference": None,
+                "enroll": [],
+                "acquisition": 0,
+                "last_check_frame": -1,
+                "mismatches": 0,
+            }
+        return self.sessions[session_id]
+
+    def due(self, session_id: str, acquisition: int, frame_no: int, every: int) -> bool:
+        with self.lock:
+            state = self.sessions.get(session_id)
+            if state is None or state["reference"] is None:
+                return True
+            if acquisition != state["acquisition"] or state["mismatches"]:
+                return True
+            return frame_no - state["last_check_frame"] >= every
+
+    def verify(self, session_id: str, image, box, acquisition: int, frame_no: int, threshold: Optional[float] = None) -> Optional[dict]:
+        """
+        Returns the check result, or None when no usable embedding could be taken.
+        """
+        embedding = face_embedding(image, box)
+        if embedding is None:
+            return None
+        threshold = self.MATCH_THRESHOLD if threshold is None else threshold
+
+        with self.lock:
+            state = self._get_state(session_id)
+            state["acquisition"] = acquisition
+            state["last_check_frame"] = frame_no
+
+            if state["reference"] is None:
+                enroll = state["enroll"]
+                if enroll and similarity(embedding, enroll[0]) < self.ENROLL_AGREEMENT:
+                    # Someone else (or a bad crop) during enrollment: start over from this frame.
+                    enroll.clear()
+                enroll.append(embedding)
+                if len(enroll) >= self.ENROLL_FRAMES:
+                    reference = np.mean(enroll, axis=0)
+                    state["reference"] = reference / np.linalg.norm(reference)
+                    enroll.clear()
+                return {"checked": True, "enrolled": state["reference"] is not None, "match": True, "similarity": None, "mismatches": 0}
+
+            score = similarity(embedding, state["reference"])
+            match = score >= threshold
+            state["mismatches"] = 0 if match else state["mismatches"] + 1
+            return {
+                "checked": True,
+                "enrolled": True,
+                "match": match,
+                "similarity": round(score, 3),
+                "mismatches": state["mismatches"],
+            }
+
+    def reset(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+
+identity_verifier = IdentityVerifier()
@@ -0,0 +1,41 @@
+from typing import Dict, Optional
+
+from schemas.inference import ModelProfile
+
+
+class ModelProfileRegistry:
+    """
+    Model profiles registered by the backend. A session profile overrides its exam profile;
+    sessions with neither run every model at the default cadence. A profile sent along with
+    a request replaces the registered exam profile, so a restarted worker recovers it from
+    the next request.
+    """
+
+    def __init__(self):
+        self.exam_profiles: Dict[str, ModelProfile] = {}
+        self.session_profiles: Dict[str, ModelProfile] = {}
+        self.default_profile = ModelProfile()
+
+    def set_exam_profile(self, exam_id: str, profile: ModelProfile):
+        self.exam_profiles[exam_id] = profile
+
+    def set_session_profile(self, session_id: str, profile: ModelProfile):
+        self.session_profiles[session_id] = profile
+
+    def remove_exam_profile(self, exam_id: str) -> bool:
+        return self.exam_profiles.pop(exam_id, None) is not None
+
+    def remove_session_profile(self, session_id: str) -> bool:
+        return self.session_profiles.pop(session_id, None) is not None
+
+    def resolve(self, session_id: str, exam_id: Optional[str] = None, inline: Optional[ModelProfile] = None) -> ModelProfile:
+        if inline is not None and exam_id:
+            self.exam_profiles[exam_id] = inline
+        if session_id in self.session_profiles:
+            return self.session_profiles[session_id]
+        if exam_id and exam_id in self.exam_profiles:
+            return self.exam_profiles[exam_id]
+        return inline or self.default_profile
+
+
+model_profiles = ModelProfileRegistry()
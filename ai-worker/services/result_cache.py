@@ -0,0 +1,61 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ResultCache:
+    """
+    Bounded LRU of recent inference responses keyed by (session_id, frame key).
+
+    Lets retried uploads of the same frame return the original response without
+    re-running the models or appending the frame to temporal history again.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_sec: float = 120.0):
+        self.MAX_ENTRIES = max_entries
+        self.TTL_SEC = ttl_sec
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def frame_key(frame_id: Optional[str] = None, payload: Optional[bytes] = None) -> Optional[str]:
+        # Only client-identified retries are deduplicated. Identical frames without an id
+        # are real observations (covered camera, static image) the temporal rules must see.
+        if not frame_id:
+            return None
+        # The content hash is part of the key: a client reusing one frame_id for different
+        # frames must not get an old answer back.
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest() if payload else None
+        return f"id:{frame_id}:{digest}" if digest else f"id:{frame_id}"
+
+    def get(self, session_id: str, key: Optional[str]) -> Optional[dict]:
+        if key is None:
+            return None
+        entry = self._entries.get((session_id, key))
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, response = entry
+        if time.time() - stored_at > self.TTL_SEC:
+            del self._entries[(session_id, key)]
+            self.misses += 1
+            return None
+        self._entries.move_to_end((session_id, key))
+        self.hits += 1
+        return response
+
+    def put(self, session_id: str, key: Optional[str], response: dict):
+        if key is None:
+            return
+        self._entries[(session_id, key)] = (time.time(), response)
+        self._entries.move_to_end((session_id, key))
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+result_cache = ResultCache()
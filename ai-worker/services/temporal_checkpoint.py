@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+from services.temporal_engine import TemporalEngine
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SPTC1\n"
+# Record header: payload length, saved-at timestamp. Payload: zlib-compressed JSON.
+# A null state is a tombstone for an ended session.
+_HEADER = struct.Struct("<Id")
+
+
+def _encode(session_id: str, state: Optional[dict], saved_at: float) -> bytes:
+    payload = zlib.compress(
+        json.dumps({"session_id": session_id, "state": state}, separators=(",", ":"), default=float).encode("utf-8")
+    )
+    return _HEADER.pack(len(payload), saved_at) + payload
+
+
+def _read_records(path: str) -> Iterator[Tuple[float, str, Optional[dict]]]:
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length, saved_at = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                # Torn write from a crash; everything before it is still valid.
+                return
+            try:
+                record = json.loads(zlib.decompress(payload))
+            except (zlib.error, ValueError):
+                return
+            yield saved_at, record["session_id"], record["state"]
+
+
+class TemporalCheckpointStore:
+    """
+    Durable per-session TemporalEngine state.
+
+    Changed sessions are appended to `temporal.log` on every checkpoint. Once the log holds
+    `compact_after` records it is folded into `temporal.snapshot` (written to a temp file and
+    renamed) and truncated. Restore reads the snapshot, then the log, and skips sessions whose
+    last checkpoint is older than `expiry_sec` or that ended. Compaction keeps each session's
+    original save time, so expiry is not pushed back by compacting.
+    """
+
+    def __init__(self, directory: str, interval_sec: float = 5.0, expiry_sec: float = 6 * 3600, compact_after: int = 5000):
+        self.directory = directory
+        self.INTERVAL_SEC = interval_sec
+        self.EXPIRY_SEC = expiry_sec
+        self.COMPACT_AFTER = compact_after
+
+        self.log_path = os.path.join(directory, "temporal.log")
+        self.snapshot_path = os.path.join(directory, "temporal.snapshot")
+        self._log_records = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_records(self) -> Dict[str, Tuple[float, dict]]:
+        now = time.time()
+        latest: Dict[str, Tuple[float, dict]] = {}
+        self._log_records = 0
+        for path in (self.snapshot_path, self.log_path):
+            for saved_at, session_id, state in _read_records(path):
+                if state is None:
+                    latest.pop(session_id, None)
+                else:
+                    latest[session_id] = (saved_at, state)
+                if path == self.log_path:
+                    self._log_records += 1
+        return {sid: record for sid, record in latest.items() if now - record[0] <= self.EXPIRY_SEC}
+
+    def load(self) -> Dict[str, dict]:
+        return {sid: state for sid, (saved_at, state) in self._load_records().items()}
+
+    def restore(self, engine: TemporalEngine) -> int:
+        states = self.load()
+        engine.restore_sessions(states)
+        return len(states)
+
+    def _append(self, states: Dict[str, Optional[dict]]):
+        os.makedirs(self.directory, exist_ok=True)
+        saved_at = time.time()
+        new_file = not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0
+        with open(self.log_path, "ab") as f:
+            if new_file:
+                f.write(MAGIC)
+            f.write(b"".join(_encode(sid, state, saved_at) for sid, state in states.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_records += len(states)
+
+    def _compact(self):
+        records = self._load_records()
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(b"".join(_encode(sid, state, saved_at) for sid, (saved_at, state) in records.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # The snapshot now holds everything in the log.
+        open(self.log_path, "wb").close()
+        self._log_records = 0
+
+    def checkpoint(self, engine: TemporalEngine) -> int:
+        states: Dict[str, Optional[dict]] = dict(engine.export_dirty())
+        states.update((sid, None) for sid in engine.export_dropped())
+        if not states:
+            return 0
+        with self._lock:
+            self._append(states)
+            if self._log_records >= self.COMPACT_AFTER:
+                self._compact()
+        return len(states)
+
+    def _run(self, engine: TemporalEngine):
+        while not self._stop.wait(self.INTERVAL_SEC):
+            try:
+                self.checkpoint(engine)
+            except Exception as exc:
+                logger.exception("Temporal checkpoint failed: %s", exc)
+
+    def start(self, engine: TemporalEngine):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(engine,), name="temporal-checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self, engine: TemporalEngine):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.INTERVAL_SEC + 1)
+        self._thread = None
+        # Final flush so a graceful redeploy loses nothing.
+        self.checkpoint(engine)
@@ -1,31 +1,117 @@
+import copy
+import threading
 import time
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 class TemporalEngine:
-    def __init__(self):
-        # Format: { session_id: { "history": [], "last_trigger": {}, "last_blink_ts": 0.0, "adaptive_thresholds": {} } }
+    def __init__(self, clock: Callable[[], float] = time.time):
+        # Injectable so replays and tests can drive cooldowns and timeouts without waiting.
+        self.clock = clock
+
+        # Format: { session_id: { "history": [], "audio_history": [], "last_trigger": {}, "last_blink_ts": 0.0, "adaptive_thresholds": {} } }
         self.sessions: Dict[str, dict] = {}
+        # Sessions changed, and sessions ended, since the last checkpoint export.
+        self.dirty: set = set()
+        self.dropped: set = set()
+        self.lock = threading.RLock()
         
         self.MAX_HISTORY = 15       # Keep last 15 valid frames
         self.COOLDOWN_SEC = 10      # Cooldown array
         self.DEFAULT_THRESHOLD = 0.6
         self.BLINK_TIMEOUT_SEC = 60 # Flag if no blink for 60 seconds
+        self.IDENTITY_CONFIRM_CHECKS = 2 # Consecutive failed identity checks before flagging
+        self.MAX_AUDIO_HISTORY = 30 # Keep last 30 audio chunks
+        self.SPEECH_WINDOW_SEC = 10
+        self.SPEECH_CONFIRM_MS = 3000 # Speech within the window before flagging
         
-    def _get_state(self, session_id: str) -> dict:
+    def _get_state(self, session_id: str, now: Optional[float] = None) -> dict:
         if session_id not in self.sessions:
+            self.dropped.discard(session_id)
             self.sessions[session_id] = {
                 "history": [],
+                "audio_history": [],
                 "last_trigger": {},
-                "last_blink_ts": time.time(),
+                "last_blink_ts": self.clock() if now is None else now,
                 "last_valid_blink_signal_ts": 0.0,
                 "valid_blink_frame_count": 0,
                 "adaptive_thresholds": {
                     "PHONE_DETECTED": self.DEFAULT_THRESHOLD,
                     "LOOKING_AWAY": self.DEFAULT_THRESHOLD
-                }
+                },
+                "base_thresholds": {}
             }
         return self.sessions[session_id]
 
+    def set_base_thresholds(self, session_id: str, thresholds: Dict[str, float], now: Optional[float] = None):
+        """
+        Per-session starting points for the adaptive thresholds (e.g. from an exam model profile).
+        """
+        thresholds = {k: v for k, v in thresholds.items() if v is not None}
+        if not thresholds:
+            return
+        with self.lock:
+            state = self._get_state(session_id, now)
+            for ev_type, value in thresholds.items():
+                if ev_type not in state["adaptive_thresholds"]:
+                    continue
+                if state["base_thresholds"].get(ev_type) != value:
+                    state["base_thresholds"][ev_type] = value
+                    state["adaptive_thresholds"][ev_type] = value
+                    self.dirty.add(session_id)
+
+    def export_dirty(self) -> Dict[str, dict]:
+        """
+        Copies of the sessions changed since the previous call, for checkpointing.
+        """
+        with self.lock:
+            exported = {sid: copy.deepcopy(self.sessions[sid]) for sid in self.dirty if sid in self.sessions}
+            self.dirty.clear()
+        return exported
+
+    def export_all(self) -> Dict[str, dict]:
+        with self.lock:
+            self.dirty.clear()
+            return copy.deepcopy(self.sessions)
+
+    def export_dropped(self) -> List[str]:
+        with self.lock:
+            dropped, self.dropped = list(self.dropped), set()
+        return dropped
+
+    def restore_sessions(self, states: Dict[str, dict], now: Optional[float] = None):
+        """
+        Load checkpointed sessions, shifting their timestamps so the last frame is `now`.
+        Downtime is then not mistaken for elapsed exam time (e.g. a NO_BLINK on the first
+        frame after a restart), while gaps between earlier frames are kept.
+        """
+        now = self.clock() if now is None else now
+        with self.lock:
+            for session_id, state in states.items():
+                offset = now - state.get("updated_at", now)
+                if offset > 0:
+                    self._shift_timestamps(state, offset)
+                self.sessions[session_id] = state
+
+    @staticmethod
+    def _shift_timestamps(state: dict, offset: float):
+        for key in ("updated_at", "last_blink_ts", "last_valid_blink_signal_ts"):
+            if state.get(key):
+                state[key] += offset
+        state["last_trigger"] = {ev_type: ts + offset for ev_type, ts in state.get("last_trigger", {}).items()}
+        for key in ("history", "audio_history"):
+            for entry in state.get(key, []):
+                entry["ts"] += offset
+
+    def drop_session(self, session_id: str):
+        """Forget an ended session; the next checkpoint records it so a restart does not restore it."""
+        with self.lock:
+            if self.sessions.pop(session_id, None) is not None:
+                self.dropped.add(session_id)
+            self.dirty.discard(session_id)
+
+    def _base_threshold(self, state: dict, ev_type: str) -> float:
+        return state["base_thresholds"].get(ev_type, self.DEFAULT_THRESHOLD)
+
     def _calculate_score(self, active_violations: List[dict]) -> int:
         score = 0
         for v in active_violations:
@@ -35,15 +121,26 @@ class TemporalEngine:
             elif vt == "MULTIPLE_FACES": score += 50
             elif vt == "LOOKING_AWAY": score += 20
             elif vt == "SPOOF_DETECTED": score += 40
+            elif vt == "IDENTITY_MISMATCH": score += 10
+            elif vt == "SPEECH_DETECTED": score += 20
+            elif vt == "MULTIPLE_SPEAKERS": score += 40
         return score
 
-    def process_frame(self, session_id: str, raw_features: dict, current_image_path: str = None) -> dict:
+    def process_frame(self, session_id: str, raw_features: dict, current_image_path: str = None, now: Optional[float] = None) -> dict:
         """
         raw_features format: { "face_detected": 1, "multiple_faces": False, "head_pose": { ... }, "phone_detected": { ... } }
+        now: frame timestamp for offline replays; defaults to the engine clock.
         """
-        state = self._get_state(session_id)
+        with self.lock:
+            return self._process_frame(session_id, raw_features, current_image_path, now)
+
+    def _process_frame(self, session_id: str, raw_features: dict, current_image_path: Optional[str], now: Optional[float]) -> dict:
+        if now is None:
+            now = self.clock()
+        state = self._get_state(session_id, now)
+        state["updated_at"] = now
+        self.dirty.add(session_id)
         history = state["history"]
-        now = time.time()
         
         # Attach a fallback timestamp ID if current_image_path isn't provided (just for traceability)
         evidence_id = current_image_path if current_image_path else f"frame_{int(now*1000)}"
@@ -74,7 +171,7 @@ class TemporalEngine:
             # Adaptive Threshold: lower slightly if repeated
             state["adaptive_thresholds"]["PHONE_DETECTED"] = max(0.4, phone_thresh - 0.05)
         else:
-            state["adaptive_thresholds"]["PHONE_DETECTED"] = min(self.DEFAULT_THRESHOLD, phone_thresh + 0.01)
+            state["adaptive_thresholds"]["PHONE_DETECTED"] = min(self._base_threshold(state, "PHONE_DETECTED"), phone_thresh + 0.01)
 
         # 2. No Face Temporal Check (3 of last 5)
         recent_faces_hist = history[-5:]
@@ -118,7 +215,20 @@ class TemporalEngine:
             })
             state["adaptive_thresholds"]["LOOKING_AWAY"] = max(0.4, pose_thresh - 0.05)
         else:
-            state["adaptive_thresholds"]["LOOKING_AWAY"] = min(self.DEFAULT_THRESHOLD, pose_thresh + 0.01)
+            state["adaptive_thresholds"]["LOOKING_AWAY"] = min(self._base_threshold(state, "LOOKING_AWAY"), pose_thresh + 0.01)
+
+        # Identity: the face no longer matches the enrolled reference in consecutive checks
+        identity = raw_features.get("identity") or {}
+        if identity.get("checked") and not identity.get("match", True) and identity.get("mismatches", 0) >= self.IDENTITY_CONFIRM_CHECKS:
+            detected_events.append({
+                "type": "IDENTITY_MISMATCH",
+                "reason": f"Face on camera did not match the student enrolled at session start in {identity['mismatches']} consecutive checks (similarity {identity.get('similarity')}).",
+                # The frames whose identity check failed, not simply the latest frames.
+                "window": [
+                    h for h in history
+                    if (h["raw"].get("identity") or {}).get("checked") and not h["raw"]["identity"].get("match", True)
+                ][-identity["mismatches"]:]
+            })
 
         # 4. Anti-Spoofing (Liveness Checks)
         spoof_event = None
@@ -208,4 +318,69 @@ class TemporalEngine:
             "risk_score": risk_score
         }
 
+    def process_audio(self, session_id: str, audio: dict, chunk_id: Optional[str] = None, now: Optional[float] = None) -> dict:
+        """
+        audio format: { "chunk_ms": int, "speech_ms": int, "speech_ratio": float, "multiple_speakers": bool, ... }
+        Audio chunks keep their own history so they never shift the frame-based windows.
+        """
+        with self.lock:
+            if now is None:
+                now = self.clock()
+            state = self._get_state(session_id, now)
+            state["updated_at"] = now
+            self.dirty.add(session_id)
+            # Sessions restored from checkpoints written before audio analysis existed.
+            history = state.setdefault("audio_history", [])
+            history.append({
+                "ts": now,
+                "raw": audio,
+                "evidence_id": chunk_id or f"audio_{int(now*1000)}"
+            })
+            if len(history) > self.MAX_AUDIO_HISTORY:
+                history.pop(0)
+
+            detected_events = []
+
+            # 1. Sustained speech: enough voiced audio within the recent window
+            speech_hist = [h for h in history if now - h["ts"] <= self.SPEECH_WINDOW_SEC and h["raw"].get("speech_ms", 0) > 0]
+            speech_ms = sum(h["raw"]["speech_ms"] for h in speech_hist)
+            if speech_ms >= self.SPEECH_CONFIRM_MS:
+                detected_events.append({
+                    "type": "SPEECH_DETECTED",
+                    "reason": f"Speech detected for {speech_ms / 1000:.1f}s within the last {self.SPEECH_WINDOW_SEC} seconds.",
+                    "window": speech_hist,
+                    "confidence": sum(h["raw"].get("speech_ratio", 0) for h in speech_hist) / len(speech_hist)
+                })
+
+            # 2. Multiple speakers (2 of last 3 chunks)
+            recent_multi_hist = history[-3:]
+            multi_count = sum(1 for h in recent_multi_hist if h["raw"].get("multiple_speakers", False))
+            if multi_count >= 2:
+                detected_events.append({
+                    "type": "MULTIPLE_SPEAKERS",
+                    "reason": f"More than one distinct voice heard in {multi_count} of the last {len(recent_multi_hist)} audio chunks.",
+                    "window": recent_multi_hist,
+                    "confidence": 0.7
+                })
+
+            violations = []
+            for ev in detected_events:
+                ev_type = ev["type"]
+                if now - state["last_trigger"].get(ev_type, 0) < self.COOLDOWN_SEC:
+                    continue
+                state["last_trigger"][ev_type] = now
+                window = ev["window"]
+                violations.append({
+                    "type": ev_type,
+                    "confidence": round(max(0.5, min(0.95, ev["confidence"])), 2),
+                    "reason": ev["reason"],
+                    "evidence_ids": [w["evidence_id"] for w in window],
+                    "duration_ms": int((window[-1]["ts"] - window[0]["ts"]) * 1000) + window[-1]["raw"].get("chunk_ms", 0)
+                })
+
+            return {
+                "violations": violations,
+                "risk_score": self._calculate_score(violations)
+            }
+
 temporal_engine = TemporalEngine()
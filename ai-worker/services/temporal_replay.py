@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, Optional
+
+from services.temporal_engine import TemporalEngine
+
+DEFAULT_SESSION_ID = "replay"
+DEFAULT_FRAME_INTERVAL_SEC = 3.0  # Matches the client's normal capture interval
+
+
+class ReplayClock:
+    """Clock for TemporalEngine that only moves when the replay sets it."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def set(self, ts: float):
+        self.now = ts
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FeatureRecorder:
+    """
+    Appends every frame's raw features as JSONL so real traffic can be replayed later.
+    Enabled in the worker by setting TEMPORAL_RECORD_PATH.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(self, session_id: str, features: dict, ts: Optional[float] = None):
+        if not self.path:
+            return
+        line = json.dumps({"session_id": session_id, "ts": ts if ts is not None else time.time(), "features": features})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def read_feature_stream(lines: Iterable[str], interval: float = DEFAULT_FRAME_INTERVAL_SEC) -> Iterator[dict]:
+    """
+    Accepts either recorder lines ({"session_id", "ts", "features"}) or bare `last_result`
+    dicts. Frames without a timestamp are spaced `interval` seconds after the session's previous one.
+    """
+    last_ts: Dict[str, float] = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if "features" in record:
+            session_id = record.get("session_id") or DEFAULT_SESSION_ID
+            features = record["features"]
+            ts = record.get("ts")
+        else:
+            session_id = record.pop("session_id", None) or DEFAULT_SESSION_ID
+            ts = record.pop("ts", None)
+            features = record
+
+        if ts is None:
+            ts = last_ts.get(session_id, 0.0) + interval
+        ts = float(ts)
+        last_ts[session_id] = ts
+        yield {"session_id": session_id, "ts": ts, "features": features}
+
+
+def replay(frames: Iterable[dict], overrides: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Feeds frames through a fresh TemporalEngine on a replay clock and summarizes the outcome.
+    `overrides` sets engine tunables such as COOLDOWN_SEC or BLINK_TIMEOUT_SEC.
+    """
+    clock = ReplayClock()
+    engine = TemporalEngine(clock=clock)
+    for name, value in (overrides or {}).items():
+        if not hasattr(engine, name):
+            raise ValueError(f"Unknown TemporalEngine setting: {name}")
+        setattr(engine, name, value)
+
+    frame_count = 0
+    hits = Counter()
+    per_session = defaultdict(Counter)
+    session_frames = Counter()
+    risk_scores = []
+
+    started = time.perf_counter()
+    for frame in frames:
+        clock.set(frame["ts"])
+        result = engine.process_frame(frame["session_id"], frame["features"])
+        frame_count += 1
+        session_frames[frame["session_id"]] += 1
+        risk_scores.append(result["risk_score"])
+        for v in result["violations"]:
+            hits[v["type"]] += 1
+            per_session[frame["session_id"]][v["type"]] += 1
+    elapsed = time.perf_counter() - started
+
+    risk_scores.sort()
+    return {
+        "frames": frame_count,
+        "sessions": len(session_frames),
+        "elapsed_sec": round(elapsed, 4),
+        "frames_per_sec": round(frame_count / elapsed, 1) if elapsed > 0 else None,
+        "violations": dict(hits),
+        "hit_rate_per_1000_frames": {t: round(1000.0 * n / frame_count, 3) for t, n in hits.items()} if frame_count else {},
+        "sessions_flagged": {t: sum(1 for c in per_session.values() if c[t]) for t in hits},
+        "risk_score": {
+            "mean": round(sum(risk_scores) / len(risk_scores), 3) if risk_scores else 0.0,
+            "p95": risk_scores[int(0.95 * (len(risk_scores) - 1))] if risk_scores else 0,
+            "max": risk_scores[-1] if risk_scores else 0,
+            "nonzero_frames": sum(1 for r in risk_scores if r > 0),
+        },
+    }
+
+
+feature_recorder = FeatureRecorder(os.getenv("TEMPORAL_RECORD_PATH"))
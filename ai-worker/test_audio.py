@@ -0,0 +1,89 @@
+import base64
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from services.audio_activity import AudioActivityTracker
+from services.temporal_engine import TemporalEngine
+
+RATE = 16000
+
+
+def _voice(pitch_hz, seconds, amplitude=0.3):
+    t = np.arange(int(RATE * seconds)) / RATE
+    # A few harmonics, like a voiced vowel.
+    wave = sum(np.sin(2 * np.pi * pitch_hz * k * t) / k for k in range(1, 4))
+    return (amplitude * wave / 1.8).astype(np.float32)
+
+
+def _room(seconds, rng):
+    return (0.002 * rng.standard_normal(int(RATE * seconds))).astype(np.float32)
+
+
+def test_speech_is_separated_from_room_noise_across_chunk_boundaries():
+    rng = np.random.default_rng(0)
+    tracker = AudioActivityTracker()
+
+    quiet = tracker.process_chunk("s1", _room(1.0, rng), RATE)
+    assert quiet["speech_ms"] == 0
+
+    # 0.33 s chunks do not align with the 20 ms frames; the remainder carries over.
+    speech = [tracker.process_chunk("s1", _voice(140, 0.33) + _room(0.33, rng), RATE) for _ in range(3)]
+    assert sum(c["chunk_ms"] for c in speech) == 980
+    assert all(c["speech_ratio"] > 0.9 for c in speech)
+    assert abs(speech[-1]["pitch_hz"] - 140) < 10
+    assert not speech[-1]["multiple_speakers"]
+    assert len(tracker.sessions["s1"]["remainder"]) < RATE * 0.02
+
+
+def test_two_distinct_voices_are_flagged():
+    rng = np.random.default_rng(1)
+    tracker = AudioActivityTracker()
+    tracker.process_chunk("s1", _room(0.5, rng), RATE)
+    chunk = None
+    for _ in range(3):
+        chunk = tracker.process_chunk("s1", np.concatenate([_voice(110, 0.5), _voice(240, 0.5)]), RATE)
+    assert chunk["multiple_speakers"]
+
+
+def test_sustained_speech_and_speakers_become_violations():
+    clock = [1000.0]
+    engine = TemporalEngine(clock=lambda: clock[0])
+    talking = {"chunk_ms": 1000, "speech_ms": 900, "speech_ratio": 0.9, "multiple_speakers": True}
+
+    results = []
+    for _ in range(4):
+        results.append(engine.process_audio("s1", talking))
+        clock[0] += 1.0
+    types = [v["type"] for r in results for v in r["violations"]]
+    assert types.count("MULTIPLE_SPEAKERS") == 1
+    assert types.count("SPEECH_DETECTED") == 1
+    # Audio does not touch the frame history the visual rules use.
+    assert engine.sessions["s1"]["history"] == []
+
+
+def test_audio_endpoint_streams_chunks():
+    client = TestClient(app)
+    # The stream opens with a moment of room noise, which calibrates the noise floor.
+    samples = np.concatenate([_room(0.2, np.random.default_rng(2)), _voice(150, 0.5)])
+    pcm = (samples * 32767).astype("<i2").tobytes()
+    payload = {
+        "session_id": "test_sess_audio",
+        "student_id": "test_stud_audio",
+        "audio_base64": base64.b64encode(pcm).decode("ascii"),
+        "chunk_id": "c1",
+        "model_profile": {"audio_enabled": True},
+    }
+    first = client.post("/infer/audio", json=payload).json()
+    assert first["audio"]["speech_ms"] > 0
+    assert client.post("/infer/audio", json=payload).json()["cached"]
+
+    too_long = {**payload, "chunk_id": "c2", "audio_base64": base64.b64encode(pcm * 3).decode("ascii")}
+    assert client.post("/infer/audio", json=too_long).status_code == 413
+
+    # Without a profile that enables it, the microphone stream is not analyzed.
+    default = {**payload, "session_id": "test_sess_audio_off", "chunk_id": "c3"}
+    del default["model_profile"]
+    skipped = client.post("/infer/audio", json=default).json()
+    assert skipped["audio"] is None and skipped["violations"] == []
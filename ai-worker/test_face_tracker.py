@@ -0,0 +1,38 @@
+import numpy as np
+
+from services import face_tracker as face_tracker_module
+from services.face_tracker import FaceTracker
+
+
+def test_face_entering_outside_roi_forces_full_detection(monkeypatch):
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    student = (280, 200, 80, 80, 0.9)
+    intruder = (20, 20, 80, 80, 0.9)
+    full_frame = [[student]]
+    calls = []
+
+    def fake_detect(img):
+        h, w = img.shape[:2]
+        if (h, w) == (480, 640):
+            calls.append("full")
+            return full_frame[0]
+        if (h, w) == (240, 320):
+            calls.append("sentinel")
+            return [tuple(int(v / 2) for v in box[:4]) + (box[4],) for box in full_frame[0]]
+        calls.append("roi")
+        return [(40, 40, 80, 80, 0.9)]
+
+    monkeypatch.setattr(face_tracker_module, "detect_face_boxes", fake_detect)
+    tracker = FaceTracker()
+
+    assert tracker.detect("s1", image) == [student]
+    tracker.detect("s1", image)
+    assert tracker.sessions["s1"]["mode"] == "track"
+    assert calls == ["full", "roi", "sentinel"]
+
+    # A second face appears outside the ROI: it is reported on this frame, not after the interval.
+    full_frame[0] = [student, intruder]
+    calls.clear()
+    assert len(tracker.detect("s1", image)) == 2
+    assert calls == ["roi", "sentinel", "full"]
+    assert tracker.sessions["s1"]["mode"] == "full"
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+from services.identity_verifier import IdentityVerifier
+
+
+def _student():
+    img = np.full((120, 120, 3), 90, np.uint8)
+    cv2.ellipse(img, (60, 60), (40, 50), 0, 0, 360, (200, 180, 160), -1)
+    cv2.circle(img, (45, 50), 6, (20, 20, 20), -1)
+    cv2.circle(img, (75, 50), 6, (20, 20, 20), -1)
+    cv2.line(img, (45, 85), (75, 85), (40, 40, 120), 3)
+    return img
+
+
+def _other():
+    img = np.zeros((120, 120, 3), np.uint8)
+    for i in range(0, 120, 12):
+        cv2.line(img, (i, 0), (120 - i, 120), (255, 255, 255), 2)
+    return img
+
+
+def test_reference_is_enrolled_once_and_rechecked_on_events():
+    verifier = IdentityVerifier()
+    student, other = _student(), _other()
+    box = (10, 10, 100, 100)
+
+    for frame_no in range(verifier.ENROLL_FRAMES):
+        assert verifier.due("s1", 1, frame_no, every=20)
+        result = verifier.verify("s1", student, box, 1, frame_no)
+    assert result["enrolled"]
+
+    # Same continuous track: nothing to do until the periodic re-check.
+    assert not verifier.due("s1", 1, 5, every=20)
+    assert verifier.due("s1", 1, 2 + 20, every=20)
+    # Track lost and reacquired: check immediately.
+    assert verifier.due("s1", 2, 5, every=20)
+
+    result = verifier.verify("s1", other, box, 2, 5)
+    assert not result["match"] and result["mismatches"] == 1
+    # A pending mismatch is confirmed on the next frame.
+    assert verifier.due("s1", 2, 6, every=20)
+    assert verifier.verify("s1", student, box, 2, 6)["match"]
+
+
+def test_identity_violation_evidence_is_the_failed_checks():
+    from services.temporal_engine import TemporalEngine
+
+    clock = [1000.0]
+    engine = TemporalEngine(clock=lambda: clock[0])
+    face = {"face_detected": 1, "multiple_faces": False, "head_pose": {}, "phone_detected": {}}
+
+    def frame(identity=None):
+        clock[0] += 1.0
+        return engine.process_frame("s1", {**face, "identity": identity or {}}, current_image_path=f"f{int(clock[0])}")
+
+    frame({"checked": True, "match": False, "mismatches": 1})
+    frame()  # not checked
+    result = frame({"checked": True, "match": False, "mismatches": 2})
+
+    violation = next(v for v in result["violations"] if v["type"] == "IDENTITY_MISMATCH")
+    assert violation["evidence_ids"] == ["f1001", "f1003"]
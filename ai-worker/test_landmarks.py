@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from models.landmarks import EYE_INDICES, PNP_INDICES, face_geometry
+
+
+def _face(points):
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in points])
+
+
+def _reference_ear(eye, landmarks, w, h):
+    def dist(a, b):
+        return np.linalg.norm(np.array([landmarks[a].x * w, landmarks[a].y * h]) - np.array([landmarks[b].x * w, landmarks[b].y * h]))
+    return (dist(eye[1], eye[5]) + dist(eye[2], eye[4])) / (2.0 * dist(eye[0], eye[3]) + 1e-6)
+
+
+def test_geometry_matches_per_landmark_computation():
+    rng = np.random.default_rng(7)
+    face = _face(rng.random((468, 3)))
+    w, h = 640, 480
+
+    geometry = face_geometry(face, w, h)
+
+    expected_ear = np.mean([_reference_ear(eye, face.landmark, w, h) for eye in EYE_INDICES])
+    assert abs(geometry["ear"] - expected_ear) < 1e-9
+    expected_2d = [[int(face.landmark[i].x * w), int(face.landmark[i].y * h)] for i in PNP_INDICES]
+    assert geometry["face_2d"].tolist() == expected_2d
+    assert geometry["nose_tip"] == [face.landmark[1].x, face.landmark[1].y]
+    assert geometry["gaze"] is None
+
+
+def test_gaze_from_refined_iris_points():
+    points = np.full((478, 3), 0.5)
+    # Eye corners and lids around a 0.1 x 0.04 box per eye.
+    for outer, inner, upper, lower, iris, cx in ((263, 362, 386, 374, 473, 0.6), (33, 133, 159, 145, 468, 0.4)):
+        points[outer, :2] = (cx - 0.05, 0.5)
+        points[inner, :2] = (cx + 0.05, 0.5)
+        points[upper, :2] = (cx, 0.48)
+        points[lower, :2] = (cx, 0.52)
+        points[iris, :2] = (cx - 0.04, 0.5)
+
+    gaze = face_geometry(_face(points), 640, 480)["gaze"]
+
+    assert gaze["direction"] == "left"
+    assert gaze["looking_away"] is True
+    assert gaze["horizontal"] < 0.2
@@ -0,0 +1,73 @@
+import numpy as np
+
+from inference.pipeline import Pipeline, Stage, build_snapshot_pipeline, new_session_state, run_snapshot_inference
+from schemas.inference import ModelProfile
+from services.temporal_engine import TemporalEngine
+
+
+class _FixedTracker:
+    def __init__(self, faces):
+        self.faces = faces
+
+    def detect(self, session_id, image):
+        return self.faces
+
+    def roi(self, session_id, image):
+        return None
+
+    def acquisition(self, session_id):
+        return 1
+
+
+def test_stages_are_memoized_and_conditions_applied():
+    calls = []
+
+    def source(x):
+        calls.append("source")
+        return x * 2
+
+    pipeline = Pipeline([
+        Stage("doubled", source, inputs=("x",)),
+        Stage("plus_one", lambda doubled: doubled + 1, inputs=("doubled",)),
+        Stage("times_ten", lambda doubled: doubled * 10, inputs=("doubled",)),
+        Stage("never", lambda x: calls.append("never"), inputs=("x",), when=lambda a: False),
+        Stage("gated", lambda x: "ran", inputs=("x",), requires=lambda a: a["x"] > 5, fallback=lambda a: "fallback"),
+        Stage("after_never", lambda never: "ran", inputs=("never",)),
+    ])
+
+    ctx = pipeline.run({"x": 2}, targets=("plus_one", "times_ten", "gated", "after_never"))
+
+    assert calls == ["source"]
+    assert ctx.values["plus_one"] == 5
+    assert ctx.values["times_ten"] == 40
+    assert ctx.values["gated"] == "fallback"
+    assert ctx.status["never"] == "skipped"
+    assert ctx.status["after_never"] == "skipped"
+    assert set(ctx.timings_ms) == {"doubled", "plus_one", "times_ten"}
+
+
+def test_snapshot_pipeline_skips_face_models_without_a_single_face():
+    pipeline = build_snapshot_pipeline(tracker=_FixedTracker([]), engine=TemporalEngine())
+    state = new_session_state()
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    profile = ModelProfile(phone_enabled=False, headpose_every=1)
+
+    result = run_snapshot_inference(image, "sess", state, profile, pipeline=pipeline)
+
+    assert result["stages"]["head_pose"] == "fallback"
+    assert result["stages"]["phone"] == "skipped"
+    assert result["features"]["face_detected"] == 0
+    assert result["features"]["head_pose"]["looking_away"] is False
+    assert state["frame_count"] == 1
+
+
+def test_request_profile_restores_a_lost_exam_profile():
+    from services.model_profiles import ModelProfileRegistry
+
+    registry = ModelProfileRegistry()
+    assert registry.resolve("sess", "exam") is registry.default_profile  # e.g. after a restart
+
+    sent = ModelProfile(phone_enabled=False)
+    assert registry.resolve("sess", "exam", sent) == sent
+    # Later requests without the profile keep using it.
+    assert registry.resolve("sess2", "exam") == sent
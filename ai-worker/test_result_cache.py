@@ -0,0 +1,93 @@
+import base64
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from services.result_cache import ResultCache
+from services.temporal_engine import temporal_engine
+
+client = TestClient(app)
+
+
+def _frame_b64(value: int) -> str:
+    img = np.full((120, 160, 3), value, dtype=np.uint8)
+    _, buffer = cv2.imencode('.jpg', img)
+    return base64.b64encode(buffer).decode('utf-8')
+
+
+def test_retried_frame_is_not_reprocessed():
+    session_id = "test_sess_retry"
+    payload = {
+        "image_base64": _frame_b64(10),
+        "session_id": session_id,
+        "student_id": "test_stud_retry",
+        "frame_id": "f0",
+    }
+
+    first = client.post("/infer/snapshot", json=payload).json()
+    history_len = len(temporal_engine.sessions[session_id]["history"])
+
+    retried = client.post("/infer/snapshot", json=payload).json()
+    assert retried["cached"] is True
+    assert retried["risk_score"] == first["risk_score"]
+    assert len(temporal_engine.sessions[session_id]["history"]) == history_len
+
+    fresh = client.post("/infer/snapshot", json={**payload, "image_base64": _frame_b64(200)}).json()
+    assert "cached" not in fresh
+    assert len(temporal_engine.sessions[session_id]["history"]) == history_len + 1
+
+    # A reused frame_id with new content is analyzed.
+    reused = client.post("/infer/snapshot", json={**payload, "frame_id": "f1"}).json()
+    assert "cached" not in reused
+    reused = client.post("/infer/snapshot", json={**payload, "frame_id": "f1", "image_base64": _frame_b64(90)}).json()
+    assert "cached" not in reused
+    assert len(temporal_engine.sessions[session_id]["history"]) == history_len + 3
+
+    # Frames without an id are always processed, even when byte-identical (covered camera).
+    no_id = {k: v for k, v in payload.items() if k != "frame_id"}
+    for _ in range(3):
+        assert "cached" not in client.post("/infer/snapshot", json=no_id).json()
+    assert len(temporal_engine.sessions[session_id]["history"]) == history_len + 6
+
+
+def test_frame_id_is_bound_to_content_and_cache_is_bounded():
+    cache = ResultCache(max_entries=2)
+    key = cache.frame_key("client-frame-1", b"frame")
+    assert key.startswith("id:client-frame-1:")
+    # Reusing a frame_id for a different frame is a miss, not the old answer.
+    assert cache.frame_key("client-frame-1", b"other frame") != key
+
+    # Without a frame_id there is no key, so nothing is cached.
+    assert cache.frame_key(payload=b"frame") is None
+
+    cache.put("s", key, {"risk_score": 1})
+    cache.put("s", cache.frame_key("a", b"a"), {"risk_score": 2})
+    cache.put("s", cache.frame_key("b", b"b"), {"risk_score": 3})
+
+    assert cache.get("s", key) is None
+    assert cache.get("s", cache.frame_key("b", b"b")) == {"risk_score": 3}
+    assert cache.get("other", cache.frame_key("b", b"b")) is None
+
+
+def test_ended_and_idle_sessions_release_worker_state():
+    import main
+    from services.face_tracker import face_tracker
+
+    for session_id in ("test_sess_end", "test_sess_idle"):
+        client.post("/infer/snapshot", json={
+            "image_base64": _frame_b64(30),
+            "session_id": session_id,
+            "student_id": "test_stud_end",
+        })
+        assert session_id in face_tracker.sessions
+
+    assert client.delete("/sessions/test_sess_end").json()["ended"]
+    assert "test_sess_end" not in face_tracker.sessions
+    assert "test_sess_end" not in main.session_states
+
+    main.session_last_seen["test_sess_idle"] -= main.SESSION_IDLE_EXPIRY_SEC + 1
+    assert main.expire_idle_sessions() >= 1
+    assert "test_sess_idle" not in face_tracker.sessions
+    assert "test_sess_idle" not in main.session_last_seen
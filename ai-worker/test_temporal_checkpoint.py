@@ -0,0 +1,74 @@
+import time
+
+from services.temporal_checkpoint import TemporalCheckpointStore
+from services.temporal_engine import TemporalEngine
+
+
+def _no_face_frame():
+    return {"face_detected": 0, "multiple_faces": False, "head_pose": {}, "phone_detected": {}}
+
+
+def test_checkpointed_sessions_are_restored(tmp_path):
+    engine = TemporalEngine()
+    store = TemporalCheckpointStore(str(tmp_path))
+    for _ in range(3):
+        engine.process_frame("s1", _no_face_frame())
+    assert store.checkpoint(engine) == 1
+    assert store.checkpoint(engine) == 0  # nothing changed since
+
+    restored = TemporalEngine()
+    assert TemporalCheckpointStore(str(tmp_path)).restore(restored) == 1
+    assert len(restored.sessions["s1"]["history"]) == 3
+
+
+def test_ended_sessions_are_not_restored(tmp_path):
+    engine = TemporalEngine()
+    store = TemporalCheckpointStore(str(tmp_path))
+    engine.process_frame("s1", _no_face_frame())
+    engine.process_frame("s2", _no_face_frame())
+    store.checkpoint(engine)
+
+    engine.drop_session("s1")
+    store.checkpoint(engine)
+    assert set(TemporalCheckpointStore(str(tmp_path)).load()) == {"s2"}
+
+
+def test_compaction_keeps_save_time_so_old_sessions_expire(tmp_path, monkeypatch):
+    clock = [10_000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    engine = TemporalEngine(clock=lambda: clock[0])
+    store = TemporalCheckpointStore(str(tmp_path), expiry_sec=100, compact_after=2)
+
+    engine.process_frame("old", _no_face_frame())
+    store.checkpoint(engine)
+
+    # Later checkpoints of other sessions compact the log; "old" must keep its save time.
+    for i in range(3):
+        clock[0] += 40
+        engine.process_frame(f"new{i}", _no_face_frame())
+        store.checkpoint(engine)
+        assert store._log_records < 2
+
+    assert "old" not in store.load()
+    assert {"new1", "new2"} <= set(store.load())
+
+
+def test_restored_timestamps_are_rebased_past_downtime(tmp_path):
+    clock = [1_000.0]
+    engine = TemporalEngine(clock=lambda: clock[0])
+    store = TemporalCheckpointStore(str(tmp_path))
+    for _ in range(3):
+        clock[0] += 1
+        engine.process_frame("s1", _no_face_frame())
+    store.checkpoint(engine)
+    saved = engine.sessions["s1"]
+
+    # The worker comes back an hour later.
+    clock[0] += 3600
+    restored = TemporalEngine(clock=lambda: clock[0])
+    TemporalCheckpointStore(str(tmp_path)).restore(restored)
+    state = restored.sessions["s1"]
+
+    assert state["updated_at"] == clock[0]
+    assert clock[0] - state["last_blink_ts"] == saved["updated_at"] - saved["last_blink_ts"]
+    assert [h["ts"] - state["history"][0]["ts"] for h in state["history"]] == [0, 1, 2]
@@ -0,0 +1,28 @@
+import json
+
+from services.temporal_replay import read_feature_stream, replay
+
+
+def _no_face_frame():
+    return {"face_detected": 0, "multiple_faces": False, "head_pose": {}, "phone_detected": {}}
+
+
+def test_replay_uses_frame_time_for_cooldowns():
+    # 60 seconds of no-face frames, one per second.
+    lines = [json.dumps({"session_id": "s1", "ts": 1000 + i, "features": _no_face_frame()}) for i in range(60)]
+
+    report = replay(read_feature_stream(lines))
+    # NO_FACE needs 3 of 5 frames, then fires at most once per 10 s cooldown.
+    assert report["frames"] == 60
+    assert report["violations"]["NO_FACE"] == 6
+
+    shorter_cooldown = replay(read_feature_stream(lines), overrides={"COOLDOWN_SEC": 5})
+    assert shorter_cooldown["violations"]["NO_FACE"] == 12
+
+
+def test_bare_feature_lines_are_spaced_by_interval():
+    lines = [json.dumps(_no_face_frame()) for _ in range(4)]
+    frames = list(read_feature_stream(lines, interval=2.0))
+
+    assert [f["ts"] for f in frames] == [2.0, 4.0, 6.0, 8.0]
+    assert {f["session_id"] for f in frames} == {"replay"}
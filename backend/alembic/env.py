@@ -12,6 +12,7 @@ from app.models.exam_attempt import ExamAttempt
 from app.models.exam_question import ExamQuestion
 from app.models.exam_rules import ExamRules
 from app.models.exam_session import ExamSession
+from app.models.presence_interval import PresenceInterval
 from app.models.proctor import ProctorAssignment
 from app.models.question import Question
 from app.models.snapshot import Snapshot
@@ -0,0 +1,32 @@
+"""background snapshot analysis fields
+
+Revision ID: 0004_snapshot_analysis
+Revises: 0003_grading_flow
+Create Date: 2026-10-19 10:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_snapshot_analysis"
+down_revision: Union[str, Sequence[str], None] = "0003_grading_flow"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing snapshots predate background analysis and are not queued retroactively.
+    with op.batch_alter_table("snapshots") as batch_op:
+        batch_op.add_column(sa.Column("analysis_status", sa.String(), nullable=False, server_default="skipped"))
+        batch_op.add_column(sa.Column("analysis_result", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("analyzed_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("snapshots") as batch_op:
+        batch_op.drop_column("analyzed_at")
+        batch_op.drop_column("analysis_result")
+        batch_op.drop_column("analysis_status")
@@ -0,0 +1,38 @@
+"""presence intervals
+
+Revision ID: 0005_presence_intervals
+Revises: 0004_snapshot_analysis
+Create Date: 2026-10-19 12:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_presence_intervals"
+down_revision: Union[str, Sequence[str], None] = "0004_snapshot_analysis"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "presence_intervals",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("exam_id", sa.String(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ended_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("heartbeats", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_presence_intervals_session_started", "presence_intervals", ["session_id", "started_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_presence_intervals_session_started", table_name="presence_intervals")
+    op.drop_table("presence_intervals")
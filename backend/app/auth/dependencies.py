@@ -8,6 +8,8 @@ from ..models.user_profile import UserProfile
 from typing import Optional
 from urllib.parse import quote
 import os
+import threading
+import time
 import requests
 
 security = HTTPBearer()
@@ -20,6 +22,9 @@ ROLE_ALIASES = {
     "proctor": "teacher",
 }
 
+ROLE_CACHE_TTL_SECONDS = float(os.getenv("ROLE_CACHE_TTL_SECONDS", "300"))
+ROLE_CACHE_MAX_ENTRIES = 50000
+
 
 def canonicalize_role(role: str) -> str:
     normalized = str(role).strip().lower()
@@ -214,47 +219,114 @@ def _ensure_default_student_role(sub: str, email: Optional[str]):
         return None
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-):
-    token = credentials.credentials
-    payload = verify_token(token)
+class RoleCache:
+    """
+    Process-local sub -> roles resolved from the local profile, Auth0 and the default
+    student assignment, shared by HTTP and websocket authentication.
 
-    sub = payload["sub"]
-    email = payload.get("email")
+    Only results holding a supported role are cached, so users without one keep falling
+    through to Auth0. Admin role changes invalidate the entry; other processes pick them
+    up when the TTL runs out.
+    """
 
-    # Keep a local profile row in sync for stable role fallback and metadata.
-    _upsert_local_profile_role(sub, email)
+    def __init__(self, ttl_seconds: float = ROLE_CACHE_TTL_SECONDS, max_entries: int = ROLE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Format: { sub: (roles, expires_at) }
+        self.entries: dict[str, tuple[list[str], float]] = {}
+        self.lock = threading.Lock()
 
-    # Prefer roles from token claims.
+    def get(self, sub: str) -> Optional[list[str]]:
+        with self.lock:
+            entry = self.entries.get(sub)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[sub]
+                return None
+            return list(entry[0])
+
+    def put(self, sub: str, roles: list[str]):
+        if not _has_supported_role(roles):
+            return
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                now = time.monotonic()
+                for key in [k for k, v in self.entries.items() if v[1] <= now]:
+                    del self.entries[key]
+                if len(self.entries) >= self.max_entries:
+                    self.entries.clear()
+            self.entries[sub] = (list(roles), time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, sub: str):
+        with self.lock:
+            self.entries.pop(sub, None)
+
+
+role_cache = RoleCache()
+
+
+def _token_roles(payload: dict) -> list[str]:
     roles = []
     roles.extend(_normalize_roles(payload.get(ROLE_NAMESPACE, [])))
     roles.extend(_normalize_roles(payload.get("roles", [])))
     roles.extend(_normalize_roles(payload.get("role", [])))
+    return roles
+
+
+def resolve_roles(sub: str, email: Optional[str], token_roles: list[str]) -> list[str]:
+    """
+    Token claims merged with the user's stored roles. Stored roles come from `role_cache`
+    when fresh; otherwise the local profile is synced and read, and Auth0 is asked only
+    when neither the token nor the profile has a supported role. Blocking: call it from a
+    worker thread in async code.
+    """
+    cached = role_cache.get(sub)
+    if cached is not None:
+        return list(dict.fromkeys(token_roles + cached))
+
+    # Keep a local profile row in sync for stable role fallback and metadata.
+    _upsert_local_profile_role(sub, email)
+
+    # Prefer roles from token claims.
+    roles = list(token_roles)
     token_supported_role = _first_supported_role(roles)
     if token_supported_role:
         _upsert_local_profile_role(sub, email, token_supported_role)
+    stored = []
 
     # Merge locally mirrored profile role as an additional source of truth.
     local_role = _load_local_role(sub, email)
     if local_role:
-        roles.append(local_role)
+        stored.append(local_role)
 
     # Avoid network flakiness on every request; call Auth0 only when no supported role is available.
-    if not _has_supported_role(roles):
+    if not _has_supported_role(roles + stored):
         auth0_roles = _load_auth0_roles(sub)
-        roles.extend(auth0_roles)
+        stored.extend(auth0_roles)
         auth0_supported_role = _first_supported_role(auth0_roles)
         if auth0_supported_role:
             _upsert_local_profile_role(sub, email, auth0_supported_role)
 
-    if not _has_supported_role(roles):
+    if not _has_supported_role(roles + stored):
         default_role = _ensure_default_student_role(sub, email)
         if default_role:
-            roles.append(default_role)
+            stored.append(default_role)
             _upsert_local_profile_role(sub, email, default_role)
 
-    roles = list(dict.fromkeys(roles))
+    role_cache.put(sub, stored)
+    return list(dict.fromkeys(roles + stored))
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    token = credentials.credentials
+    payload = verify_token(token)
+
+    sub = payload["sub"]
+    email = payload.get("email")
+    roles = resolve_roles(sub, email, _token_roles(payload))
 
     return {
         "sub": sub,
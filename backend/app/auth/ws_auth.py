@@ -1,6 +1,7 @@
 from fastapi import WebSocket, WebSocketException
+from fastapi.concurrency import run_in_threadpool
 from .jwt import verify_token
-from .dependencies import canonicalize_role, _ensure_default_student_role, _load_auth0_roles, _load_local_role
+from .dependencies import canonicalize_role, resolve_roles
 
 ROLE_NAMESPACE = "https://smartproctor.io/roles"
 
@@ -30,15 +31,8 @@ async def authenticate_websocket(ws: WebSocket):
 
     sub = payload["sub"]
     email = payload.get("email")
-    local_role = _load_local_role(sub, email)
-    if local_role:
-        roles.append(local_role)
-    roles.extend(_load_auth0_roles(sub))
-    if not roles:
-        default_role = _ensure_default_student_role(sub, email)
-        if default_role:
-            roles.append(default_role)
-    roles = list(dict.fromkeys(roles))
+    # Shares the role cache with HTTP auth, so reconnect storms do not reach Auth0.
+    roles = await run_in_threadpool(resolve_roles, sub, email, roles)
 
     return {
         "sub": sub,
@@ -169,6 +169,16 @@ def ensure_schema_compatibility() -> None:
         if "created_at" not in violation_columns:
             statements.append("ALTER TABLE violations ADD COLUMN created_at DATETIME DEFAULT CURRENT_TIMESTAMP")
 
+    if "snapshots" in tables:
+        snapshot_columns = {column["name"] for column in inspector.get_columns("snapshots")}
+        # Snapshots stored before background analysis existed are not queued retroactively.
+        if "analysis_status" not in snapshot_columns:
+            statements.append("ALTER TABLE snapshots ADD COLUMN analysis_status VARCHAR NOT NULL DEFAULT 'skipped'")
+        if "analysis_result" not in snapshot_columns:
+            statements.append("ALTER TABLE snapshots ADD COLUMN analysis_result TEXT")
+        if "analyzed_at" not in snapshot_columns:
+            statements.append("ALTER TABLE snapshots ADD COLUMN analyzed_at DATETIME")
+
     with engine.begin() as connection:
         for statement in statements:
             connection.execute(text(statement))
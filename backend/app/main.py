@@ -26,6 +26,7 @@ from .routes import session_management
 from .routes import questions
 from .routes import analytics
 from .routes import ws_proctoring, ws_signaling
+from .routes import snapshots
 from .middleware.session_middleware import (
     SessionTrackingMiddleware,
     SessionSecurityMiddleware,
@@ -36,6 +37,11 @@ from .middleware.session_middleware import (
 from .models.user_session import UserSession, SessionRevocationList, SessionAuditLog
 from .models.user_profile import UserProfile
 from .services.auto_submit_worker import AutoSubmitWorker
+from .services.snapshot_analysis import snapshot_analysis_queue
+from .services.presence_recorder import presence_recorder
+from .models.presence_interval import PresenceInterval
+from .services.ai_worker import close_async_client
+from .websocket.pubsub import create_bus
 
 worker = AutoSubmitWorker()
 
@@ -43,10 +49,21 @@ worker = AutoSubmitWorker()
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     worker.start()
+    snapshot_analysis_queue.start()
+    presence_recorder.start()
+    # Websocket events reach connections held by other backend processes through the bus
+    pubsub_bus = create_bus()
+    await pubsub_bus.start()
+    await ws_proctoring.manager.attach_bus(pubsub_bus)
+    await ws_signaling.manager.attach_bus(pubsub_bus)
     try:
         yield
     finally:
+        await pubsub_bus.close()
+        presence_recorder.shutdown()
+        snapshot_analysis_queue.shutdown()
         worker.shutdown()
+        await close_async_client()
 
 app = FastAPI(
     title="SmartProctor API",
@@ -91,6 +108,7 @@ app.include_router(attempts.router)
 app.include_router(proctoring.router)
 app.include_router(ai.router)
 app.include_router(violations.router)
+app.include_router(snapshots.router)
 app.include_router(ws_proctoring.router)
 app.include_router(ws_signaling.router)
 # Include secure session management routes
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from ..database import Base
+import uuid
+
+
+class PresenceInterval(Base):
+    """One continuous online stretch of an exam session, built from its heartbeats."""
+
+    __tablename__ = "presence_intervals"
+    __table_args__ = (
+        Index("ix_presence_intervals_session_started", "session_id", "started_at"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    session_id = Column(String, nullable=False)
+    exam_id = Column(String, nullable=True)
+
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)  # last heartbeat, or disconnect
+    heartbeats = Column(Integer, nullable=False, default=1)
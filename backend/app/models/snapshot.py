@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Text
 from sqlalchemy.sql import func
 from ..database import Base
 import uuid
@@ -16,5 +16,10 @@ class Snapshot(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Background AI analysis (see services/snapshot_analysis.py)
+    analysis_status = Column(String, nullable=False, default="pending")  # pending | done | failed | skipped
+    analysis_result = Column(Text, nullable=True)  # JSON of the normalized worker response
+    analyzed_at = Column(DateTime(timezone=True), nullable=True)
+
 #Run once:
 #Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -1,4 +1,6 @@
+from ..database import SessionLocal
 from ..models.exam import Exam
+from ..models.exam_session import ExamSession
 from ..models.proctor import ProctorAssignment
 from fastapi import WebSocketException
 
@@ -16,3 +18,30 @@ def require_proctor_for_session(db, exam_id, teacher_id):
 
     if not assigned:
         raise WebSocketException(code=4403, reason="Not assigned proctor")
+
+
+def authorize_proctor(exam_id, teacher_id, session_id=None):
+    """
+    Proctor check for a socket, with a short-lived DB session. With `session_id`, the exam
+    is the one that session belongs to; returns the exam id.
+    """
+    db = SessionLocal()
+    try:
+        if session_id is not None:
+            session = db.query(ExamSession).filter_by(id=session_id).first()
+            if not session:
+                raise WebSocketException(code=4404, reason="Session not found")
+            exam_id = session.exam_id
+        require_proctor_for_session(db, exam_id, teacher_id)
+        return exam_id
+    finally:
+        db.close()
+
+
+def session_in_exam(session_id, exam_id):
+    """Whether the session belongs to the exam; short-lived DB session."""
+    db = SessionLocal()
+    try:
+        return db.query(ExamSession.id).filter_by(id=session_id, exam_id=exam_id).first() is not None
+    finally:
+        db.close()
@@ -1,3 +1,4 @@
+from ..database import SessionLocal
 from ..models.exam_session import ExamSession
 from fastapi import WebSocketException
 
@@ -13,3 +14,24 @@ def require_session_owner(db, session_id, student_id):
         raise WebSocketException(code=4403, reason="Not your session")
 
     return session
+
+
+def authorize_student_session(session_id, student_id):
+    """
+    Ownership check for a student socket; returns the session's exam id. Uses the session
+    liveness cache when it already knows the pair, otherwise a short-lived DB session,
+    so no connection is held for the lifetime of the socket.
+    """
+    from ..services.session_service import session_liveness
+
+    entry = session_liveness.get(session_id, student_id)
+    if entry is not None and entry["exam_id"]:
+        return entry["exam_id"]
+
+    db = SessionLocal()
+    try:
+        if not db.query(ExamSession.id).filter_by(id=session_id).first():
+            raise WebSocketException(code=4404, reason="Session not found")
+        return require_session_owner(db, session_id, student_id).exam_id
+    finally:
+        db.close()
@@ -1,33 +1,224 @@
+import time
+import uuid
+
 from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 
 from ..auth.roles import require_role
 from ..database import SessionLocal
-from ..schemas.ai import SnapshotInferenceRequest, SnapshotInferenceResponse
-from ..services.ai_worker import get_worker_health, infer_snapshot
-from ..services.session_service import assert_session_is_live
+from ..models.exam_attempt import ExamAttempt
+from ..models.exam_session import SessionStatus
+from ..schemas.ai import AudioChunkRequest, AudioInferenceResponse, SnapshotInferenceRequest, SnapshotInferenceResponse
+from ..services import exam_service as _exam_service
+from ..services.ai_worker import (
+    AI_RECORDED_SEVERITY,
+    ai_violation_enabled,
+    get_worker_health,
+    infer_audio_async,
+    infer_snapshot_async,
+)
+from ..services.rate_limit import inference_rate_limiter
+from ..services.session_service import get_live_session_async
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
+# Per-frame detections that are not (yet) a confirmed temporal violation are still recorded,
+# as minor events at most once per type and cooldown, the way the exam portal used to post them.
+RAW_DETECTION_COOLDOWN_SECONDS = 10
+RAW_DETECTION_MAX_TRACKED = 10000
+RAW_PHONE_MIN_CONFIDENCE = 0.7
+RAW_DETECTION_SOURCE = "ai_frame"
+_last_detection_at: dict[tuple[str, str], float] = {}
+
 
 @router.get("/health")
 def ai_health():
     return get_worker_health()
 
 
+@router.get("/metrics")
+def ai_metrics(user=Depends(require_role("admin"))):
+    return {"inference_rate_limits": inference_rate_limiter.stats()}
+
+
+def _record_ai_violations(session_id: str, image: str | None, violations: list[dict]) -> dict:
+    """
+    Persist AI violations (worker-confirmed ones and throttled per-frame detections) with the
+    frame that produced them, if any. Returns
+    the resulting integrity score and session status, plus what to broadcast to proctors.
+    """
+    db = SessionLocal()
+    try:
+        evidence_path = _exam_service.save_evidence_image(session_id, image)
+        session = None
+        recorded = []
+        for violation in violations:
+            violation = {**violation, "severity": AI_RECORDED_SEVERITY}
+            session = _exam_service.auto_terminate_on_violation(
+                db,
+                session_id,
+                violation["severity"],
+                violation_type=violation["type"],
+                evidence_files=evidence_path,
+                reason=violation.get("reason"),
+                duration_ms=violation.get("duration_ms"),
+                confidence=violation.get("confidence"),
+                source=violation.get("source", "ai"),
+            )
+            recorded.append(violation)
+            if session.status == SessionStatus.ENDED:
+                break
+
+        integrity_score = None
+        if session.attempt_id:
+            attempt = db.query(ExamAttempt).filter_by(id=session.attempt_id).first()
+            if attempt:
+                integrity_score = attempt.integrity_score
+        return {
+            "integrity_score": integrity_score,
+            "session_status": session.status,
+            "exam_id": session.exam_id,
+            "student_id": session.student_id,
+            "recorded": recorded,
+        }
+    finally:
+        db.close()
+
+
+def _raw_detections(session_id: str, result: dict, security_config: dict | None, now: float) -> list[dict]:
+    config = security_config or {}
+    detections = []
+    if not result["face_detected"] and config.get("detectNoFace"):
+        detections.append(("NO_FACE", 1.0, "No face detected"))
+    elif (result["face_count"] > 1 or result["multiple_faces"]) and config.get("detectMultipleFaces"):
+        detections.append(("MULTIPLE_FACES", 1.0, "Multiple faces detected"))
+    # No confidence from the worker is recorded as unknown, not as a near-certain detection.
+    phone_confidence = result["phone_confidence"] or None
+    if (
+        result["phone_detected"]
+        and config.get("detectMobilePhone")
+        and (phone_confidence is None or phone_confidence >= RAW_PHONE_MIN_CONFIDENCE)
+    ):
+        detections.append(("PHONE_DETECTED", phone_confidence, "Phone detected"))
+    if result["head_pose"]["looking_away"] and ai_violation_enabled("LOOKING_AWAY", config):
+        detections.append(("LOOKING_AWAY", result["head_pose"]["confidence"] or 1.0, "Looking away"))
+
+    if len(_last_detection_at) > RAW_DETECTION_MAX_TRACKED:
+        for key in [k for k, ts in _last_detection_at.items() if now - ts > RAW_DETECTION_COOLDOWN_SECONDS]:
+            del _last_detection_at[key]
+
+    # A confirmed violation of the same type covers the frame's detection.
+    for violation in result["violations"]:
+        _last_detection_at[(session_id, violation["type"])] = now
+    raw = []
+    for violation_type, confidence, reason in detections:
+        last = _last_detection_at.get((session_id, violation_type))
+        if last is not None and now - last <= RAW_DETECTION_COOLDOWN_SECONDS:
+            continue
+        _last_detection_at[(session_id, violation_type)] = now
+        raw.append({
+            "type": violation_type,
+            "severity": "minor",
+            "confidence": None if confidence is None else float(confidence),
+            "reason": reason,
+            "source": RAW_DETECTION_SOURCE,
+        })
+    return raw
+
+
+async def _broadcast_violations(session_id: str, exam_id: str, student_id: str, violations: list[dict]) -> None:
+    from ..routes.ws_proctoring import manager
+
+    for violation in violations:
+        await manager.broadcast_to_proctors(
+            exam_id,
+            {
+                "type": "VIOLATION",
+                "student_id": student_id,
+                "session_id": session_id,
+                "violation_type": violation["type"],
+                "severity": violation["severity"],
+                "event_id": str(uuid.uuid4()),
+                "reason": violation.get("reason"),
+            }
+        )
+
+
 @router.post("/sessions/{session_id}/snapshot", response_model=SnapshotInferenceResponse)
-def infer_session_snapshot(
+async def infer_session_snapshot(
     session_id: str,
     payload: SnapshotInferenceRequest,
     user=Depends(require_role("student")),
 ):
-    db = SessionLocal()
-    try:
-        assert_session_is_live(db, session_id, user["sub"])
-    finally:
-        db.close()
+    # Hit on almost every frame; ending a session invalidates the cached entry. Only a
+    # cache miss touches the database, and then off the event loop.
+    live = await get_live_session_async(session_id, user["sub"])
 
-    return infer_snapshot(
+    # Over-limit frames are turned away with a retry delay rather than queued for the worker.
+    inference_rate_limiter.check(user["sub"], live["exam_id"], live["security_config"], payload.frame_id)
+
+    result = await infer_snapshot_async(
         session_id=session_id,
         student_id=user["sub"],
         image_base64=payload.image,
+        exam_id=live["exam_id"],
+        frame_id=payload.frame_id,
+        model_profile=live["model_profile"],
+    )
+
+    # Violations are recorded here, with the frame we already have, instead of by a second
+    # client request. A retried frame replays the cached answer and is not recorded twice.
+    result["violations"] = [v for v in result["violations"] if ai_violation_enabled(v["type"], live["security_config"])]
+    to_record = [] if result["cached"] else (
+        result["violations"] + _raw_detections(session_id, result, live["security_config"], time.time())
     )
+    if not to_record:
+        # Nothing changed; quiet frames never touch the database.
+        result.update({"integrity_score": None, "session_status": SessionStatus.LIVE.value})
+        return result
+
+    recorded = await run_in_threadpool(_record_ai_violations, session_id, payload.image, to_record)
+    await _broadcast_violations(session_id, recorded.pop("exam_id"), recorded.pop("student_id"), recorded.pop("recorded"))
+    result.update(recorded)
+    return result
+
+
+@router.post("/sessions/{session_id}/audio", response_model=AudioInferenceResponse)
+async def infer_session_audio(
+    session_id: str,
+    payload: AudioChunkRequest,
+    user=Depends(require_role("student")),
+):
+    # Microphone chunks stream continuously (roughly one per second), so this follows the
+    # snapshot route: cached liveness, no database work unless a violation is recorded.
+    live = await get_live_session_async(session_id, user["sub"])
+
+    # Chunks share the worker with frames, so they count against the exam and global
+    # buckets; the per-student bucket is separate so audio does not starve the camera.
+    inference_rate_limiter.check(f"{user['sub']}:audio", live["exam_id"], live["security_config"], payload.chunk_id)
+
+    result = await infer_audio_async(
+        session_id=session_id,
+        student_id=user["sub"],
+        audio_base64=payload.audio,
+        sample_rate=payload.sample_rate,
+        encoding=payload.encoding,
+        channels=payload.channels,
+        exam_id=live["exam_id"],
+        chunk_id=payload.chunk_id,
+        model_profile=live["model_profile"],
+    )
+
+    result["violations"] = [
+        v for v in result["violations"]
+        if ai_violation_enabled(v["type"], live["security_config"], live["model_profile"])
+    ]
+    to_record = [] if result["cached"] else result["violations"]
+    if not to_record:
+        result.update({"integrity_score": None, "session_status": SessionStatus.LIVE.value})
+        return result
+
+    recorded = await run_in_threadpool(_record_ai_violations, session_id, None, to_record)
+    await _broadcast_violations(session_id, recorded.pop("exam_id"), recorded.pop("student_id"), recorded.pop("recorded"))
+    result.update(recorded)
+    return result
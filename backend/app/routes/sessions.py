@@ -11,7 +11,9 @@ from ..models.exam_session import ExamSession, SessionStatus
 from ..permissions.attempt_permissions import require_attempt_owner
 from ..schemas.violation import ViolationReportRequest
 from ..services import exam_service as _exam_service
+from ..services.ai_worker import end_worker_session, sync_exam_model_profile
 from ..services.attempt_service import start_exam_attempt, submit_attempt
+from ..services.session_service import session_liveness
 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
@@ -37,6 +39,8 @@ def start_exam_session(exam_id: str, user=Depends(require_role("student"))):
             raise HTTPException(status_code=404, detail="Exam not found")
 
         attempt = start_exam_attempt(db, exam_id, user["sub"])
+        # Idempotent warm-up; inference requests carry the profile too, which covers AI worker restarts.
+        sync_exam_model_profile(db, exam)
 
         existing_live = (
             db.query(ExamSession)
@@ -102,6 +106,8 @@ def end_exam_session(session_id: str, user=Depends(require_role("student"))):
         session.status = SessionStatus.ENDED
         session.ended_at = session.ended_at or session.started_at
         db.commit()
+        session_liveness.invalidate_session(session_id)
+        end_worker_session(session_id)
         return {"message": "Exam session ended"}
     finally:
         db.close()
@@ -133,10 +139,8 @@ def report_violation(
     event_id: str | None = Query(default=None),
     user=Depends(require_role("student")),
 ):
-    import os
     import uuid
-    import base64
-    
+
     db = SessionLocal()
     try:
         session = db.query(ExamSession).filter_by(id=session_id, student_id=user["sub"]).first()
@@ -153,24 +157,7 @@ def report_violation(
             event_id=event_id,
         )
             
-        evidence_path = None
-        if payload.image:
-            try:
-                # Ensure directory exists
-                evidence_dir = os.path.join("data", "evidence")
-                os.makedirs(evidence_dir, exist_ok=True)
-                
-                # Decode base64 
-                header, encoded = payload.image.split(",", 1) if "," in payload.image else ("", payload.image)
-                image_data = base64.b64decode(encoded)
-                filename = f"{session_id}_{uuid.uuid4().hex[:8]}.jpg"
-                filepath = os.path.join(evidence_dir, filename)
-                
-                with open(filepath, "wb") as f:
-                    f.write(image_data)
-                evidence_path = f"/evidence/{filename}"
-            except Exception as e:
-                print(f"Failed to save evidence snapshot: {e}")
+        evidence_path = _exam_service.save_evidence_image(session_id, payload.image)
 
         updated = _exam_service.auto_terminate_on_violation(
             db, 
@@ -269,6 +256,34 @@ def get_session_timeline(session_id: str, user=Depends(require_role("school_admi
                 "source": "violation"
             })
             
+        # Merge presence intervals; this process's unflushed ones supersede their stored rows
+        from ..models.presence_interval import PresenceInterval
+        from ..services.presence_recorder import presence_recorder, _to_datetime
+
+        intervals = {
+            p.id: {"started_at": p.started_at, "ended_at": p.ended_at, "heartbeats": p.heartbeats}
+            for p in db.query(PresenceInterval).filter_by(session_id=session_id).all()
+        }
+        for p in presence_recorder.intervals(session_id):
+            intervals[p["id"]] = {
+                "started_at": _to_datetime(p["started_at"]),
+                "ended_at": _to_datetime(p["ended_at"]),
+                "heartbeats": p["heartbeats"],
+            }
+        for interval_id, p in intervals.items():
+            timeline.append({
+                "timestamp": p["started_at"].isoformat(),
+                "event": "PRESENCE_INTERVAL",
+                "data": {
+                    "id": interval_id,
+                    "started_at": p["started_at"].isoformat(),
+                    "ended_at": p["ended_at"].isoformat(),
+                    "duration_seconds": round((p["ended_at"] - p["started_at"]).total_seconds(), 1),
+                    "heartbeats": p["heartbeats"],
+                },
+                "source": "presence"
+            })
+
         # Sort by timestamp
         timeline.sort(key=lambda x: x["timestamp"])
         
@@ -1,15 +1,27 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
 from ..auth.roles import require_role
-from ..permissions.ws_student import require_session_owner
 from ..database import SessionLocal
+from ..models.exam_session import ExamSession
 from ..models.snapshot import Snapshot
+from ..permissions.proctor_permissions import require_proctor
+from ..services.snapshot_analysis import snapshot_analysis_queue
 import os
-import time
+import uuid
 
 router = APIRouter(prefix="/snapshots", tags=["Snapshots"])
 
 STORAGE_ROOT = "storage/snapshots"
 
+
+def _require_session_proctor(db, session_id: str, teacher_id: str) -> ExamSession:
+    session = db.query(ExamSession).filter_by(id=session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    require_proctor(db, session.exam_id, teacher_id)
+    return session
+
+
 @router.post("/{session_id}/upload")
 def upload_snapshot(
     session_id: str,
@@ -18,32 +30,39 @@ def upload_snapshot(
     user=Depends(require_role("student")),
 ):
     db = SessionLocal()
+    try:
+        # 🔐 permission check
+        session = db.query(ExamSession).filter_by(id=session_id, student_id=user["sub"]).first()
+        if not session:
+            raise HTTPException(status_code=403, detail="Not your session")
 
-    # 🔐 permission check
-    require_session_owner(db, session_id, user["sub"])
+        # 📁 storage
+        session_dir = os.path.join(STORAGE_ROOT, session_id)
+        os.makedirs(session_dir, exist_ok=True)
 
-    # 📁 storage
-    session_dir = os.path.join(STORAGE_ROOT, session_id)
-    os.makedirs(session_dir, exist_ok=True)
+        # Unique per upload; several snapshots can arrive within the same second.
+        path = os.path.join(session_dir, f"{uuid.uuid4()}.jpg")
 
-    filename = f"{int(time.time())}.jpg"
-    path = os.path.join(session_dir, filename)
+        with open(path, "wb") as f:
+            f.write(file.file.read())
 
-    with open(path, "wb") as f:
-        f.write(file.file.read())
+        snapshot = Snapshot(
+            session_id=session_id,
+            student_id=user["sub"],
+            file_path=path,
+            reason=reason,
+        )
 
-    snapshot = Snapshot(
-        session_id=session_id,
-        student_id=user["sub"],
-        file_path=path,
-        reason=reason,
-    )
+        db.add(snapshot)
+        db.commit()
+        snapshot_id = snapshot.id
+    finally:
+        db.close()
 
-    db.add(snapshot)
-    db.commit()
-    db.close()
+    # Analysis happens in the background; the upload does not wait for the AI worker.
+    snapshot_analysis_queue.enqueue(snapshot_id)
 
-    return {"message": "Snapshot stored"}
+    return {"message": "Snapshot stored", "snapshot_id": snapshot_id, "analysis_status": "pending"}
 
 @router.get("/{session_id}")
 def list_snapshots(
@@ -51,18 +70,16 @@ def list_snapshots(
     user=Depends(require_role("teacher")),
 ):
     db = SessionLocal()
-
-    snapshots = (
-        db.query(Snapshot)
-        .filter_by(session_id=session_id)
-        .order_by(Snapshot.created_at.desc())
-        .all()
-    )
-
-    db.close()
-    return snapshots
-
-from fastapi.responses import FileResponse
+    try:
+        _require_session_proctor(db, session_id, user["sub"])
+        return (
+            db.query(Snapshot)
+            .filter_by(session_id=session_id)
+            .order_by(Snapshot.created_at.desc())
+            .all()
+        )
+    finally:
+        db.close()
 
 @router.get("/file/{snapshot_id}")
 def get_snapshot_file(
@@ -70,10 +87,13 @@ def get_snapshot_file(
     user=Depends(require_role("teacher")),
 ):
     db = SessionLocal()
-    snap = db.query(Snapshot).filter_by(id=snapshot_id).first()
-    db.close()
-
-    if not snap:
-        raise HTTPException(404)
-
-    return FileResponse(snap.file_path)
+    try:
+        snap = db.query(Snapshot).filter_by(id=snapshot_id).first()
+        if not snap:
+            raise HTTPException(404)
+        _require_session_proctor(db, snap.session_id, user["sub"])
+        file_path = snap.file_path
+    finally:
+        db.close()
+
+    return FileResponse(file_path)
@@ -1,13 +1,15 @@
 import json
 import time
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, WebSocketException
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, WebSocketException
 
+from ..auth.roles import require_role
 from ..auth.ws_auth import authenticate_websocket
-from ..database import SessionLocal
-from ..permissions.ws_student import require_session_owner
-from ..permissions.ws_proctor import require_proctor_for_session
+from fastapi.concurrency import run_in_threadpool
+
+from ..permissions.ws_student import authorize_student_session
+from ..permissions.ws_proctor import authorize_proctor, session_in_exam
 from ..websocket.manager import ConnectionManager
-from ..models.exam_session import ExamSession
+from ..services.presence_recorder import presence_recorder
 
 router = APIRouter()
 manager = ConnectionManager()
@@ -22,34 +24,25 @@ async def _close_ws_with_reason(ws: WebSocket, code: int, reason: str):
 
 @router.websocket("/ws/student/{session_id}")
 async def student_ws(ws: WebSocket, session_id: str):
-    db = SessionLocal()
     try:
         user = await authenticate_websocket(ws)
     except WebSocketException as exc:
-        db.close()
         await _close_ws_with_reason(ws, exc.code or 4401, getattr(exc, "reason", "WebSocket authentication failed"))
         return
 
     if "student" not in user["roles"]:
-        db.close()
         await _close_ws_with_reason(ws, 4403, "Student role required")
         return
 
-    session = db.query(ExamSession).filter_by(id=session_id).first()
-    if not session:
-        db.close()
-        await _close_ws_with_reason(ws, 4404, "Session not found")
-        return
-
+    # Checked once, off the event loop; the socket holds no database session afterwards
     try:
-        require_session_owner(db, session_id, user["sub"])
+        exam_id = await run_in_threadpool(authorize_student_session, session_id, user["sub"])
     except WebSocketException as exc:
-        db.close()
         await _close_ws_with_reason(ws, exc.code or 4403, getattr(exc, "reason", "Not your session"))
         return
-    exam_id = session.exam_id
 
     await manager.connect_student(session_id, exam_id, ws)
+    presence_recorder.heartbeat(session_id, exam_id, time.time())
 
     ALLOWED_STUDENT_TYPES = {"HEARTBEAT", "VIOLATION", "SYNC_REQUEST"}
     MAX_SIZE = 4096
@@ -80,7 +73,8 @@ async def student_ws(ws: WebSocket, session_id: str):
                 if now - last_heartbeat < 4.0:
                     continue  # Rate limit
                 last_heartbeat = now
-                manager.last_seen[session_id] = now
+                manager.touch(session_id, now)
+                presence_recorder.heartbeat(session_id, exam_id, now)
                 # Don't broadcast raw heartbeats anymore, allow STATUS_SYNC to handle presence
                 
             elif msg_type == "VIOLATION":
@@ -97,31 +91,37 @@ async def student_ws(ws: WebSocket, session_id: str):
                     await manager.send_to_student(session_id, {"type": "END_EXAM", "timestamp": now})
 
     except WebSocketDisconnect:
-
-        manager.disconnect_student(session_id, ws)
-        db.close()
+        pass
+    finally:
+        # Also on the oversized-message close path, so the exam's connection count stays right
+        if manager.disconnect_student(session_id, ws):
+            # A replaced socket must not close the interval its successor keeps open.
+            presence_recorder.disconnect(session_id, time.time())
 
 @router.websocket("/ws/proctor/exam/{exam_id}")
 async def proctor_ws_exam(ws: WebSocket, exam_id: str):
-    db = SessionLocal()
     try:
         user = await authenticate_websocket(ws)
     except WebSocketException as exc:
-        db.close()
         await _close_ws_with_reason(ws, exc.code or 4401, getattr(exc, "reason", "WebSocket authentication failed"))
         return
 
     try:
-        require_proctor_for_session(db, exam_id, user["sub"])
+        await run_in_threadpool(authorize_proctor, exam_id, user["sub"])
     except WebSocketException as exc:
-        db.close()
         await _close_ws_with_reason(ws, exc.code or 4403, getattr(exc, "reason", "Teacher role required"))
         return
 
-    await manager.connect_proctor(exam_id, ws)
+    # A reconnecting dashboard resumes from the last event it applied
+    try:
+        since = int(ws.query_params["since"]) if "since" in ws.query_params else None
+    except ValueError:
+        since = None
+    await manager.connect_proctor(exam_id, ws, since=since, epoch=ws.query_params.get("epoch"))
 
     ALLOWED_PROCTOR_TYPES = {"WARN_STUDENT", "END_EXAM", "FORCE_SUBMIT", "PAUSE_EXAM", "REMOVE_STUDENT"}
     MAX_SIZE = 4096
+    exam_session_ids = set()  # sessions already verified to belong to this exam
 
     try:
         while True:
@@ -139,10 +139,18 @@ async def proctor_ws_exam(ws: WebSocket, exam_id: str):
             target_session_id = data.get("session_id")
             
             if msg_type in ALLOWED_PROCTOR_TYPES and target_session_id:
+                # Proctors may only act on sessions of the exam they are authorized for.
+                if target_session_id not in exam_session_ids:
+                    if manager.session_to_exam.get(target_session_id) != exam_id and not await run_in_threadpool(
+                        session_in_exam, target_session_id, exam_id
+                    ):
+                        continue
+                    exam_session_ids.add(target_session_id)
+
                 if msg_type in ["END_EXAM", "FORCE_SUBMIT", "REMOVE_STUDENT"]:
                     if target_session_id in manager.ended_sessions:
                         continue
-                    manager.ended_sessions.add(target_session_id)
+                    await manager.mark_session_ended(target_session_id)
                     # Audit log placeholder
                     print(json.dumps({"event": "END_EXAM_SENT", "proctor_id": user["sub"], "student_id": target_session_id, "timestamp": time.time()}))
                 elif msg_type == "WARN_STUDENT":
@@ -153,5 +161,17 @@ async def proctor_ws_exam(ws: WebSocket, exam_id: str):
                 await manager.send_to_student(target_session_id, data)
 
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect_proctor(exam_id, ws)
-        db.close()
+
+
+@router.get("/ws/debug/sizes")
+def websocket_state_sizes(user=Depends(require_role("admin"))):
+    """Sizes of the in-process websocket state, for spotting leaks in long-lived processes."""
+    from .ws_signaling import manager as signaling_manager
+
+    return {
+        "proctoring": manager.debug_sizes(),
+        "signaling": {"sessions": len(signaling_manager.sessions)},
+    }
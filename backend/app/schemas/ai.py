@@ -1,9 +1,12 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
 class SnapshotInferenceRequest(BaseModel):
     image: str = Field(min_length=1)
     timestamp: str | None = None
+    frame_id: str | None = Field(default=None, max_length=64)
 
 
 class PhoneDetectionResult(BaseModel):
@@ -18,6 +21,7 @@ class HeadPoseResult(BaseModel):
     blink: bool = False
     ear: float = 0.0
     nose_tip: list[float] | None = None
+    gaze: dict | None = None
 
 
 class TemporalViolationResult(BaseModel):
@@ -41,4 +45,39 @@ class SnapshotInferenceResponse(BaseModel):
     head_pose: HeadPoseResult = Field(default_factory=HeadPoseResult)
     violations: list[TemporalViolationResult] = Field(default_factory=list)
     risk_score: int = 0
+    cached: bool = False
+    # Server-side outcome of recording the violations above; None when nothing was recorded.
+    integrity_score: int | None = None
+    session_status: str | None = None
+
+
+
+class AudioChunkRequest(BaseModel):
+    # Base64 little-endian PCM; compressed recordings are decoded in the browser first.
+    audio: str = Field(min_length=1)
+    encoding: Literal["pcm_s16le", "pcm_f32le"] = "pcm_s16le"
+    sample_rate: int = Field(default=16000, ge=8000, le=48000)
+    channels: int = Field(default=1, ge=1, le=2)
+    chunk_id: str | None = Field(default=None, max_length=64)
+
+
+class AudioActivityResult(BaseModel):
+    chunk_ms: int = 0
+    speech_ms: int = 0
+    speech_ratio: float = 0.0
+    energy_db: float | None = None
+    noise_floor_db: float | None = None
+    pitch_hz: float | None = None
+    multiple_speakers: bool = False
 
+
+class AudioInferenceResponse(BaseModel):
+    session_id: str
+    student_id: str
+    # None when the exam does not require the microphone.
+    audio: AudioActivityResult | None = None
+    violations: list[TemporalViolationResult] = Field(default_factory=list)
+    risk_score: int = 0
+    cached: bool = False
+    integrity_score: int | None = None
+    session_status: str | None = None
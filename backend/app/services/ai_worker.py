@@ -1,42 +1,84 @@
+import asyncio
 import json
+import logging
 import os
+import threading
 from urllib import error, request
+from urllib.parse import quote
 
+import httpx
 from fastapi import HTTPException
+from sqlalchemy.orm import Session
 
+from ..models.exam import Exam
+from ..models.exam_rules import ExamRules
+
+logger = logging.getLogger(__name__)
 
 AI_WORKER_BASE_URL = os.getenv("AI_WORKER_BASE_URL", "http://localhost:8001").rstrip("/")
 AI_WORKER_TIMEOUT_SECONDS = float(os.getenv("AI_WORKER_TIMEOUT_SECONDS", "10"))
+# Live-frame inference requests allowed in flight at once, and how long a frame may wait for a slot.
+AI_INFERENCE_MAX_CONCURRENCY = int(os.getenv("AI_INFERENCE_MAX_CONCURRENCY", "32"))
+AI_INFERENCE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_INFERENCE_QUEUE_TIMEOUT_SECONDS", "5"))
+
+_inference_slots = asyncio.Semaphore(AI_INFERENCE_MAX_CONCURRENCY)
+_async_client: httpx.AsyncClient | None = None
 
 
 def _worker_url(path: str) -> str:
     return f"{AI_WORKER_BASE_URL}{path}"
 
 
+# Severity AI detections are recorded with during an exam, as when the exam portal reported
+# them: they lower the integrity score but never count toward the severe/major
+# auto-termination thresholds. _severity_for_violation only ranks them for reports.
+AI_RECORDED_SEVERITY = "minor"
+
+
 def _severity_for_violation(violation_type: str) -> str:
     if violation_type in {"PHONE_DETECTED", "SPOOF_DETECTED"}:
         return "severe"
-    if violation_type in {"MULTIPLE_FACES", "LOOKING_AWAY"}:
+    if violation_type in {"MULTIPLE_FACES", "LOOKING_AWAY", "MULTIPLE_SPEAKERS"}:
         return "major"
+    # IDENTITY_MISMATCH stays minor (recorded, never auto-terminates) until the heuristic
+    # face embedding behind it has been validated.
     return "minor"
 
 
-def _post_json(path: str, payload: dict) -> dict:
+class AIWorkerError(HTTPException):
+    """
+    Any failed call to the worker, sync or async. Answers 502 to the client; `worker_status`
+    is the worker's HTTP status, or None when the worker could not be reached.
+    """
+
+    def __init__(self, detail: str, worker_status: int | None = None):
+        super().__init__(status_code=502, detail=detail)
+        self.worker_status = worker_status
+
+
+class AIWorkerRejected(AIWorkerError):
+    """The worker answered with an error status, as opposed to being unreachable."""
+
+    def __init__(self, worker_status: int, detail: str):
+        super().__init__(detail, worker_status)
+
+
+def _post_json(path: str, payload: dict, method: str = "POST", timeout: float | None = None) -> dict:
     body = json.dumps(payload).encode("utf-8")
     req = request.Request(
         _worker_url(path),
         data=body,
         headers={"Content-Type": "application/json"},
-        method="POST",
+        method=method,
     )
     try:
-        with request.urlopen(req, timeout=AI_WORKER_TIMEOUT_SECONDS) as response:
+        with request.urlopen(req, timeout=timeout or AI_WORKER_TIMEOUT_SECONDS) as response:
             return json.loads(response.read().decode("utf-8"))
     except error.HTTPError as exc:
         detail = exc.read().decode("utf-8", errors="ignore") or exc.reason
-        raise HTTPException(status_code=502, detail=f"AI worker rejected request: {detail}") from exc
+        raise AIWorkerRejected(exc.code, f"AI worker rejected request: {detail}") from exc
     except error.URLError as exc:
-        raise HTTPException(status_code=502, detail="AI worker is unavailable") from exc
+        raise AIWorkerError("AI worker is unavailable") from exc
 
 
 def _get_json(path: str) -> dict:
@@ -46,30 +88,251 @@ def _get_json(path: str) -> dict:
             return json.loads(response.read().decode("utf-8"))
     except error.HTTPError as exc:
         detail = exc.read().decode("utf-8", errors="ignore") or exc.reason
-        raise HTTPException(status_code=502, detail=f"AI worker health check failed: {detail}") from exc
+        raise AIWorkerRejected(exc.code, f"AI worker health check failed: {detail}") from exc
     except error.URLError as exc:
-        raise HTTPException(status_code=502, detail="AI worker is unavailable") from exc
+        raise AIWorkerError("AI worker is unavailable") from exc
 
 
-def infer_snapshot(*, session_id: str, student_id: str, image_base64: str) -> dict:
-    worker_response = _post_json(
-        "/infer/snapshot",
-        {
-            "session_id": session_id,
-            "student_id": student_id,
-            "image_base64": image_base64,
-        },
+# Model cadence (run every Nth frame) per exam security setting, and the worker's defaults.
+MODEL_CADENCE_SETTINGS = {
+    "headpose_every": ("aiHeadPoseEveryFrames", 3),
+    "phone_every": ("aiPhoneEveryFrames", 3),
+    "identity_every": ("aiIdentityEveryFrames", 20),
+}
+# Detection thresholds (0..1) per exam security setting; unset keeps the worker's default.
+MODEL_THRESHOLD_SETTINGS = {
+    "phone_confirm_confidence": "aiPhoneConfirmConfidence",
+    "phone_temporal_threshold": "aiPhoneTemporalThreshold",
+    "looking_away_threshold": "aiLookingAwayThreshold",
+    "identity_match_threshold": "aiIdentityMatchThreshold",
+}
+
+
+def build_model_profile(wizard_config: dict | None, rules: ExamRules | None = None) -> dict:
+    """
+    Translate exam security settings into the worker's full model profile. Cadence and
+    thresholds come from the optional ai* settings; invalid values fall back to the worker's
+    defaults so a bad setting never gets every frame of the exam rejected.
+    """
+    config = wizard_config or {}
+    camera_required = rules.camera_required if rules is not None else True
+
+    # Head pose drives gaze and liveness checks, which only matter under continuous webcam monitoring.
+    headpose_enabled = camera_required and bool(config.get("enableWebcam", True))
+    phone_enabled = camera_required and bool(config.get("detectMobilePhone", True))
+
+    profile = {
+        "headpose_enabled": headpose_enabled,
+        "phone_enabled": phone_enabled,
+        # Identity consistency rides on the same continuous webcam monitoring as head pose.
+        "identity_enabled": headpose_enabled,
+        # Microphone analysis only for exams that require the microphone.
+        "audio_enabled": rules.mic_required if rules is not None else False,
+    }
+    for field, (key, default) in MODEL_CADENCE_SETTINGS.items():
+        try:
+            value = int(config.get(key))
+        except (TypeError, ValueError):
+            value = default
+        profile[field] = value if value >= 1 else default
+    for field, key in MODEL_THRESHOLD_SETTINGS.items():
+        try:
+            value = float(config.get(key))
+        except (TypeError, ValueError):
+            value = None
+        profile[field] = value if value is not None and 0.0 <= value <= 1.0 else None
+    return profile
+
+
+def register_exam_profile(exam_id: str, profile: dict) -> dict:
+    return _post_json(f"/profiles/exams/{quote(exam_id, safe='')}", profile, method="PUT")
+
+
+def snapshot_worker_session_id(session_id: str) -> str:
+    # Stored snapshots get their own temporal stream in the worker so they do not interleave
+    # with (and skew the cadence of) the live frames of the same session.
+    return f"{session_id}:snapshots"
+
+
+def end_worker_session(session_id: str) -> None:
+    """
+    Tell the worker a session is over so it frees that session's state, for the live frames
+    and the stored-snapshot stream. Best-effort and off the caller's path; the worker also
+    expires sessions that stop sending frames.
+    """
+    def _send():
+        for worker_session_id in (session_id, snapshot_worker_session_id(session_id)):
+            try:
+                _post_json(f"/sessions/{quote(worker_session_id, safe='')}", {}, method="DELETE")
+            except AIWorkerError as exc:
+                logger.warning("Failed to end AI worker session %s: %s", worker_session_id, exc.detail)
+
+    threading.Thread(target=_send, name="ai-worker-end-session", daemon=True).start()
+
+
+def exam_security_config(exam: Exam | None) -> dict | None:
+    """The exam wizard's security settings, or None when unset or unreadable."""
+    if exam is None or not exam.wizard_config:
+        return None
+    try:
+        parsed = json.loads(exam.wizard_config)
+    except (TypeError, ValueError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def ai_violation_enabled(violation_type: str, wizard_config: dict | None, model_profile: dict | None = None) -> bool:
+    """Whether the exam asked to record this AI violation type (mirrors the exam portal's checks)."""
+    config = wizard_config or {}
+    if violation_type in {"SPEECH_DETECTED", "MULTIPLE_SPEAKERS"}:
+        # Audio violations only count for exams that require the microphone (see build_model_profile).
+        return bool((model_profile or {}).get("audio_enabled"))
+    if violation_type == "NO_FACE":
+        return bool(config.get("detectNoFace"))
+    if violation_type == "MULTIPLE_FACES":
+        return bool(config.get("detectMultipleFaces"))
+    if violation_type == "PHONE_DETECTED":
+        return bool(config.get("detectMobilePhone"))
+    return bool(
+        config.get("enableWebcam")
+        or config.get("detectMultipleFaces")
+        or config.get("detectNoFace")
+        or config.get("detectMobilePhone")
     )
 
-    face_count = int(worker_response.get("face_detected") or 0)
-    phone_payload = worker_response.get("phone_detected") or {}
-    if not isinstance(phone_payload, dict):
-        phone_payload = {"status": bool(phone_payload), "confidence": float(worker_response.get("phone_confidence") or 0.0)}
 
-    head_pose_payload = worker_response.get("head_pose") or {}
-    if not isinstance(head_pose_payload, dict):
-        head_pose_payload = {}
+def exam_model_profile(db: Session, exam: Exam) -> dict:
+    rules = db.query(ExamRules).filter_by(exam_id=exam.id).first()
+    return build_model_profile(exam_security_config(exam), rules)
+
+
+def sync_exam_model_profile(db: Session, exam: Exam) -> None:
+    """
+    Register the exam's model profile with the worker in the background. Inference requests
+    also carry the profile, so this only warms the worker; it never delays the caller.
+    """
+    exam_id = exam.id
+    profile = exam_model_profile(db, exam)
+
+    def _send():
+        try:
+            register_exam_profile(exam_id, profile)
+        except AIWorkerError as exc:
+            logger.warning("Failed to register AI model profile for exam %s: %s", exam_id, exc.detail)
+
+    threading.Thread(target=_send, name="ai-worker-profile", daemon=True).start()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            base_url=AI_WORKER_BASE_URL,
+            timeout=AI_WORKER_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=AI_INFERENCE_MAX_CONCURRENCY),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def _post_json_async(path: str, payload: dict) -> dict:
+    try:
+        response = await _get_async_client().post(path, json=payload)
+    except httpx.RequestError as exc:
+        raise AIWorkerError("AI worker is unavailable") from exc
+    if response.status_code >= 400:
+        detail = response.text or response.reason_phrase
+        raise AIWorkerRejected(response.status_code, f"AI worker rejected request: {detail}")
+    return response.json()
+
+
+async def infer_snapshot_async(
+    *,
+    session_id: str,
+    student_id: str,
+    image_base64: str,
+    exam_id: str | None = None,
+    frame_id: str | None = None,
+    model_profile: dict | None = None,
+) -> dict:
+    """
+    Run one live frame through the worker without blocking the event loop. At most
+    AI_INFERENCE_MAX_CONCURRENCY requests are in flight; a frame that cannot get a slot
+    in time is rejected with 503.
+    """
+    try:
+        await asyncio.wait_for(_inference_slots.acquire(), timeout=AI_INFERENCE_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="AI inference is at capacity", headers={"Retry-After": "1"})
+    try:
+        worker_response = await _post_json_async(
+            "/infer/snapshot",
+            {
+                "session_id": session_id,
+                "student_id": student_id,
+                "exam_id": exam_id,
+                "frame_id": frame_id,
+                "image_base64": image_base64,
+                "model_profile": model_profile,
+            },
+        )
+    finally:
+        _inference_slots.release()
+    return normalize_inference_response(worker_response, session_id=session_id, student_id=student_id)
+
 
+async def infer_audio_async(
+    *,
+    session_id: str,
+    student_id: str,
+    audio_base64: str,
+    sample_rate: int,
+    encoding: str = "pcm_s16le",
+    channels: int = 1,
+    exam_id: str | None = None,
+    chunk_id: str | None = None,
+    model_profile: dict | None = None,
+) -> dict:
+    """Voice-activity analysis for one microphone chunk; shares the live-frame concurrency limit."""
+    try:
+        await asyncio.wait_for(_inference_slots.acquire(), timeout=AI_INFERENCE_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="AI inference is at capacity", headers={"Retry-After": "1"})
+    try:
+        worker_response = await _post_json_async(
+            "/infer/audio",
+            {
+                "session_id": session_id,
+                "student_id": student_id,
+                "exam_id": exam_id,
+                "chunk_id": chunk_id,
+                "audio_base64": audio_base64,
+                "sample_rate": sample_rate,
+                "encoding": encoding,
+                "channels": channels,
+                "model_profile": model_profile,
+            },
+        )
+    finally:
+        _inference_slots.release()
+    audio = worker_response.get("audio")
+    return {
+        "session_id": session_id,
+        "student_id": student_id,
+        "audio": audio if isinstance(audio, dict) else None,
+        "violations": _normalize_violations(worker_response),
+        "risk_score": int(worker_response.get("risk_score") or 0),
+        "cached": bool(worker_response.get("cached")),
+    }
+
+
+def _normalize_violations(worker_response: dict) -> list[dict]:
     normalized_violations = []
     for violation in worker_response.get("violations") or []:
         if not isinstance(violation, dict):
@@ -85,6 +348,18 @@ def infer_snapshot(*, session_id: str, student_id: str, image_base64: str) -> di
                 "duration_ms": violation.get("duration_ms"),
             }
         )
+    return normalized_violations
+
+
+def normalize_inference_response(worker_response: dict, *, session_id: str, student_id: str) -> dict:
+    face_count = int(worker_response.get("face_detected") or 0)
+    phone_payload = worker_response.get("phone_detected") or {}
+    if not isinstance(phone_payload, dict):
+        phone_payload = {"status": bool(phone_payload), "confidence": float(worker_response.get("phone_confidence") or 0.0)}
+
+    head_pose_payload = worker_response.get("head_pose") or {}
+    if not isinstance(head_pose_payload, dict):
+        head_pose_payload = {}
 
     phone_detected = bool(phone_payload.get("status"))
     phone_confidence = float(phone_payload.get("confidence") or 0.0)
@@ -108,12 +383,47 @@ def infer_snapshot(*, session_id: str, student_id: str, image_base64: str) -> di
             "blink": bool(head_pose_payload.get("blink")),
             "ear": float(head_pose_payload.get("ear") or 0.0),
             "nose_tip": head_pose_payload.get("nose_tip"),
+            "gaze": head_pose_payload.get("gaze") if isinstance(head_pose_payload.get("gaze"), dict) else None,
         },
-        "violations": normalized_violations,
+        "violations": _normalize_violations(worker_response),
         "risk_score": int(worker_response.get("risk_score") or 0),
+        # Replayed answer for a retried frame; its violations were already recorded.
+        "cached": bool(worker_response.get("cached")),
     }
 
 
+def infer_snapshot_batch(items: list[dict]) -> list[dict]:
+    """
+    Run several frames through the worker in one request. Each item has the same fields as
+    infer_snapshot_async; each result is either a normalized inference response or {"error": detail}.
+    """
+    worker_response = _post_json(
+        "/infer/batch",
+        {"items": items},
+        timeout=AI_WORKER_TIMEOUT_SECONDS * max(1, len(items)),
+    )
+    results = []
+    for item, result in zip(items, worker_response.get("results") or []):
+        if not isinstance(result, dict):
+            results.append({"error": "Invalid worker result"})
+            continue
+        if result.get("error"):
+            results.append({"error": str(result["error"])})
+            continue
+        results.append(normalize_inference_response(result, session_id=item["session_id"], student_id=item["student_id"]))
+    return results
+
+
+def get_worker_capacity() -> int | None:
+    """Largest batch the worker accepts, or None if it cannot be reached."""
+    try:
+        health = _get_json("/health")
+    except AIWorkerError:
+        return None
+    max_batch = health.get("max_batch")
+    return int(max_batch) if max_batch else None
+
+
 def get_worker_health() -> dict:
     worker_health = _get_json("/health")
     return {
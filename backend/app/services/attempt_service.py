@@ -13,6 +13,7 @@ from ..models.exam_question import ExamQuestion
 from ..models.question import Question
 from ..models.violation import Violation
 from ..schemas.attempt import AttemptGradePatchRequest
+from .session_service import session_liveness
 
 
 def utcnow() -> datetime:
@@ -388,6 +389,7 @@ def force_end_exam(db: Session, exam_id: str, owner_id: str) -> tuple[Exam, int]
         count += 1
 
     db.commit()
+    session_liveness.invalidate_exam(exam_id)
     db.refresh(exam)
     return exam, count
 
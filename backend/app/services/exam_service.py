@@ -1,3 +1,7 @@
+import base64
+import logging
+import os
+import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -7,10 +11,14 @@ from ..models.exam import Exam
 from ..models.exam_rules import ExamRules
 from ..models.violation import Violation
 from ..models.exam_session import ExamSession, SessionStatus
+from .ai_worker import end_worker_session
+from .session_service import session_liveness
 
 
 RECONNECT_WINDOW_SECONDS = 120  # default allowed window for reconnects
 
+logger = logging.getLogger(__name__)
+
 
 def create_exam(db: Session, title: str, created_by: str) -> Exam:
     exam = Exam(title=title, created_by=created_by)
@@ -99,6 +107,8 @@ def end_exam_session(db: Session, session_id: str, terminated_by: str = "system"
 
     try:
         db.commit()
+        session_liveness.invalidate_session(session_id)
+        end_worker_session(session_id)
         db.refresh(session)
         return session
     except Exception as e:
@@ -106,6 +116,27 @@ def end_exam_session(db: Session, session_id: str, terminated_by: str = "system"
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to end session: {e}")
 
 
+def save_evidence_image(session_id: str, image: str | None) -> str | None:
+    """Store a base64 (data URL or bare) evidence frame under data/evidence and return its public path."""
+    if not image:
+        return None
+    try:
+        evidence_dir = os.path.join("data", "evidence")
+        os.makedirs(evidence_dir, exist_ok=True)
+
+        header, encoded = image.split(",", 1) if "," in image else ("", image)
+        image_data = base64.b64decode(encoded)
+        filename = f"{session_id}_{uuid.uuid4().hex[:8]}.jpg"
+        filepath = os.path.join(evidence_dir, filename)
+
+        with open(filepath, "wb") as f:
+            f.write(image_data)
+        return f"/evidence/{filename}"
+    except Exception:
+        logger.exception("Failed to save evidence snapshot for session %s", session_id)
+        return None
+
+
 def auto_terminate_on_violation(
     db: Session,
     session_id: str,
@@ -115,10 +146,13 @@ def auto_terminate_on_violation(
     evidence_files: str | None = None,
     reason: str | None = None,
     duration_ms: int | None = None,
-    confidence: float | None = None
+    confidence: float | None = None,
+    source: str | None = None,
+    timestamp: datetime | None = None
 ) -> ExamSession:
     """
     Increment violation counts, calculate integrity score, log to audit trail, and auto-terminate if thresholds reached.
+    `timestamp` dates the violation when it is recorded after the fact (e.g. snapshot analysis).
     """
     session = db.query(ExamSession).filter_by(id=session_id).first()
     if not session:
@@ -135,6 +169,9 @@ def auto_terminate_on_violation(
         elif "FULLSCREEN" in vt: base = 20
         elif "SPOOF" in vt: base = 40
         elif "LOOKING_AWAY" in vt: base = 20
+        elif "IDENTITY" in vt: base = 10  # heuristic embedding, not yet validated
+        elif "SPEAKERS" in vt: base = 40
+        elif "SPEECH" in vt: base = 20
 
     # Violations: 50%
     deduction = base * 0.5
@@ -180,8 +217,11 @@ def auto_terminate_on_violation(
         type=violation_type,
         evidence_files=evidence_files,
         reason=reason,
-        duration_ms=duration_ms
+        duration_ms=duration_ms,
+        source=source
     )
+    if timestamp is not None:
+        v.timestamp = timestamp
     db.add(v)
 
     # Audit log the violation
@@ -0,0 +1,167 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam
+
+from ..database import SessionLocal
+from ..models.exam_session import ExamSession
+from ..models.presence_interval import PresenceInterval
+
+# Heartbeats further apart than this start a new interval (the student was offline in
+# between); matches the websocket manager's presence timeout.
+PRESENCE_GAP_SECONDS = float(os.getenv("PRESENCE_GAP_SECONDS", "15"))
+PRESENCE_FLUSH_SECONDS = float(os.getenv("PRESENCE_FLUSH_SECONDS", "30"))
+
+
+def _to_datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+class PresenceRecorder:
+    """
+    Write-behind presence timeline for exam sessions.
+
+    Heartbeats are run-length encoded in memory: each session has at most one open
+    interval, which a heartbeat either extends or, after a gap, closes in favour of a new
+    one. A background thread writes new and changed intervals in bulk every
+    PRESENCE_FLUSH_SECONDS, together with ExamSession.last_heartbeat, so a session costs
+    one row per online stretch rather than one per heartbeat. A crash loses at most one
+    flush period.
+    """
+
+    def __init__(self, gap_seconds: float = PRESENCE_GAP_SECONDS, flush_seconds: float = PRESENCE_FLUSH_SECONDS) -> None:
+        self.gap_seconds = gap_seconds
+        self.flush_seconds = flush_seconds
+        # Format: { session_id: { "id": str, "exam_id": str | None, "started_at": float, "ended_at": float,
+        #                         "heartbeats": int, "persisted": bool, "dirty": bool } }
+        self.open: dict[str, dict] = {}
+        self.closed: list[tuple[str, dict]] = []  # closed since the last flush and not yet written
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def heartbeat(self, session_id: str, exam_id: str | None, now: float) -> None:
+        with self.lock:
+            interval = self.open.get(session_id)
+            if interval is not None and now - interval["ended_at"] <= self.gap_seconds:
+                interval["ended_at"] = max(interval["ended_at"], now)
+                interval["heartbeats"] += 1
+                interval["dirty"] = True
+                return
+            if interval is not None:
+                self.closed.append((session_id, interval))
+            self.open[session_id] = {
+                "id": str(uuid.uuid4()),
+                "exam_id": exam_id,
+                "started_at": now,
+                "ended_at": now,
+                "heartbeats": 1,
+                "persisted": False,
+                "dirty": True,
+            }
+
+    def disconnect(self, session_id: str, now: float) -> None:
+        """Close the session's interval at `now`; the socket was connected until then."""
+        with self.lock:
+            interval = self.open.pop(session_id, None)
+            if interval is None:
+                return
+            if now - interval["ended_at"] <= self.gap_seconds:
+                interval["ended_at"] = max(interval["ended_at"], now)
+                interval["dirty"] = True
+            self.closed.append((session_id, interval))
+
+    def intervals(self, session_id: str) -> list[dict]:
+        """This process's not-yet-closed-in-the-database intervals for a session."""
+        with self.lock:
+            pending = [dict(iv) for sid, iv in self.closed if sid == session_id]
+            if session_id in self.open:
+                pending.append(dict(self.open[session_id]))
+        return pending
+
+    def flush(self, now: float | None = None) -> int:
+        """Write pending intervals; returns the number of rows inserted or updated."""
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        with self.lock:
+            # Sessions that stopped heartbeating without a disconnect (e.g. a lost process
+            # on the other end) are closed at their last heartbeat.
+            for session_id in [sid for sid, iv in self.open.items() if now - iv["ended_at"] > self.gap_seconds]:
+                self.closed.append((session_id, self.open.pop(session_id)))
+            batch = [(sid, iv) for sid, iv in self.closed if iv["dirty"]]
+            batch += [(sid, iv) for sid, iv in self.open.items() if iv["dirty"]]
+            rows = [
+                (
+                    iv["persisted"],
+                    {
+                        "id": iv["id"],
+                        "session_id": sid,
+                        "exam_id": iv["exam_id"],
+                        "started_at": _to_datetime(iv["started_at"]),
+                        "ended_at": _to_datetime(iv["ended_at"]),
+                        "heartbeats": iv["heartbeats"],
+                    },
+                )
+                for sid, iv in batch
+            ]
+            for _, iv in batch:
+                iv["dirty"] = False
+            closed, self.closed = self.closed, []
+        if not rows:
+            return 0
+
+        last_heartbeats: dict[str, datetime] = {}
+        for _, row in rows:
+            current = last_heartbeats.get(row["session_id"])
+            if current is None or row["ended_at"] > current:
+                last_heartbeats[row["session_id"]] = row["ended_at"]
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(PresenceInterval, [row for persisted, row in rows if not persisted])
+            db.bulk_update_mappings(PresenceInterval, [row for persisted, row in rows if persisted])
+            # Core executemany: sessions deleted in the meantime simply match no row.
+            sessions = ExamSession.__table__
+            db.execute(
+                sessions.update().where(sessions.c.id == bindparam("session_id")).values(last_heartbeat=bindparam("ts")),
+                [{"session_id": sid, "ts": ts} for sid, ts in last_heartbeats.items()],
+            )
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            print(f"Presence flush failed, retrying next period: {exc}")
+            with self.lock:
+                for _, iv in batch:
+                    iv["dirty"] = True
+                self.closed = [item for item in closed if item[1]["dirty"]] + self.closed
+            return 0
+        finally:
+            db.close()
+
+        with self.lock:
+            for _, iv in batch:
+                iv["persisted"] = True
+        return len(rows)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="presence-recorder", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+
+presence_recorder = PresenceRecorder()
@@ -0,0 +1,212 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+
+def _positive_env(name: str, default: float) -> float:
+    """Read a rate or burst from the environment; non-positive or invalid values use the default."""
+    try:
+        value = float(os.getenv(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+# Sustained frames per second and burst size for live-frame inference. Exams can override
+# the per-student and per-exam rates through their security settings (see limits_for_exam).
+INFERENCE_STUDENT_RATE = _positive_env("INFERENCE_STUDENT_RATE", 2.0)
+INFERENCE_STUDENT_BURST = _positive_env("INFERENCE_STUDENT_BURST", 4.0)
+INFERENCE_EXAM_RATE = _positive_env("INFERENCE_EXAM_RATE", 100.0)
+INFERENCE_EXAM_BURST = _positive_env("INFERENCE_EXAM_BURST", 200.0)
+INFERENCE_GLOBAL_RATE = _positive_env("INFERENCE_GLOBAL_RATE", 300.0)
+INFERENCE_GLOBAL_BURST = _positive_env("INFERENCE_GLOBAL_BURST", 600.0)
+# Buckets untouched for this long are full again and can be dropped.
+INFERENCE_BUCKET_IDLE_SECONDS = 300
+# Admitted frame ids are remembered this long (the worker's result cache TTL) so a client
+# retrying one, e.g. after a timeout, is not charged again for an answer served from cache.
+INFERENCE_RETRY_WINDOW_SECONDS = 120
+INFERENCE_RETRY_MAX_TRACKED = 20000
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (InferenceRateLimiter locks)."""
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        if self.tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.rate
+
+
+def limits_for_exam(security_config: dict | None) -> dict:
+    """
+    Per-student and per-exam inference limits for an exam. Teachers can set
+    `inferenceFramesPerSecond` (per student) and `inferenceExamFramesPerSecond` in the
+    exam's security settings; invalid or missing values fall back to the defaults.
+    """
+    config = security_config or {}
+
+    def _rate(key: str, default: float) -> float:
+        try:
+            value = float(config.get(key))
+        except (TypeError, ValueError):
+            return default
+        return value if value > 0 else default
+
+    student_rate = _rate("inferenceFramesPerSecond", INFERENCE_STUDENT_RATE)
+    exam_rate = _rate("inferenceExamFramesPerSecond", INFERENCE_EXAM_RATE)
+    # Overridden rates keep the default burst window (burst / rate seconds of traffic).
+    student_burst_seconds = INFERENCE_STUDENT_BURST / INFERENCE_STUDENT_RATE
+    exam_burst_seconds = INFERENCE_EXAM_BURST / INFERENCE_EXAM_RATE
+    return {
+        "student_rate": student_rate,
+        "student_burst": max(1.0, student_rate * student_burst_seconds),
+        "exam_rate": exam_rate,
+        "exam_burst": max(1.0, exam_rate * exam_burst_seconds),
+    }
+
+
+class InferenceRateLimiter:
+    """
+    Token buckets per student, per exam and for the whole process, checked together.
+
+    A frame is admitted only if all three buckets have a token, and then takes one from
+    each. Otherwise nothing is taken and the caller gets the wait until every bucket
+    would admit it, so clients back off instead of queuing on the worker. A retry of a
+    frame_id admitted within INFERENCE_RETRY_WINDOW_SECONDS is admitted without a token.
+    """
+
+    def __init__(self, global_rate: float = INFERENCE_GLOBAL_RATE, global_burst: float = INFERENCE_GLOBAL_BURST) -> None:
+        now = time.monotonic()
+        self.global_bucket = TokenBucket(global_rate, global_burst, now)
+        self.student_buckets: dict[str, TokenBucket] = {}
+        self.exam_buckets: dict[str, TokenBucket] = {}
+        # Format: { "student" | "exam" | "global": int }
+        self.rejected = {"student": 0, "exam": 0, "global": 0}
+        self.admitted = 0
+        self.retries = 0
+        # (student_key, frame_id) -> monotonic admission time, oldest first
+        self.admitted_frames: "OrderedDict[tuple[str, str], float]" = OrderedDict()
+        self.lock = threading.Lock()
+        self._last_sweep = now
+
+    def _bucket(self, buckets: dict[str, TokenBucket], key: str, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst, now)
+        elif bucket.rate != rate or bucket.burst != burst:
+            # The exam's limits changed; keep the current level, capped at the new burst.
+            bucket.refill(now)
+            bucket.rate, bucket.burst = rate, burst
+            bucket.tokens = min(bucket.tokens, burst)
+        return bucket
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < INFERENCE_BUCKET_IDLE_SECONDS:
+            return
+        self._last_sweep = now
+        for buckets in (self.student_buckets, self.exam_buckets):
+            for key in [k for k, b in buckets.items() if now - b.updated_at > INFERENCE_BUCKET_IDLE_SECONDS]:
+                del buckets[key]
+
+    def _is_retry(self, frame_key: tuple[str, str] | None, now: float) -> bool:
+        cutoff = now - INFERENCE_RETRY_WINDOW_SECONDS
+        while self.admitted_frames:
+            key, admitted_at = next(iter(self.admitted_frames.items()))
+            if admitted_at > cutoff and len(self.admitted_frames) <= INFERENCE_RETRY_MAX_TRACKED:
+                break
+            del self.admitted_frames[key]
+        return frame_key is not None and frame_key in self.admitted_frames
+
+    def acquire(
+        self,
+        student_key: str,
+        exam_id: str | None,
+        security_config: dict | None = None,
+        frame_id: str | None = None,
+    ) -> float:
+        """Take one token from each bucket; returns 0 when admitted, else seconds to wait."""
+        limits = limits_for_exam(security_config)
+        now = time.monotonic()
+        frame_key = (student_key, frame_id) if frame_id else None
+        with self.lock:
+            if self._is_retry(frame_key, now):
+                self.retries += 1
+                return 0.0
+            self._sweep(now)
+            checks = [
+                ("student", self._bucket(self.student_buckets, student_key, limits["student_rate"], limits["student_burst"], now)),
+                ("global", self.global_bucket),
+            ]
+            if exam_id:
+                checks.insert(1, ("exam", self._bucket(self.exam_buckets, exam_id, limits["exam_rate"], limits["exam_burst"], now)))
+
+            waits = []
+            for scope, bucket in checks:
+                bucket.refill(now)
+                waits.append((bucket.wait_time(), scope))
+            retry_after, scope = max(waits)
+            if retry_after > 0:
+                self.rejected[scope] += 1
+                return retry_after
+
+            for _, bucket in checks:
+                bucket.tokens -= 1
+            self.admitted += 1
+            if frame_key is not None:
+                self.admitted_frames[frame_key] = now
+            return 0.0
+
+    def check(
+        self,
+        student_key: str,
+        exam_id: str | None,
+        security_config: dict | None = None,
+        frame_id: str | None = None,
+    ) -> None:
+        """Like acquire, but raises 429 with a Retry-After header when the frame is not admitted."""
+        retry_after = self.acquire(student_key, exam_id, security_config, frame_id)
+        if retry_after > 0:
+            seconds = max(1, math.ceil(min(retry_after, 3600)))
+            raise HTTPException(
+                status_code=429,
+                detail={"message": "Inference rate limit exceeded", "retry_after": round(retry_after, 3)},
+                headers={"Retry-After": str(seconds)},
+            )
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "admitted": self.admitted,
+                "retries": self.retries,
+                "rejected": dict(self.rejected),
+                "active_students": len(self.student_buckets),
+                "active_exams": len(self.exam_buckets),
+                "exams": {exam_id: {"rate": b.rate, "burst": b.burst} for exam_id, b in self.exam_buckets.items()},
+                "global": {"rate": self.global_bucket.rate, "burst": self.global_bucket.burst},
+                "defaults": {
+                    "student_rate": INFERENCE_STUDENT_RATE,
+                    "student_burst": INFERENCE_STUDENT_BURST,
+                    "exam_rate": INFERENCE_EXAM_RATE,
+                    "exam_burst": INFERENCE_EXAM_BURST,
+                },
+            }
+
+
+inference_rate_limiter = InferenceRateLimiter()
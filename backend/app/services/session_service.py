@@ -1,6 +1,12 @@
+import os
+import threading
+import time
+
 from sqlalchemy.orm import Session
+from ..database import SessionLocal
 from ..models.exam_session import ExamSession, SessionStatus
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 
 def assert_session_is_live(db: Session, session_id: str, student_id: str):
@@ -17,3 +23,148 @@ def assert_session_is_live(db: Session, session_id: str, student_id: str):
         raise HTTPException(400, "Session is not active")
 
     return session
+
+
+SESSION_LIVENESS_TTL_SECONDS = float(os.getenv("SESSION_LIVENESS_TTL_SECONDS", "5"))
+SESSION_LIVENESS_MAX_ENTRIES = 50000
+# Sessions pinned as ended by a proctor are forgotten after this long (as in the websocket manager).
+ENDED_SESSION_TTL_SECONDS = int(os.getenv("ENDED_SESSION_TTL_SECONDS", str(12 * 3600)))
+
+
+class SessionLivenessCache:
+    """
+    Process-local (session_id, student_id) -> liveness for per-frame routes.
+
+    Entries expire after a short TTL as a safety net; every code path that ends a session
+    invalidates it immediately. Proctor END_EXAM messages are not written to the database,
+    so those pin the session as ended in the cache for `ended_ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = SESSION_LIVENESS_TTL_SECONDS,
+        max_entries: int = SESSION_LIVENESS_MAX_ENTRIES,
+        ended_ttl_seconds: float = ENDED_SESSION_TTL_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.ended_ttl_seconds = ended_ttl_seconds
+        # Format: { session_id: { "student_id": str, "live": bool, "exam_id": str | None, "security_config": dict | None, "model_profile": dict | None, "expires_at": float } }
+        self.entries: dict[str, dict] = {}
+        # session_id -> monotonic time it was pinned; insertion order is pin order
+        self.ended: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def _expire_ended(self, now: float) -> None:
+        cutoff = now - self.ended_ttl_seconds
+        while self.ended:
+            session_id, pinned_at = next(iter(self.ended.items()))
+            if pinned_at > cutoff:
+                break
+            del self.ended[session_id]
+
+    def get(self, session_id: str, student_id: str) -> dict | None:
+        with self.lock:
+            self._expire_ended(time.monotonic())
+            if session_id in self.ended:
+                return {"live": False, "exam_id": None, "security_config": None, "model_profile": None}
+            entry = self.entries.get(session_id)
+            if entry is None or entry["student_id"] != student_id:
+                return None
+            if entry["expires_at"] <= time.monotonic():
+                del self.entries[session_id]
+                return None
+            return entry
+
+    def put(
+        self,
+        session_id: str,
+        student_id: str,
+        live: bool,
+        exam_id: str | None,
+        security_config: dict | None,
+        model_profile: dict | None = None,
+    ) -> dict:
+        entry = {
+            "student_id": student_id,
+            "live": live,
+            "exam_id": exam_id,
+            "security_config": security_config,
+            "model_profile": model_profile,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                now = time.monotonic()
+                for key in [k for k, v in self.entries.items() if v["expires_at"] <= now]:
+                    del self.entries[key]
+            self.entries[session_id] = entry
+        return entry
+
+    def invalidate_session(self, session_id: str) -> None:
+        with self.lock:
+            self.entries.pop(session_id, None)
+
+    def invalidate_exam(self, exam_id: str) -> None:
+        with self.lock:
+            for key in [k for k, v in self.entries.items() if v["exam_id"] == exam_id]:
+                del self.entries[key]
+
+    def mark_ended(self, session_id: str) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self._expire_ended(now)
+            self.ended.setdefault(session_id, now)
+            self.entries.pop(session_id, None)
+
+
+session_liveness = SessionLivenessCache()
+
+
+def require_live_entry(entry: dict) -> dict:
+    if not entry["live"]:
+        raise HTTPException(400, "Session is not active")
+    return entry
+
+
+def load_live_session(session_id: str, student_id: str) -> dict:
+    """Cache miss path of get_live_session: reads the session from the database and caches it."""
+    from ..models.exam import Exam
+    from .ai_worker import exam_model_profile, exam_security_config
+
+    db = SessionLocal()
+    try:
+        session = db.query(ExamSession).filter_by(id=session_id, student_id=student_id).first()
+        if not session:
+            raise HTTPException(404, "Session not found")
+        security_config = None
+        model_profile = None
+        live = session.status == SessionStatus.LIVE
+        if live:
+            exam = db.query(Exam).filter_by(id=session.exam_id).first()
+            security_config = exam_security_config(exam)
+            if exam is not None:
+                model_profile = exam_model_profile(db, exam)
+        entry = session_liveness.put(session_id, student_id, live, session.exam_id, security_config, model_profile)
+    finally:
+        db.close()
+    return require_live_entry(entry)
+
+
+def get_live_session(session_id: str, student_id: str) -> dict:
+    """
+    Cached equivalent of assert_session_is_live for per-frame routes. Returns the cache
+    entry (exam_id, security_config) and raises the same errors.
+    """
+    entry = session_liveness.get(session_id, student_id)
+    if entry is None:
+        return load_live_session(session_id, student_id)
+    return require_live_entry(entry)
+
+
+async def get_live_session_async(session_id: str, student_id: str) -> dict:
+    """get_live_session for async routes: one cache lookup, and a miss is loaded off the event loop."""
+    entry = session_liveness.get(session_id, student_id)
+    if entry is None:
+        return await run_in_threadpool(load_live_session, session_id, student_id)
+    return require_live_entry(entry)
@@ -0,0 +1,278 @@
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from ..database import SessionLocal
+from ..models.exam import Exam
+from ..models.exam_session import ExamSession
+from ..models.snapshot import Snapshot
+from ..models.violation import Violation
+from .ai_worker import (
+    AI_RECORDED_SEVERITY,
+    AIWorkerError,
+    AIWorkerRejected,
+    ai_violation_enabled,
+    exam_model_profile,
+    exam_security_config,
+    get_worker_capacity,
+    infer_snapshot_batch,
+    snapshot_worker_session_id,
+)
+from .attempt_service import utcnow
+from .exam_service import auto_terminate_on_violation
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ANALYSIS_BATCH_SIZE = int(os.getenv("SNAPSHOT_ANALYSIS_BATCH_SIZE", "8"))
+# Seconds to wait before retrying when the worker is unreachable or failing (4xx rejections are not retried).
+SNAPSHOT_ANALYSIS_RETRY_SECONDS = float(os.getenv("SNAPSHOT_ANALYSIS_RETRY_SECONDS", "15"))
+SNAPSHOT_VIOLATION_SOURCE = "snapshot_analysis"
+# A snapshot violation is skipped when the session already has one of the same type (from
+# any source, e.g. the live path) this close in time, so one event is not counted twice.
+SNAPSHOT_VIOLATION_DEDUPE_SECONDS = float(os.getenv("SNAPSHOT_VIOLATION_DEDUPE_SECONDS", "30"))
+# How long the worker's advertised batch size is trusted before /health is asked again.
+WORKER_CAPACITY_REFRESH_SECONDS = 300
+
+
+class SnapshotAnalysisQueue:
+    """
+    Hands uploaded snapshots to the AI worker in the background.
+
+    Uploads only enqueue the snapshot id; a single thread drains the queue in batches no
+    larger than the worker advertises, stores the result on the Snapshot row and records
+    the worker's confirmed (temporal) violations through auto_terminate_on_violation, like
+    the live path, so they count toward the integrity score and thresholds. Pending rows are
+    re-queued on startup, so nothing is lost across restarts.
+    """
+
+    def __init__(self, batch_size: int = SNAPSHOT_ANALYSIS_BATCH_SIZE) -> None:
+        self.batch_size = max(1, batch_size)
+        self.queue: "queue.Queue[str]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._capacity: int | None = None
+        self._capacity_checked_at = 0.0
+
+    def enqueue(self, snapshot_id: str) -> None:
+        self.queue.put(snapshot_id)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        db = SessionLocal()
+        try:
+            pending = (
+                db.query(Snapshot.id)
+                .filter_by(analysis_status="pending")
+                .order_by(Snapshot.created_at)
+                .all()
+            )
+        finally:
+            db.close()
+        for (snapshot_id,) in pending:
+            self.enqueue(snapshot_id)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-analysis", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _next_batch(self) -> list[str]:
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        capacity = self._worker_capacity()
+        limit = min(self.batch_size, capacity) if capacity else self.batch_size
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker_capacity(self) -> int | None:
+        now = time.monotonic()
+        if self._capacity is None or now - self._capacity_checked_at >= WORKER_CAPACITY_REFRESH_SECONDS:
+            self._capacity = get_worker_capacity()
+            self._capacity_checked_at = now
+        return self._capacity
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.process_batch(batch)
+            except AIWorkerRejected as exc:
+                if 400 <= exc.worker_status < 500:
+                    self._handle_rejected_batch(batch, exc)
+                else:
+                    self._defer(batch, exc)
+            except AIWorkerError as exc:
+                self._defer(batch, exc)
+            except Exception:
+                logger.exception("Snapshot analysis failed")
+
+    def _defer(self, batch: list[str], exc: AIWorkerError) -> None:
+        # Worker unreachable or failing: keep the snapshots and retry later.
+        logger.warning("Snapshot analysis deferred (%d snapshots): %s", len(batch), exc.detail)
+        for snapshot_id in batch:
+            self.enqueue(snapshot_id)
+        self._capacity = None
+        self._stop.wait(SNAPSHOT_ANALYSIS_RETRY_SECONDS)
+
+    def _handle_rejected_batch(self, batch: list[str], exc: AIWorkerRejected) -> None:
+        """
+        A 4xx will not go away by retrying the same request. A batch is split into single
+        snapshots (the worker may have shrunk its batch limit); a single rejected snapshot
+        is marked failed.
+        """
+        self._capacity = None
+        if len(batch) > 1:
+            for snapshot_id in batch:
+                try:
+                    self.process_batch([snapshot_id])
+                except AIWorkerRejected as single_exc:
+                    if 400 <= single_exc.worker_status < 500:
+                        self._mark_failed(snapshot_id, single_exc.detail)
+                    else:
+                        self._defer([snapshot_id], single_exc)
+                except AIWorkerError as single_exc:
+                    self._defer([snapshot_id], single_exc)
+            return
+        self._mark_failed(batch[0], exc.detail)
+
+    def _mark_failed(self, snapshot_id: str, detail: str) -> None:
+        logger.warning("Snapshot %s rejected by the AI worker: %s", snapshot_id, detail)
+        db = SessionLocal()
+        try:
+            snap = db.query(Snapshot).filter_by(id=snapshot_id, analysis_status="pending").first()
+            if snap:
+                snap.analysis_status = "failed"
+                snap.analysis_result = json.dumps({"error": detail})
+                snap.analyzed_at = utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _is_duplicate(db, session_id: str, violation_type: str, at, recorded: dict) -> bool:
+        window = timedelta(seconds=SNAPSHOT_VIOLATION_DEDUPE_SECONDS)
+        if any(abs(at - seen) <= window for seen in recorded.get((session_id, violation_type), ())):
+            return True
+        return (
+            db.query(Violation.id)
+            .filter(
+                Violation.session_id == session_id,
+                Violation.type == violation_type,
+                Violation.timestamp >= at - window,
+                Violation.timestamp <= at + window,
+            )
+            .first()
+            is not None
+        )
+
+    def process_batch(self, snapshot_ids: list[str]) -> int:
+        """Analyze the pending snapshots among `snapshot_ids`; returns the violations recorded."""
+        db = SessionLocal()
+        try:
+            snapshots = (
+                db.query(Snapshot)
+                .filter(Snapshot.id.in_(snapshot_ids), Snapshot.analysis_status == "pending")
+                .order_by(Snapshot.created_at)
+                .all()
+            )
+            if not snapshots:
+                return 0
+
+            exam_ids = dict(
+                db.query(ExamSession.id, ExamSession.exam_id)
+                .filter(ExamSession.id.in_({s.session_id for s in snapshots}))
+                .all()
+            )
+            exams = db.query(Exam).filter(Exam.id.in_(set(exam_ids.values()))).all()
+            # Sent with each item so a restarted worker still applies the exam's profile.
+            model_profiles = {exam.id: exam_model_profile(db, exam) for exam in exams}
+            security_configs = {exam.id: exam_security_config(exam) for exam in exams}
+
+            items = []
+            ready = []
+            for snap in snapshots:
+                try:
+                    with open(snap.file_path, "rb") as f:
+                        image_base64 = base64.b64encode(f.read()).decode("ascii")
+                except OSError as exc:
+                    snap.analysis_status = "failed"
+                    snap.analysis_result = json.dumps({"error": f"Snapshot file unreadable: {exc}"})
+                    snap.analyzed_at = utcnow()
+                    continue
+                items.append({
+                    "session_id": snapshot_worker_session_id(snap.session_id),
+                    "student_id": snap.student_id,
+                    "exam_id": exam_ids.get(snap.session_id),
+                    "frame_id": snap.id,
+                    "image_base64": image_base64,
+                    "model_profile": model_profiles.get(exam_ids.get(snap.session_id)),
+                })
+                ready.append(snap)
+
+            created = 0
+            recorded: dict[tuple[str, str], list] = {}
+            results = infer_snapshot_batch(items) if items else []
+            for snap, result in zip(ready, results):
+                snap.analyzed_at = utcnow()
+                if result.get("error"):
+                    snap.analysis_status = "failed"
+                    snap.analysis_result = json.dumps(result)
+                    continue
+                result["session_id"] = snap.session_id
+                snap.analysis_status = "done"
+                snap.analysis_result = json.dumps(result)
+                security_config = security_configs.get(exam_ids.get(snap.session_id))
+                at = snap.created_at or utcnow()
+                if snap.session_id not in exam_ids:
+                    continue  # session deleted since the upload; nothing to record against
+                for v in result["violations"]:
+                    # Same rules as the live path: only types the exam asked for, once per event.
+                    if not ai_violation_enabled(v["type"], security_config):
+                        continue
+                    if self._is_duplicate(db, snap.session_id, v["type"], at, recorded):
+                        continue
+                    recorded.setdefault((snap.session_id, v["type"]), []).append(at)
+                    # Commits, together with the snapshot rows updated so far.
+                    auto_terminate_on_violation(
+                        db,
+                        snap.session_id,
+                        AI_RECORDED_SEVERITY,
+                        violation_type=v["type"],
+                        evidence_files=json.dumps([f"/snapshots/file/{snap.id}"]),
+                        reason=v.get("reason"),
+                        duration_ms=v.get("duration_ms"),
+                        confidence=v.get("confidence"),
+                        source=SNAPSHOT_VIOLATION_SOURCE,
+                        timestamp=at,
+                    )
+                    created += 1
+            db.commit()
+            return created
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+snapshot_analysis_queue = SnapshotAnalysisQueue()
@@ -0,0 +1,41 @@
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # optional: only offered to clients when installed
+    msgpack = None
+
+# Wire formats for server -> proctor messages, negotiated through the WebSocket
+# subprotocol header. Clients list what they accept in order of preference; clients that
+# offer none of these get plain JSON text frames as before.
+JSON = "smartproctor.json"
+JSON_DEFLATE = "smartproctor.json.deflate"  # binary zlib stream; browsers inflate it with DecompressionStream("deflate")
+MSGPACK = "smartproctor.msgpack"
+
+# Level 6 is zlib's default; dashboards mostly get small, repetitive JSON that compresses well at any level.
+DEFLATE_LEVEL = 6
+
+
+def supported_codecs() -> list[str]:
+    codecs = [JSON_DEFLATE, JSON]
+    if msgpack is not None:
+        codecs.insert(0, MSGPACK)
+    return codecs
+
+
+def negotiate(requested: list[str] | None) -> str | None:
+    """The first requested subprotocol this server supports, or None for legacy JSON clients."""
+    supported = supported_codecs()
+    for codec in requested or []:
+        if codec in supported:
+            return codec
+    return None
+
+
+def encode(codec: str | None, message: dict) -> str | bytes:
+    if codec == JSON_DEFLATE:
+        return zlib.compress(json.dumps(message, separators=(",", ":")).encode("utf-8"), DEFLATE_LEVEL)
+    if codec == MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message)
@@ -1,25 +1,139 @@
+import os
 import time
 import json
 import asyncio
-from collections import defaultdict
+import logging
+import uuid
+from collections import OrderedDict, defaultdict, deque
 from fastapi import WebSocket
 from starlette.websockets import WebSocketState
 
+from . import codec
+from .outbox import ConnectionOutbox
+from .pubsub import PubSubBus
+
+# Messages buffered per proctor connection before the slow-consumer policy applies.
+PROCTOR_OUTBOX_SIZE = int(os.getenv("PROCTOR_OUTBOX_SIZE", "256"))
+# "drop_oldest" discards that proctor's oldest pending message; "disconnect" closes the
+# connection so the dashboard reconnects and resyncs.
+PROCTOR_SLOW_CONSUMER_POLICY = os.getenv("PROCTOR_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Optional coalescing: collect an exam's events for this long and send them to each proctor
+# as one BATCH frame (serialized once). 0 sends every event as its own frame.
+PROCTOR_BATCH_WINDOW_MS = int(os.getenv("PROCTOR_BATCH_WINDOW_MS", "0"))
+PROCTOR_BATCH_MAX_EVENTS = 500
+# A student is offline after this long without a heartbeat.
+PRESENCE_TIMEOUT_SECONDS = 15
+# Sweeps send only presence changes; every Nth sweep sends each exam's full status map.
+FULL_STATUS_SYNC_EVERY = 12
+# An exam's broadcaster and per-session state are torn down once it has had no local
+# connections for this long; ended-session flags are kept for ENDED_SESSION_TTL_SECONDS.
+EXAM_IDLE_GRACE_SECONDS = int(os.getenv("EXAM_IDLE_GRACE_SECONDS", "120"))
+ENDED_SESSION_TTL_SECONDS = int(os.getenv("ENDED_SESSION_TTL_SECONDS", str(12 * 3600)))
+
+# Recent broadcasts kept per exam so a reconnecting proctor can resume where it left off.
+EXAM_EVENT_LOG_SIZE = int(os.getenv("EXAM_EVENT_LOG_SIZE", "2000"))
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channels; every process delivers to the connections it holds.
+PROCTOR_BROADCAST = "proctor_broadcast"
+STUDENT_COMMAND = "student_command"
+SESSION_ENDED = "session_ended"
+PRESENCE_REQUEST = "presence_request"
+
 class ConnectionManager:
     def __init__(self):
         self.student_connections = {}  # session_id -> WebSocket
+        self.student_outboxes = {}  # session_id -> ConnectionOutbox for that WebSocket
         self.proctor_connections = defaultdict(list)  # exam_id -> List[WebSocket]
         self.session_to_exam = {}  # session_id -> exam_id
+        self.exam_sessions = defaultdict(set)  # exam_id -> set of session_ids
         
         # Tracking enhancements
         self.last_seen = {} # session_id -> timestamp
-        self.ended_sessions = set() # session_id -> bool flags
+        self.ended_sessions = {} # session_id -> ended_at timestamp
         self.student_states = defaultdict(dict) # session_id -> latest sync state
+
+        # Presence: sessions currently live, oldest heartbeat first, so a sweep only
+        # looks at the ones about to time out.
+        self.presence = {} # session_id -> "live" | "offline"
+        self.live_sessions = OrderedDict() # session_id -> last heartbeat timestamp
+        self.presence_changes = defaultdict(dict) # exam_id -> {session_id: status} since last sweep
+        self.sweep_count = 0
         
         # Backpressure queues
         self.exam_queues = {} # exam_id -> asyncio.Queue
         self.broadcaster_tasks = {} # exam_id -> asyncio.Task
 
+        # Lifecycle: local student + proctor connections per exam; exams at zero are
+        # torn down by the sweeper after the grace period.
+        self.exam_refs = defaultdict(int) # exam_id -> open connections
+        self.exam_idle_since = {} # exam_id -> timestamp the last connection closed
+
+        # Replay log: every broadcast gets the next sequence number of its exam. The epoch
+        # changes whenever the log is recreated, so stale resume points are detectable.
+        self.exam_logs = {} # exam_id -> { "epoch": str, "seq": int, "sent_seq": int, "events": deque }
+
+        # Per-proctor fan-out: each connection drains its own queue, so one slow browser
+        # only delays itself.
+        self.proctor_outboxes = {} # WebSocket -> asyncio.Queue of serialized messages
+        self.proctor_senders = {} # WebSocket -> asyncio.Task
+        self.proctor_codecs = {} # WebSocket -> negotiated wire format (None: JSON text)
+        self.fanout_stats = {"dropped_messages": 0, "slow_disconnects": 0}
+
+        # Cross-process delivery. Until a bus is attached, events go straight to the local handlers.
+        self.instance_id = uuid.uuid4().hex
+        self.bus: PubSubBus | None = None
+        self._bus_handlers = {
+            PROCTOR_BROADCAST: self._on_proctor_broadcast,
+            STUDENT_COMMAND: self._on_student_command,
+            SESSION_ENDED: self._on_session_ended,
+            PRESENCE_REQUEST: self._on_presence_request,
+        }
+
+    async def attach_bus(self, bus: PubSubBus):
+        for name, handler in self._bus_handlers.items():
+            await bus.subscribe(name, handler)
+        self.bus = bus
+
+    async def _publish(self, name: str, message: dict):
+        message["origin"] = self.instance_id
+        if self.bus is None:
+            await self._bus_handlers[name](message)
+        else:
+            await self.bus.publish(name, message)
+
+    async def _on_proctor_broadcast(self, envelope: dict):
+        self._queue_broadcast(envelope["exam_id"], envelope["message"])
+
+    async def _on_student_command(self, envelope: dict):
+        await self._deliver_to_student(envelope["session_id"], envelope["message"])
+
+    async def _on_session_ended(self, envelope: dict):
+        from ..services.session_service import session_liveness
+
+        self.ended_sessions.setdefault(envelope["session_id"], time.time())
+        session_liveness.mark_ended(envelope["session_id"])
+
+    async def _on_presence_request(self, envelope: dict):
+        # A proctor connected on another process; share the statuses of the students held here.
+        if envelope["origin"] == self.instance_id:
+            return
+        statuses = self.exam_statuses(envelope["exam_id"])
+        if statuses:
+            await self.broadcast_to_proctors(envelope["exam_id"], {"type": "STATUS_SYNC", "timestamp": time.time(), "statuses": statuses, "full": True})
+
+    def _exam_log(self, exam_id: str) -> dict:
+        log = self.exam_logs.get(exam_id)
+        if log is None:
+            log = self.exam_logs[exam_id] = {
+                "epoch": uuid.uuid4().hex[:12],
+                "seq": 0,
+                "sent_seq": 0,
+                "events": deque(maxlen=EXAM_EVENT_LOG_SIZE),
+            }
+        return log
+
     def _ensure_broadcaster(self, exam_id: str):
         if exam_id not in self.exam_queues:
             self.exam_queues[exam_id] = asyncio.Queue(maxsize=1000)
@@ -31,43 +145,225 @@ class ConnectionManager:
             loop = asyncio.get_running_loop()
             self.sweeper_task = loop.create_task(self._sweeper())
 
+    def touch(self, session_id: str, now: float | None = None):
+        """Record a heartbeat (or connect) from a student session."""
+        now = time.time() if now is None else now
+        self.last_seen[session_id] = now
+        self.live_sessions[session_id] = now
+        self.live_sessions.move_to_end(session_id)
+        if self.presence.get(session_id) != "live":
+            self.presence[session_id] = "live"
+            exam_id = self.session_to_exam.get(session_id)
+            if exam_id:
+                self.presence_changes[exam_id][session_id] = "live"
+
+    def _expire_presence(self, now: float):
+        cutoff = now - PRESENCE_TIMEOUT_SECONDS
+        while self.live_sessions:
+            session_id, last_seen = next(iter(self.live_sessions.items()))
+            if last_seen > cutoff:
+                break
+            self.live_sessions.popitem(last=False)
+            self.presence[session_id] = "offline"
+            exam_id = self.session_to_exam.get(session_id)
+            if exam_id:
+                self.presence_changes[exam_id][session_id] = "offline"
+
+    def exam_statuses(self, exam_id: str) -> dict:
+        return {sid: self.presence.get(sid, "offline") for sid in self.exam_sessions.get(exam_id, ())}
+
     async def _sweeper(self):
         while True:
             await asyncio.sleep(5)
             now = time.time()
-            for exam_id, proctors in list(self.proctor_connections.items()):
-                if not proctors:
-                    continue
-                statuses = {}
-                for sid, eid in list(self.session_to_exam.items()):
-                    if eid == exam_id:
-                        status = "live" if (now - self.last_seen.get(sid, 0)) < 15 else "offline"
-                        statuses[sid] = status
+            self._expire_presence(now)
+            self.sweep_count += 1
+            full = self.sweep_count % FULL_STATUS_SYNC_EVERY == 0
+            changes, self.presence_changes = self.presence_changes, defaultdict(dict)
+            # Proctors may be connected to another process, so report on every exam with students here
+            exam_ids = [eid for eid, sessions in self.exam_sessions.items() if sessions] if full else list(changes)
+            for exam_id in exam_ids:
+                statuses = self.exam_statuses(exam_id) if full else changes[exam_id]
                 if statuses:
-                    await self.broadcast_to_proctors(exam_id, {"type": "STATUS_SYNC", "timestamp": now, "statuses": statuses})
+                    await self.broadcast_to_proctors(exam_id, {"type": "STATUS_SYNC", "timestamp": now, "statuses": statuses, "full": full})
+            self.collect_garbage(now)
+
+    def _retain_exam(self, exam_id: str):
+        self.exam_refs[exam_id] += 1
+        self.exam_idle_since.pop(exam_id, None)
+
+    def _release_exam(self, exam_id: str):
+        self.exam_refs[exam_id] -= 1
+        if self.exam_refs[exam_id] <= 0:
+            del self.exam_refs[exam_id]
+            self.exam_idle_since[exam_id] = time.time()
+
+    def collect_garbage(self, now: float | None = None) -> int:
+        """Tear down exams idle past the grace period and forget old ended sessions; returns exams removed."""
+        now = time.time() if now is None else now
+        idle = [eid for eid, since in self.exam_idle_since.items() if now - since >= EXAM_IDLE_GRACE_SECONDS]
+        for exam_id in idle:
+            self._teardown_exam(exam_id)
+
+        cutoff = now - ENDED_SESSION_TTL_SECONDS
+        for session_id in [sid for sid, ended_at in self.ended_sessions.items() if ended_at <= cutoff]:
+            del self.ended_sessions[session_id]
+        return len(idle)
+
+    def _teardown_exam(self, exam_id: str):
+        self.exam_idle_since.pop(exam_id, None)
+        task = self.broadcaster_tasks.pop(exam_id, None)
+        if task is not None:
+            task.cancel()
+        self.exam_queues.pop(exam_id, None)
+        self.exam_logs.pop(exam_id, None)
+        self.proctor_connections.pop(exam_id, None)
+        self.presence_changes.pop(exam_id, None)
+        for session_id in self.exam_sessions.pop(exam_id, set()):
+            if session_id in self.student_connections:
+                continue  # reconnected under another exam id in the meantime
+            if self.session_to_exam.get(session_id) == exam_id:
+                del self.session_to_exam[session_id]
+            self.last_seen.pop(session_id, None)
+            self.student_states.pop(session_id, None)
+            self.presence.pop(session_id, None)
+            self.live_sessions.pop(session_id, None)
+
+    def debug_sizes(self) -> dict:
+        return {
+            "student_connections": len(self.student_connections),
+            "queued_student_messages": sum(o.queue.qsize() for o in self.student_outboxes.values()),
+            "proctor_connections": sum(len(v) for v in self.proctor_connections.values()),
+            "exams_tracked": len(self.exam_sessions),
+            "exams_connected": len(self.exam_refs),
+            "exams_idle": len(self.exam_idle_since),
+            "exam_queues": len(self.exam_queues),
+            "broadcaster_tasks": len(self.broadcaster_tasks),
+            "queued_broadcasts": sum(q.qsize() for q in self.exam_queues.values()),
+            "logged_events": sum(len(log["events"]) for log in self.exam_logs.values()),
+            "proctor_outboxes": len(self.proctor_outboxes),
+            "queued_proctor_messages": sum(q.qsize() for q in self.proctor_outboxes.values()),
+            "session_to_exam": len(self.session_to_exam),
+            "last_seen": len(self.last_seen),
+            "live_sessions": len(self.live_sessions),
+            "student_states": len(self.student_states),
+            "ended_sessions": len(self.ended_sessions),
+            "fanout": dict(self.fanout_stats),
+        }
 
     async def _broadcaster(self, exam_id: str):
         queue = self.exam_queues[exam_id]
         while True:
             try:
-                message = await queue.get()
-                text = json.dumps(message)
-                
-                # Cleanup disconnected proctors
-                active_proctors = []
-                for ws in self.proctor_connections[exam_id]:
-                    if getattr(ws, "client_state", None) == WebSocketState.CONNECTED:
+                events = [await queue.get()]
+                if PROCTOR_BATCH_WINDOW_MS > 0:
+                    await asyncio.sleep(PROCTOR_BATCH_WINDOW_MS / 1000)
+                    while len(events) < PROCTOR_BATCH_MAX_EVENTS:
                         try:
-                            await ws.send_text(text)
-                            active_proctors.append(ws)
-                        except Exception:
-                            pass
-                self.proctor_connections[exam_id] = active_proctors
-                queue.task_done()
+                            events.append(queue.get_nowait())
+                        except asyncio.QueueEmpty:
+                            break
+                message = self._coalesce(events)
+
+                # Serialize once per wire format, then hand the payload to every proctor's
+                # outbox without waiting on sends
+                encoded = {}
+                for ws in list(self.proctor_connections[exam_id]):
+                    try:
+                        wire = self.proctor_codecs.get(ws)
+                        if wire not in encoded:
+                            encoded[wire] = codec.encode(wire, message)
+                        self._enqueue_for_proctor(exam_id, ws, encoded[wire])
+                    except Exception:
+                        # Only this connection is dropped; the dashboard reconnects and resyncs.
+                        logger.exception("Fan-out to a proctor of exam %s failed; dropping the connection", exam_id)
+                        self.disconnect_proctor(exam_id, ws)
+                        asyncio.get_running_loop().create_task(self._close_quietly(ws, 1011))
+                self._exam_log(exam_id)["sent_seq"] = events[-1]["seq"]
+                for _ in events:
+                    queue.task_done()
+                # Let the senders run before fanning out the next message of a burst
+                await asyncio.sleep(0)
             except asyncio.CancelledError:
                 break
             except Exception:
-                pass
+                logger.exception("Broadcaster for exam %s failed on a message", exam_id)
+
+    @staticmethod
+    def _coalesce(events: list) -> dict:
+        """
+        One frame for a window of events. STATUS_SYNCs collapse into a single map with the
+        latest status per session, placed where the last of them was, so the batch stays in
+        seq order (dashboards drop any event whose seq is not above the last one applied).
+        """
+        if len(events) == 1:
+            return events[0]
+        kept = []
+        status_sync = None
+        status_at = 0
+        for event in events:
+            if event.get("type") != "STATUS_SYNC":
+                kept.append(event)
+                continue
+            if status_sync is None:
+                status_sync = {**event, "statuses": dict(event["statuses"])}
+            else:
+                status_sync["statuses"].update(event["statuses"])
+                status_sync["timestamp"] = max(status_sync["timestamp"], event["timestamp"])
+                status_sync["full"] = status_sync.get("full", False) or event.get("full", False)
+                status_sync["seq"] = event["seq"]
+            status_at = len(kept)
+        if status_sync is not None:
+            kept.insert(status_at, status_sync)
+        if len(kept) == 1:
+            return kept[0]
+        return {"type": "BATCH", "timestamp": max(e.get("timestamp", 0) for e in kept), "seq": events[-1]["seq"], "events": kept}
+
+    def _enqueue_for_proctor(self, exam_id: str, ws: WebSocket, payload: str | bytes):
+        outbox = self.proctor_outboxes.get(ws)
+        if outbox is None:
+            return
+        try:
+            outbox.put_nowait(payload)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if PROCTOR_SLOW_CONSUMER_POLICY == "disconnect":
+            self.fanout_stats["slow_disconnects"] += 1
+            print(json.dumps({"event": "PROCTOR_SLOW_DISCONNECT", "exam_id": exam_id, "pending": outbox.qsize(), "timestamp": time.time()}))
+            self.disconnect_proctor(exam_id, ws)
+            asyncio.get_running_loop().create_task(self._close_quietly(ws, 1013))
+            return
+
+        try:
+            outbox.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.fanout_stats["dropped_messages"] += 1
+        outbox.put_nowait(payload)
+
+    async def _proctor_sender(self, exam_id: str, ws: WebSocket, outbox: asyncio.Queue):
+        while True:
+            try:
+                payload = await outbox.get()
+                if isinstance(payload, bytes):
+                    await ws.send_bytes(payload)
+                else:
+                    await ws.send_text(payload)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                # Connection is gone; stop fanning out to it.
+                logger.info("Proctor connection of exam %s closed while sending", exam_id, exc_info=True)
+                self.disconnect_proctor(exam_id, ws)
+                break
+
+    async def _close_quietly(self, ws: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(ws.close(code=code), timeout=5)
+        except Exception:
+            pass
 
     async def connect_student(self, session_id: str, exam_id: str, ws: WebSocket):
         await ws.accept()
@@ -77,33 +373,99 @@ class ConnectionManager:
                 await old_ws.close(code=4000)
             except Exception:
                 pass
-                
+
+        previous_exam_id = self.session_to_exam.get(session_id)
+        if session_id in self.student_connections:
+            # Replacing this session's previous socket; its own disconnect will be a no-op.
+            if previous_exam_id:
+                self._release_exam(previous_exam_id)
         self.student_connections[session_id] = ws
+        previous_outbox = self.student_outboxes.pop(session_id, None)
+        if previous_outbox is not None:
+            previous_outbox.close()
+        self.student_outboxes[session_id] = ConnectionOutbox(ws, on_error=lambda: self.disconnect_student(session_id, ws))
+        self._retain_exam(exam_id)
+        if previous_exam_id and previous_exam_id != exam_id:
+            self.exam_sessions[previous_exam_id].discard(session_id)
         self.session_to_exam[session_id] = exam_id
-        self.last_seen[session_id] = time.time()
+        self.exam_sessions[exam_id].add(session_id)
+        self.touch(session_id)
         self._ensure_broadcaster(exam_id)
         self._ensure_offline_sweeper()
 
-    async def connect_proctor(self, exam_id: str, ws: WebSocket):
-        await ws.accept()
+    async def connect_proctor(self, exam_id: str, ws: WebSocket, since: int | None = None, epoch: str | None = None):
+        """
+        `since`/`epoch` come from a reconnecting dashboard: the last sequence number it
+        applied and the epoch it was issued in. The first frame is always HELLO with the
+        current epoch and sequence; `resumed` says whether the missed events follow
+        (True) or the dashboard has to reload its snapshot (False).
+        """
+        wire = codec.negotiate(ws.scope.get("subprotocols"))
+        await ws.accept(subprotocol=wire)
+        self.proctor_codecs[ws] = wire
         self.proctor_connections[exam_id].append(ws)
+        self._retain_exam(exam_id)
+        outbox = asyncio.Queue(maxsize=PROCTOR_OUTBOX_SIZE)
+        self.proctor_outboxes[ws] = outbox
+        self.proctor_senders[ws] = asyncio.get_running_loop().create_task(self._proctor_sender(exam_id, ws, outbox))
+
+        # Events up to sent_seq have been fanned out already; later ones are still queued
+        # and will reach this connection through the broadcaster.
+        log = self._exam_log(exam_id)
+        hello = {"type": "HELLO", "epoch": log["epoch"], "seq": log["sent_seq"], "resumed": None, "timestamp": time.time()}
+        replay = []
+        if since is not None:
+            events = log["events"]
+            oldest = events[0]["seq"] if events else log["seq"] + 1
+            hello["resumed"] = epoch == log["epoch"] and 0 <= since <= log["sent_seq"] and oldest <= since + 1
+            if hello["resumed"]:
+                replay = [e for e in events if since < e["seq"] <= log["sent_seq"]]
+        self._enqueue_for_proctor(exam_id, ws, codec.encode(wire, hello))
+        if replay:
+            self._enqueue_for_proctor(exam_id, ws, codec.encode(wire, {"type": "BATCH", "timestamp": time.time(), "seq": replay[-1]["seq"], "replay": True, "events": replay}))
+        # Sweeps only send changes, so a new dashboard starts from the full picture
+        statuses = self.exam_statuses(exam_id)
+        if statuses:
+            self._enqueue_for_proctor(exam_id, ws, codec.encode(wire, {"type": "STATUS_SYNC", "timestamp": time.time(), "statuses": statuses, "full": True}))
         self._ensure_broadcaster(exam_id)
         self._ensure_offline_sweeper()
+        await self._publish(PRESENCE_REQUEST, {"exam_id": exam_id})
 
-    def disconnect_student(self, session_id: str, ws: WebSocket):
-        if self.student_connections.get(session_id) == ws:
+    def disconnect_student(self, session_id: str, ws: WebSocket) -> bool:
+        """Release `ws`; returns False when a newer connection of the session has replaced it."""
+        current = self.student_connections.get(session_id)
+        if current == ws:
             del self.student_connections[session_id]
+            outbox = self.student_outboxes.pop(session_id, None)
+            if outbox is not None:
+                outbox.close()
+            exam_id = self.session_to_exam.get(session_id)
+            if exam_id:
+                self._release_exam(exam_id)
+        return current is None or current == ws
 
     def disconnect_proctor(self, exam_id: str, ws: WebSocket):
         if ws in self.proctor_connections.get(exam_id, []):
             self.proctor_connections[exam_id].remove(ws)
+            self._release_exam(exam_id)
+        self.proctor_outboxes.pop(ws, None)
+        self.proctor_codecs.pop(ws, None)
+        sender = self.proctor_senders.pop(ws, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
 
     async def broadcast_to_proctors(self, exam_id: str, message: dict):
+        # Ensure message has timestamp for ordering
+        if "timestamp" not in message:
+            message["timestamp"] = time.time()
+        await self._publish(PROCTOR_BROADCAST, {"exam_id": exam_id, "message": message})
+
+    def _queue_broadcast(self, exam_id: str, message: dict):
         if exam_id in self.exam_queues:
-            # Ensure message has timestamp for ordering
-            if "timestamp" not in message:
-                message["timestamp"] = time.time()
-                
+            log = self._exam_log(exam_id)
+            log["seq"] += 1
+            message = {**message, "seq": log["seq"]}
+            log["events"].append(message)
             try:
                 self.exam_queues[exam_id].put_nowait(message)
             except asyncio.QueueFull:
@@ -114,11 +476,16 @@ class ConnectionManager:
                 self.exam_queues[exam_id].put_nowait(message)
 
     async def send_to_student(self, session_id: str, message: dict):
-        if session_id in self.student_connections:
-            ws = self.student_connections[session_id]
-            if getattr(ws, "client_state", None) == WebSocketState.CONNECTED:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    self.disconnect_student(session_id, ws)
+        await self._publish(STUDENT_COMMAND, {"session_id": session_id, "message": message})
+
+    async def mark_session_ended(self, session_id: str):
+        """Stop accepting events from the session on every process."""
+        self.ended_sessions.setdefault(session_id, time.time())
+        await self._publish(SESSION_ENDED, {"session_id": session_id})
+
+    async def _deliver_to_student(self, session_id: str, message: dict):
+        # Runs inside a pub/sub handler, so it only queues; the connection's outbox sends.
+        outbox = self.student_outboxes.get(session_id)
+        if outbox is not None and getattr(outbox.ws, "client_state", None) == WebSocketState.CONNECTED:
+            outbox.send_json(message)
 
@@ -0,0 +1,54 @@
+import asyncio
+import os
+from typing import Callable
+
+from fastapi import WebSocket
+
+# JSON messages buffered per student/signaling connection; the oldest is dropped when full.
+CONNECTION_OUTBOX_SIZE = int(os.getenv("CONNECTION_OUTBOX_SIZE", "64"))
+
+
+class ConnectionOutbox:
+    """
+    Ordered sends to one websocket, drained by the connection's own task.
+
+    Pub/sub handlers only enqueue, so a slow or stalled browser delays its own messages
+    and never the handlers of other connections.
+    """
+
+    def __init__(self, ws: WebSocket, on_error: Callable[[], None] | None = None, size: int = CONNECTION_OUTBOX_SIZE):
+        self.ws = ws
+        self.on_error = on_error
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+        self.task = asyncio.get_running_loop().create_task(self._drain())
+
+    def send_json(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        try:
+            self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def _drain(self) -> None:
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.ws.send_json(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Connection is gone; stop sending to it.
+                if self.on_error is not None:
+                    self.on_error()
+                return
+
+    def close(self) -> None:
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
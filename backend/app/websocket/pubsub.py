@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable
+from urllib.parse import unquote, urlparse
+
+# Empty: single-process, in-memory delivery. redis://[:password@]host[:port] shares
+# websocket traffic between backend processes through any Redis-protocol broker.
+PUBSUB_URL = os.getenv("PUBSUB_URL", "")
+PUBSUB_CHANNEL_PREFIX = os.getenv("PUBSUB_CHANNEL_PREFIX", "smartproctor")
+# Upper bound on connecting to the broker and on one publish round trip.
+PUBSUB_TIMEOUT_SEC = float(os.getenv("PUBSUB_TIMEOUT_SEC", "2"))
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class PubSubBus:
+    """
+    Fan-out of websocket events to every backend process, the local one included.
+
+    Publishers never deliver to their own connections directly; each process subscribes
+    to the channels and delivers to whichever connections it holds. Delivery is
+    best-effort: nothing is stored for processes that are not subscribed.
+
+    Handlers run one after another on the subscriber's task, so they must not wait on
+    network sends; they queue onto the target connection's outbox instead.
+    """
+
+    def __init__(self, prefix: str = PUBSUB_CHANNEL_PREFIX):
+        self.prefix = prefix
+        self.handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    def channel(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def subscribe(self, name: str, handler: Handler) -> None:
+        self.handlers[self.channel(name)].append(handler)
+
+    async def publish(self, name: str, message: dict) -> None:
+        raise NotImplementedError
+
+    async def _dispatch(self, channel: str, message: dict) -> None:
+        for handler in list(self.handlers.get(channel, ())):
+            try:
+                await handler(message)
+            except Exception:
+                logger.exception("Pub/sub handler for %s failed", channel)
+
+
+class InMemoryBus(PubSubBus):
+    """Delivers to this process's subscribers in publish order."""
+
+    async def publish(self, name: str, message: dict) -> None:
+        await self._dispatch(self.channel(name), message)
+
+
+def _encode_command(*args: str) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Pub/sub broker closed the connection")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RuntimeError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        return [await _read_reply(reader) for _ in range(int(body))]
+    raise ConnectionError(f"Unexpected pub/sub reply: {line!r}")
+
+
+class RedisBus(PubSubBus):
+    """
+    Pub/sub over the Redis protocol (PUBLISH / SUBSCRIBE), spoken directly on asyncio
+    streams so no client library is needed. One connection publishes, one subscribes;
+    both reconnect on failure and subscriptions are re-issued. Messages published while
+    the broker is unreachable are dropped: connecting and each publish are bounded by
+    PUBSUB_TIMEOUT_SEC, and once the broker has failed a publish, later ones are dropped
+    immediately until the reconnect delay has passed.
+    """
+
+    RECONNECT_DELAY_SEC = 1.0
+    MAX_RECONNECT_DELAY_SEC = 30.0
+
+    def __init__(self, url: str, prefix: str = PUBSUB_CHANNEL_PREFIX):
+        super().__init__(prefix)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self._pub: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._pub_lock = asyncio.Lock()
+        self._sub_writer: asyncio.StreamWriter | None = None
+        self._sub_task: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+        # Monotonic time before which publishes skip reconnecting (broker recently unreachable).
+        self._pub_retry_at = 0.0
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if self.password:
+                writer.write(_encode_command("AUTH", self.password))
+                await writer.drain()
+                await _read_reply(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(self._open(), timeout=PUBSUB_TIMEOUT_SEC)
+
+    async def _publish_once(self, channel: str, payload: str) -> None:
+        reader, writer = self._pub
+        writer.write(_encode_command("PUBLISH", channel, payload))
+        await writer.drain()
+        await _read_reply(reader)
+
+    async def start(self) -> None:
+        if self._sub_task is None:
+            self._sub_task = asyncio.get_running_loop().create_task(self._subscriber())
+            try:
+                await asyncio.wait_for(self._subscribed.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("Pub/sub broker %s:%s not reachable yet; retrying in the background", self.host, self.port)
+
+    async def close(self) -> None:
+        if self._sub_task is not None:
+            self._sub_task.cancel()
+            try:
+                await self._sub_task
+            except asyncio.CancelledError:
+                pass
+            self._sub_task = None
+        async with self._pub_lock:
+            if self._pub is not None:
+                self._pub[1].close()
+                self._pub = None
+
+    async def subscribe(self, name: str, handler: Handler) -> None:
+        channel = self.channel(name)
+        is_new = channel not in self.handlers
+        await super().subscribe(name, handler)
+        if is_new and self._sub_writer is not None:
+            writer = self._sub_writer
+            writer.write(_encode_command("SUBSCRIBE", channel))
+            try:
+                await asyncio.wait_for(writer.drain(), timeout=PUBSUB_TIMEOUT_SEC)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                # The subscriber reconnects and re-issues every subscription.
+                writer.close()
+
+    async def publish(self, name: str, message: dict) -> None:
+        payload = json.dumps(message, separators=(",", ":"))
+        async with self._pub_lock:
+            # One retry covers a broker restart between publishes.
+            for attempt in range(2):
+                try:
+                    if self._pub is None:
+                        if time.monotonic() < self._pub_retry_at:
+                            logger.debug("Pub/sub publish to %s dropped: broker unreachable", name)
+                            return
+                        try:
+                            self._pub = await self._connect()
+                        except BaseException:
+                            self._pub_retry_at = time.monotonic() + self.RECONNECT_DELAY_SEC
+                            raise
+                    await asyncio.wait_for(self._publish_once(self.channel(name), payload), timeout=PUBSUB_TIMEOUT_SEC)
+                    return
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                    if self._pub is not None:
+                        self._pub[1].close()
+                        self._pub = None
+                    if attempt or time.monotonic() < self._pub_retry_at:
+                        self._pub_retry_at = max(self._pub_retry_at, time.monotonic() + self.RECONNECT_DELAY_SEC)
+                        logger.warning("Pub/sub publish to %s dropped: %r", name, exc)
+                        return
+
+    async def _subscriber(self) -> None:
+        delay = self.RECONNECT_DELAY_SEC
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                if self.handlers:
+                    writer.write(_encode_command("SUBSCRIBE", *self.handlers.keys()))
+                    await asyncio.wait_for(writer.drain(), timeout=PUBSUB_TIMEOUT_SEC)
+                self._sub_writer = writer
+                self._subscribed.set()
+                delay = self.RECONNECT_DELAY_SEC
+                while True:
+                    reply = await _read_reply(reader)
+                    if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                        continue  # subscribe confirmations
+                    channel = reply[1].decode()
+                    try:
+                        message = json.loads(reply[2])
+                    except ValueError:
+                        continue
+                    await self._dispatch(channel, message)
+            except asyncio.CancelledError:
+                if writer is not None:
+                    writer.close()
+                raise
+            except (OSError, ConnectionError, RuntimeError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                logger.warning("Pub/sub subscriber disconnected (%r); reconnecting in %gs", exc, delay)
+            self._sub_writer = None
+            if writer is not None:
+                writer.close()
+            await asyncio.sleep(delay)
+            delay = min(self.MAX_RECONNECT_DELAY_SEC, delay * 2)
+
+
+def create_bus(url: str = PUBSUB_URL) -> PubSubBus:
+    if not url:
+        return InMemoryBus()
+    if urlparse(url).scheme not in {"redis", "tcp"}:
+        raise ValueError(f"Unsupported PUBSUB_URL scheme: {url}")
+    return RedisBus(url)
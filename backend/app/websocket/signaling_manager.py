@@ -1,21 +1,68 @@
+import asyncio
+import uuid
 from collections import defaultdict
 
+from .outbox import ConnectionOutbox
+from .pubsub import PubSubBus
+
+SIGNALING_RELAY = "signaling_relay"
+
 class SignalingManager:
     def __init__(self):
         # session_id -> { role -> websocket }
         self.sessions = defaultdict(dict)
+        # websocket -> ConnectionOutbox; relays only queue, so one slow peer blocks nobody else
+        self.outboxes = {}
+        self.instance_id = uuid.uuid4().hex
+        # Relays go through the bus once attached, so the peer may be on another process
+        self.bus: PubSubBus | None = None
+
+    async def attach_bus(self, bus: PubSubBus):
+        await bus.subscribe(SIGNALING_RELAY, self._on_relay)
+        self.bus = bus
 
     async def connect(self, session_id, role, ws):
         await ws.accept()
+        previous = self.sessions[session_id].get(role)
         self.sessions[session_id][role] = ws
+        self.outboxes[ws] = ConnectionOutbox(ws)
+        if previous is not None and previous is not ws:
+            # The reconnect replaces the old socket; close it so its peer loop ends.
+            self._close_outbox(previous)
+            await self._close_quietly(previous)
 
-    def disconnect(self, session_id, role):
-        if role in self.sessions[session_id]:
-            del self.sessions[session_id][role]
+    def disconnect(self, session_id, role, ws):
+        """Remove `ws` if it is still the session's connection for `role` (not a replacement)."""
+        peers = self.sessions.get(session_id)
+        if peers is not None and peers.get(role) is ws:
+            del peers[role]
+            if not peers:
+                del self.sessions[session_id]
+        self._close_outbox(ws)
+
+    @staticmethod
+    async def _close_quietly(ws):
+        try:
+            await asyncio.wait_for(ws.close(code=4000), timeout=5)
+        except Exception:
+            pass
 
     async def relay(self, session_id, from_role, message):
         target_role = "proctor" if from_role == "student" else "student"
-        target_ws = self.sessions[session_id].get(target_role)
+        envelope = {"session_id": session_id, "role": target_role, "message": message, "origin": self.instance_id}
+        if self.bus is None:
+            await self._on_relay(envelope)
+        else:
+            await self.bus.publish(SIGNALING_RELAY, envelope)
+
+    def _close_outbox(self, ws):
+        outbox = self.outboxes.pop(ws, None)
+        if outbox is not None:
+            outbox.close()
+
+    async def _on_relay(self, envelope: dict):
+        target_ws = self.sessions.get(envelope["session_id"], {}).get(envelope["role"])
 
-        if target_ws:
-            await target_ws.send_json(message)
+        outbox = self.outboxes.get(target_ws) if target_ws else None
+        if outbox is not None:
+            outbox.send_json(envelope["message"])
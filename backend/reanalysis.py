@@ -0,0 +1,142 @@
+"""
+Offline re-analysis helpers for a completed exam.
+
+    python reanalysis.py export <exam_id> [-o manifest.json]
+        Writes the manifest consumed by the AI worker's reanalyze.py: every session of the
+        exam with its stored periodic snapshots, plus the AI violations on record. Violation
+        evidence images are left out: they were captured because a rule had already fired
+        and would be counted twice next to the snapshots.
+
+    python reanalysis.py import <exam_id> <exam_id>.sessions.jsonl
+        Optionally records the re-analysis violations as Violation rows with
+        source='ai_reanalysis'. Integrity scores are left untouched.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from app.database import SessionLocal
+from app.models.exam import Exam  # noqa: F401 - registers tables referenced by foreign keys
+from app.models.exam_attempt import ExamAttempt  # noqa: F401
+from app.models.exam_session import ExamSession
+from app.models.snapshot import Snapshot
+from app.models.violation import Violation
+from app.services.ai_worker import _severity_for_violation
+
+AI_VIOLATION_TYPES = {"NO_FACE", "MULTIPLE_FACES", "PHONE_DETECTED", "LOOKING_AWAY", "SPOOF_DETECTED", "IDENTITY_MISMATCH"}
+REANALYSIS_SOURCE = "ai_reanalysis"
+
+
+def _ts(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def export_manifest(exam_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        sessions = db.query(ExamSession).filter_by(exam_id=exam_id).all()
+        payload = []
+        for session in sessions:
+            frames = []
+            for snap in db.query(Snapshot).filter_by(session_id=session.id).all():
+                ts = _ts(snap.created_at)
+                if ts is not None:
+                    frames.append({"path": os.path.abspath(snap.file_path), "ts": ts})
+
+            existing = []
+            for v in db.query(Violation).filter_by(session_id=session.id).all():
+                ts = _ts(v.timestamp)
+                if ts is None:
+                    continue
+                if v.type in AI_VIOLATION_TYPES and v.source != REANALYSIS_SOURCE:
+                    existing.append({"type": v.type, "ts": ts})
+
+            frames.sort(key=lambda f: f["ts"])
+            payload.append({
+                "session_id": session.id,
+                "student_id": session.student_id,
+                "frames": frames,
+                "existing_violations": existing,
+            })
+        return {"exam_id": exam_id, "sessions": payload}
+    finally:
+        db.close()
+
+
+def import_results(exam_id: str, results_path: str) -> int:
+    db = SessionLocal()
+    try:
+        session_ids = {s.id for s in db.query(ExamSession).filter_by(exam_id=exam_id).all()}
+        created = 0
+        with open(results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                result = json.loads(line)
+                session_id = result["session_id"]
+                if session_id not in session_ids:
+                    continue
+                if result.get("error"):
+                    # The worker could not analyze this session; keep whatever is on record.
+                    continue
+
+                # Re-importing replaces the previous re-analysis rows for the session.
+                db.query(Violation).filter_by(session_id=session_id, source=REANALYSIS_SOURCE).delete()
+                for v in result.get("violations") or []:
+                    db.add(Violation(
+                        session_id=session_id,
+                        student_id=result.get("student_id"),
+                        type=v["type"],
+                        severity=_severity_for_violation(v["type"]),
+                        source=REANALYSIS_SOURCE,
+                        timestamp=datetime.fromtimestamp(float(v["ts"]), tz=timezone.utc),
+                        reason=v.get("reason"),
+                        duration_ms=v.get("duration_ms"),
+                        evidence_files=json.dumps(v.get("evidence_ids") or []),
+                        metadata=json.dumps({"confidence": v.get("confidence")}),
+                    ))
+                    created += 1
+        db.commit()
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline AI re-analysis for a completed exam")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export")
+    export_cmd.add_argument("exam_id")
+    export_cmd.add_argument("-o", "--output", default=None)
+
+    import_cmd = sub.add_parser("import")
+    import_cmd.add_argument("exam_id")
+    import_cmd.add_argument("results")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        manifest = export_manifest(args.exam_id)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            print(f"Exported {len(manifest['sessions'])} sessions to {args.output}")
+        else:
+            json.dump(manifest, sys.stdout)
+    else:
+        created = import_results(args.exam_id, args.results)
+        print(f"Imported {created} violations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from app.services.ai_worker import build_model_profile
+
+
+def test_model_profile_is_complete_with_worker_defaults():
+    profile = build_model_profile(None)
+    assert profile["headpose_every"] == 3
+    assert profile["phone_every"] == 3
+    assert profile["identity_every"] == 20
+    assert profile["phone_temporal_threshold"] is None
+    assert profile["audio_enabled"] is False
+
+
+def test_model_profile_applies_exam_tuning_and_ignores_invalid_values():
+    profile = build_model_profile({
+        "aiHeadPoseEveryFrames": 5,
+        "aiPhoneEveryFrames": 0,
+        "aiIdentityEveryFrames": "often",
+        "aiLookingAwayThreshold": "0.8",
+        "aiPhoneTemporalThreshold": 1.5,
+    })
+    assert profile["headpose_every"] == 5
+    assert profile["phone_every"] == 3
+    assert profile["identity_every"] == 20
+    assert profile["looking_away_threshold"] == 0.8
+    assert profile["phone_temporal_threshold"] is None
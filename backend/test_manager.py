@@ -0,0 +1,34 @@
+from app.websocket.manager import ConnectionManager
+
+
+def _status(seq: int, statuses: dict, timestamp: float = 0.0) -> dict:
+    return {"type": "STATUS_SYNC", "seq": seq, "timestamp": timestamp, "statuses": statuses, "full": False}
+
+
+def _violation(seq: int) -> dict:
+    return {"type": "VIOLATION", "seq": seq, "timestamp": 0.0, "session_id": "s1"}
+
+
+def test_coalesced_batch_stays_in_seq_order():
+    batch = ConnectionManager._coalesce([_status(1, {"s1": "live"}), _violation(2)])
+    assert [e["seq"] for e in batch["events"]] == [1, 2]
+    assert batch["seq"] == 2
+
+
+def test_status_syncs_merge_at_the_last_one():
+    batch = ConnectionManager._coalesce([
+        _status(1, {"s1": "live"}, 1.0),
+        _violation(2),
+        _status(3, {"s1": "offline", "s2": "live"}, 3.0),
+        _violation(4),
+    ])
+    assert [(e["type"], e["seq"]) for e in batch["events"]] == [("VIOLATION", 2), ("STATUS_SYNC", 3), ("VIOLATION", 4)]
+    assert batch["events"][1]["statuses"] == {"s1": "offline", "s2": "live"}
+    assert batch["events"][1]["timestamp"] == 3.0
+
+
+def test_only_status_syncs_collapse_to_one_frame():
+    message = ConnectionManager._coalesce([_status(1, {"s1": "live"}), _status(2, {"s2": "live"})])
+    assert message["type"] == "STATUS_SYNC"
+    assert message["seq"] == 2
+    assert message["statuses"] == {"s1": "live", "s2": "live"}
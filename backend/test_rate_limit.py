@@ -0,0 +1,114 @@
+import math
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import rate_limit
+from app.services.rate_limit import InferenceRateLimiter, TokenBucket, limits_for_exam
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=4, now=0)
+    bucket.tokens = 0
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+    bucket.refill(1.0)
+    assert bucket.tokens == pytest.approx(2)
+    assert bucket.wait_time() == 0.0
+
+    bucket.refill(60.0)
+    assert bucket.tokens == 4
+
+
+def test_token_bucket_without_rate_never_refills():
+    bucket = TokenBucket(rate=0, burst=1, now=0)
+    bucket.tokens = 0
+    bucket.refill(100.0)
+    assert bucket.wait_time() == math.inf
+
+
+def test_limits_keep_default_burst_window():
+    limits = limits_for_exam({"inferenceFramesPerSecond": 5, "inferenceExamFramesPerSecond": "bad"})
+    burst_seconds = rate_limit.INFERENCE_STUDENT_BURST / rate_limit.INFERENCE_STUDENT_RATE
+    assert limits["student_rate"] == 5
+    assert limits["student_burst"] == pytest.approx(5 * burst_seconds)
+    assert limits["exam_rate"] == rate_limit.INFERENCE_EXAM_RATE
+
+
+def test_non_positive_env_rates_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("INFERENCE_STUDENT_RATE", "0")
+    assert rate_limit._positive_env("INFERENCE_STUDENT_RATE", 2.0) == 2.0
+    monkeypatch.setenv("INFERENCE_STUDENT_RATE", "-1")
+    assert rate_limit._positive_env("INFERENCE_STUDENT_RATE", 2.0) == 2.0
+    monkeypatch.setenv("INFERENCE_STUDENT_RATE", "fast")
+    assert rate_limit._positive_env("INFERENCE_STUDENT_RATE", 2.0) == 2.0
+    monkeypatch.setenv("INFERENCE_STUDENT_RATE", "3")
+    assert rate_limit._positive_env("INFERENCE_STUDENT_RATE", 2.0) == 3.0
+
+
+def test_student_bucket_rejects_after_burst(clock):
+    limiter = InferenceRateLimiter()
+    config = {"inferenceFramesPerSecond": 1}
+    burst = int(limits_for_exam(config)["student_burst"])
+
+    for _ in range(burst):
+        assert limiter.acquire("student-1", "exam-1", config) == 0.0
+    assert limiter.acquire("student-1", "exam-1", config) == pytest.approx(1.0)
+    assert limiter.rejected["student"] == 1
+
+    # Other students are not affected, and the first one is admitted again after a second.
+    assert limiter.acquire("student-2", "exam-1", config) == 0.0
+    clock.now += 1.0
+    assert limiter.acquire("student-1", "exam-1", config) == 0.0
+
+
+def test_rejected_frame_takes_no_tokens(clock):
+    limiter = InferenceRateLimiter(global_rate=1, global_burst=1)
+    assert limiter.acquire("student-1", None) == 0.0
+
+    assert limiter.acquire("student-2", None) == pytest.approx(1.0)
+    assert limiter.rejected["global"] == 1
+    bucket = limiter.student_buckets["student-2"]
+    assert bucket.tokens == bucket.burst
+
+
+def test_check_raises_429_with_retry_after(clock):
+    limiter = InferenceRateLimiter(global_rate=0.25, global_burst=1)
+    limiter.check("student-1", None)
+
+    with pytest.raises(HTTPException) as excinfo:
+        limiter.check("student-1", None)
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "4"
+    assert excinfo.value.detail["retry_after"] == pytest.approx(4.0)
+
+
+def test_retried_frame_id_takes_no_token(clock):
+    limiter = InferenceRateLimiter(global_rate=1, global_burst=1)
+    assert limiter.acquire("student-1", None, frame_id="f0") == 0.0
+
+    # The worker answers the retry from its cache, so it is admitted for free.
+    assert limiter.acquire("student-1", None, frame_id="f0") == 0.0
+    assert limiter.retries == 1
+    assert limiter.acquire("student-1", None, frame_id="f1") == pytest.approx(1.0)
+    assert limiter.acquire("student-2", None, frame_id="f0") == pytest.approx(1.0)
+
+    clock.now += rate_limit.INFERENCE_RETRY_WINDOW_SECONDS + 1
+    assert limiter.acquire("student-1", None, frame_id="f0") == 0.0
+    assert limiter.acquire("student-1", None, frame_id="f0") == 0.0
+    assert limiter.retries == 2
@@ -37,6 +37,9 @@ const TeacherMonitoringPage = () => {
   const [loadingTimeline, setLoadingTimeline] = useState(false);
   
   const wsRefs = useRef({});
+  // Last applied event sequence number and its epoch, so a reconnect can resume the stream.
+  const resumeRef = useRef({ epoch: null, seq: 0 });
+  const reconnectAttemptsRef = useRef(0);
   const intervalRef = useRef(null);
   const mountedRef = useRef(true);
 
@@ -149,12 +152,20 @@ const TeacherMonitoringPage = () => {
           showToast('Unable to authenticate live monitoring socket', 'error');
           return;
         }
-        const wsUrl = `${wsProtocol}//${wsHost}/ws/proctor/exam/${examId}?token=${encodeURIComponent(token)}`;
-        const ws = new WebSocket(wsUrl);
+        const { epoch, seq } = resumeRef.current;
+        const resumeQuery = epoch ? `&since=${seq}&epoch=${encodeURIComponent(epoch)}` : '';
+        const wsUrl = `${wsProtocol}//${wsHost}/ws/proctor/exam/${examId}?token=${encodeURIComponent(token)}${resumeQuery}`;
+        // Ask for deflate-compressed binary frames when the browser can inflate them natively.
+        const supportsDeflate = typeof DecompressionStream !== 'undefined';
+        const ws = supportsDeflate
+          ? new WebSocket(wsUrl, ['smartproctor.json.deflate', 'smartproctor.json'])
+          : new WebSocket(wsUrl);
+        ws.binaryType = 'arraybuffer';
         wsRefs.current['exam'] = ws;
 
         ws.onopen = () => {
           console.log(`Connected to proctor WS for exam: ${examId}`);
+          reconnectAttemptsRef.current = 0;
           if (mountedRef.current) {
             setLoading(false);
           }
@@ -173,14 +184,24 @@ const TeacherMonitoringPage = () => {
            }
         }, 30000);
 
-        ws.onmessage = (event) => {
-          try {
-            const data = JSON.parse(event.data);
-            
+        // Applies one server event; returns the student id for a new violation so toasts can be grouped.
+        const applyEvent = (data) => {
+            if (data.type === 'HELLO') {
+                // resumed === false: the server no longer has the events we missed, reload the snapshot.
+                if (data.resumed === false) fetchSessions();
+                if (data.resumed !== true) resumeRef.current = { epoch: data.epoch, seq: data.seq };
+                return null;
+            }
+            // Sequenced events arrive at most once even when a replay overlaps live delivery.
+            if (typeof data.seq === 'number') {
+                if (data.seq <= resumeRef.current.seq) return null;
+                resumeRef.current.seq = data.seq;
+            }
+
             if (data.type === 'STATUS_SYNC') {
                 if (data.timestamp) {
                     const lastStatusTs = lastTimestamps.get('status_sync') || 0;
-                    if (data.timestamp < lastStatusTs) return;
+                    if (data.timestamp < lastStatusTs) return null;
                     lastTimestamps.set('status_sync', data.timestamp);
                 }
                 const statuses = data.statuses;
@@ -192,21 +213,21 @@ const TeacherMonitoringPage = () => {
                     }
                     return next;
                 });
-                return;
+                return null;
             }
 
             const sid = data.session_id;
-            if (!sid) return;
+            if (!sid) return null;
 
             if (data.timestamp) {
                 const lastTs = lastTimestamps.get(sid) || 0;
-                if (data.timestamp < lastTs) return;
+                if (data.timestamp < lastTs) return null;
                 lastTimestamps.set(sid, data.timestamp);
             }
 
             // Idempotency check for violations
             if (data.event_id) {
-               if (processedEvents.has(data.event_id)) return;
+               if (processedEvents.has(data.event_id)) return null;
                processedEvents.set(data.event_id, Date.now());
             }
 
@@ -221,18 +242,56 @@ const TeacherMonitoringPage = () => {
                   lastSeen: Date.now()
                 }
               }));
-              showToast(`New violation from ${data.student_id || sid}`, 'warning');
+              return data.student_id || sid;
+            }
+            return null;
+        };
+
+        const decodeFrame = async (frame) => {
+            if (typeof frame === 'string') return frame;
+            const inflated = new Blob([frame]).stream().pipeThrough(new DecompressionStream('deflate'));
+            return new Response(inflated).text();
+        };
+        // Inflating is async; chain frames so events are still applied in arrival order.
+        let frameChain = Promise.resolve();
+
+        const handleFrame = (raw) => {
+          try {
+            const data = JSON.parse(raw);
+            // A BATCH frame carries several coalesced events; React batches the state
+            // updates below into a single render.
+            const events = data.type === 'BATCH' ? (data.events || []) : [data];
+            const violators = events.map(applyEvent).filter(Boolean);
+            if (violators.length === 1) {
+              showToast(`New violation from ${violators[0]}`, 'warning');
+            } else if (violators.length > 1) {
+              showToast(`${violators.length} new violations from ${new Set(violators).size} students`, 'warning');
             }
           } catch (err) {
             console.error('WS MSG Parse Error', err);
           }
         };
 
+        ws.onmessage = (event) => {
+          frameChain = frameChain
+            .then(() => decodeFrame(event.data))
+            .then(handleFrame)
+            .catch((err) => console.error('WS frame decode error', err));
+        };
+
         ws.onclose = () => {
           clearInterval(cleanupInterval);
           if (wsRefs.current['exam'] === ws) {
             delete wsRefs.current['exam'];
           }
+          // Reconnect with back-off; the server replays what was missed in between.
+          if (mountedRef.current) {
+            const delay = Math.min(15000, 1000 * 2 ** reconnectAttemptsRef.current);
+            reconnectAttemptsRef.current += 1;
+            setTimeout(() => {
+              if (mountedRef.current) connectSockets();
+            }, delay);
+          }
         };
 
         ws.onerror = (event) => {
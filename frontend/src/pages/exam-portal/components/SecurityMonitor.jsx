@@ -7,8 +7,13 @@ const AI_VIOLATION_MESSAGES = {
   PHONE_DETECTED: 'Phone detected',
   LOOKING_AWAY: 'Looking away',
   SPOOF_DETECTED: 'Potential spoofing detected',
+  IDENTITY_MISMATCH: 'Face does not match the student who started the exam',
 };
 
+// AI results (confirmed violations and throttled per-frame detections) are recorded by the
+// backend when it runs inference; the portal only shows them.
+const SERVER_RECORDED = { persist: false };
+
 const isTemporalViolationEnabled = (type, securityConfig) => {
   if (type === 'NO_FACE') return Boolean(securityConfig?.detectNoFace);
   if (type === 'MULTIPLE_FACES') return Boolean(securityConfig?.detectMultipleFaces);
@@ -327,30 +332,35 @@ const SecurityMonitor = forwardRef(({ violations, sessionId, securityConfig, onA
       return false;
     };
 
-    const captureAndSend = async (retries = 2) => {
-      if (!mounted || !videoRef.current || !canvasRef.current) return;
+    const captureFrame = () => {
+      if (!mounted || !videoRef.current || !canvasRef.current) return null;
       
       // 3. No Visibility Check - Avoid firing if document is hidden
-      if (document.hidden) return;
+      if (document.hidden) return null;
 
       const video = videoRef.current;
       const canvas = canvasRef.current;
 
-      if (video.videoWidth === 0 || video.videoHeight === 0) return;
+      if (video.videoWidth === 0 || video.videoHeight === 0) return null;
 
       canvas.width = video.videoWidth;
       canvas.height = video.videoHeight;
       const ctx = canvas.getContext('2d');
       ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
-      const imageBase64 = canvas.toDataURL('image/jpeg', 0.8);
+      // Retries resend the same frame id so the worker can answer from its result cache.
+      return {
+        image: canvas.toDataURL('image/jpeg', 0.8),
+        timestamp: new Date().toISOString(),
+        frame_id: `${sessionId}-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`,
+      };
+    };
 
-      try {
-        const payload = {
-          image: imageBase64,
-          timestamp: new Date().toISOString(),
-        };
+    const captureAndSend = async (retries = 2, capturedPayload = null) => {
+      const payload = capturedPayload || captureFrame();
+      if (!payload) return;
 
+      try {
         const response = await onRequestSnapshot?.(sessionId, payload);
 
         if (mounted && response) {
@@ -363,10 +373,10 @@ const SecurityMonitor = forwardRef(({ violations, sessionId, securityConfig, onA
           // Convert response to violations
           if ((response.face_detected === false || faceCount === 0) && securityConfig?.detectNoFace) {
             isSuspicious = true;
-            if (shouldTrigger('NO_FACE')) onAddViolationRef.current?.('No face detected', 'NO_FACE', 1.0);
+            if (shouldTrigger('NO_FACE')) onAddViolationRef.current?.('No face detected', 'NO_FACE', 1.0, SERVER_RECORDED);
           } else if ((faceCount > 1 || response.multiple_faces) && securityConfig?.detectMultipleFaces) {
             isSuspicious = true;
-            if (shouldTrigger('MULTIPLE_FACES')) onAddViolationRef.current?.('Multiple faces detected', 'MULTIPLE_FACES', 1.0);
+            if (shouldTrigger('MULTIPLE_FACES')) onAddViolationRef.current?.('Multiple faces detected', 'MULTIPLE_FACES', 1.0, SERVER_RECORDED);
           }
 
           if (phoneDetected && securityConfig?.detectMobilePhone) {
@@ -374,14 +384,14 @@ const SecurityMonitor = forwardRef(({ violations, sessionId, securityConfig, onA
             // 4. Add Confidence Threshold
             if (conf >= 0.7) {
               isSuspicious = true;
-              if (shouldTrigger('PHONE_DETECTED')) onAddViolationRef.current?.('Phone detected', 'PHONE_DETECTED', conf);
+              if (shouldTrigger('PHONE_DETECTED')) onAddViolationRef.current?.('Phone detected', 'PHONE_DETECTED', conf, SERVER_RECORDED);
             }
           }
 
           if (headPose.looking_away) {
             isSuspicious = true;
             if (shouldTrigger('LOOKING_AWAY')) {
-              onAddViolationRef.current?.('Looking away', 'LOOKING_AWAY', Number(headPose.confidence || 1.0));
+              onAddViolationRef.current?.('Looking away', 'LOOKING_AWAY', Number(headPose.confidence || 1.0), SERVER_RECORDED);
             }
           }
 
@@ -393,7 +403,8 @@ const SecurityMonitor = forwardRef(({ violations, sessionId, securityConfig, onA
             onAddViolationRef.current?.(
               getViolationMessage(violation),
               violation.type,
-              Number(violation.confidence || 1.0)
+              Number(violation.confidence || 1.0),
+              SERVER_RECORDED
             );
           }
 
@@ -409,7 +420,7 @@ const SecurityMonitor = forwardRef(({ violations, sessionId, securityConfig, onA
         if (retries > 0 && mounted) {
           // Recursive retry with slight delay
           await new Promise(r => setTimeout(r, 1000));
-          return captureAndSend(retries - 1);
+          return captureAndSend(retries - 1, payload);
         } else {
           // 5. Better Error Handling
           console.warn('AI snapshot failed', error);
@@ -662,7 +662,7 @@ const ExamPortal = () => {
     return () => document.removeEventListener('visibilitychange', handleVisibilityChange);
   }, [detectTabSwitchEnabled]);
 
-  const addViolation = (message, type = null, confidence = null) => {
+  const addViolation = (message, type = null, confidence = null, { persist = true } = {}) => {
     if (examEndedRef.current) return;
     triggerViolationLock(message);
     const event_id = crypto.randomUUID ? crypto.randomUUID() : Math.random().toString(36).substring(2, 15);
@@ -674,7 +674,7 @@ const ExamPortal = () => {
     
     // Attempt to capture evidence snapshot
     let snapshotImage = null;
-    if (securityMonitorRef.current?.captureImage) {
+    if (persist && securityMonitorRef.current?.captureImage) {
        snapshotImage = securityMonitorRef.current.captureImage();
     }
 
@@ -708,7 +708,8 @@ const ExamPortal = () => {
       event_id,
       reason: message,
     };
-    void persistViolation(body);
+    // AI detections are already persisted server-side by the snapshot endpoint.
+    if (persist) void persistViolation(body);
   };
 
 